@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# --- Cube de médailles pré-agrégé ---
+# Les callbacks de data_manager filtraient tout le DataFrame à chaque clic.
+# On calcule ici une seule fois les comptages (Saison x Sport x NOC) et
+# (Saison x Année x NOC), triés par clé, avec pour chaque clé la tranche de
+# lignes correspondante : chaque interaction devient une lecture par clé.
+# La construction est vectorisée (un tri + un passage), quelques millisecondes.
+
+
+def _slices(df, keys):
+    # df trié par `keys` : {clé: (début, fin)} des lignes de chaque groupe
+    if df.empty:
+        return {}
+    values = [df[k].to_numpy(dtype=object) for k in keys]
+    change = np.zeros(len(df), dtype=bool)
+    change[0] = True
+    for column in values:
+        change[1:] |= column[1:] != column[:-1]
+    starts = np.flatnonzero(change)
+    stops = np.append(starts[1:], len(df))
+    return {
+        tuple(column[start] for column in values): (start, stop)
+        for start, stop in zip(starts.tolist(), stops.tolist())
+    }
+
+
+class MedalCube:
+    def __init__(self, by_sport, by_year, sports_by_season=None):
+        # by_sport : colonnes Season, Sport, NOC, Count
+        # by_year  : colonnes Season, Year, NOC, Count
+        # Tri stable : à égalité de médailles, l'ordre d'origine est conservé
+        by_sport = by_sport.astype({'Season': str, 'Sport': str, 'NOC': str}).sort_values(
+            ['Season', 'Sport', 'Count'], ascending=[True, True, False], kind='mergesort'
+        ).reset_index(drop=True)
+        self._by_sport = by_sport
+        self._top = by_sport[['NOC', 'Count']]
+        self._top_slices = _slices(by_sport, ['Season', 'Sport'])
+
+        by_year = by_year.astype({'Season': str, 'NOC': str}).sort_values(
+            ['Season', 'NOC', 'Year'], kind='mergesort'
+        ).reset_index(drop=True)
+        self._by_year = by_year
+        self._yearly = by_year[['Year', 'NOC', 'Count']].rename(columns={'Count': 'Total Medals'})
+        self._yearly_slices = _slices(by_year, ['Season', 'NOC'])
+
+        if sports_by_season is None:
+            sports_by_season = {}
+            for (season, sport) in self._top_slices:
+                sports_by_season.setdefault(season, set()).add(sport)
+        self.sports_by_season = {season: sorted(sports) for season, sports in sports_by_season.items()}
+
+        self.empty = not self._top_slices
+
+    @classmethod
+    def from_dataframe(cls, df):
+        # Construction à partir du DataFrame brut de athlete_events
+        # (colonnes texte ou 'category' : observed=True ignore les combinaisons absentes)
+        if df.empty:
+            return cls.empty_cube()
+
+        medals = df[df['Medal'] != 'None']
+        by_sport = medals.groupby(['Season', 'Sport', 'NOC'], observed=True).size().reset_index(name='Count')
+        by_year = medals.groupby(['Season', 'Year', 'NOC'], observed=True).size().reset_index(name='Count')
+        sports_by_season = {
+            season: grp['Sport'].unique().tolist()
+            for season, grp in df[['Season', 'Sport']].drop_duplicates().groupby('Season', observed=True)
+        }
+        return cls(by_sport, by_year, sports_by_season)
+
+    @classmethod
+    def empty_cube(cls):
+        return cls(
+            pd.DataFrame(columns=['Season', 'Sport', 'NOC', 'Count']),
+            pd.DataFrame(columns=['Season', 'Year', 'NOC', 'Count']),
+        )
+
+    # --- Cache partagé : le cube se reconstruit en quelques ms à partir de ses agrégats
+    # (colonnes texte en 'category' : dictionnaires Arrow, bien plus compacts) ---
+    def to_parts(self):
+        return {
+            'by_sport': self._by_sport.astype({'Season': 'category', 'Sport': 'category', 'NOC': 'category'}),
+            'by_year': self._by_year.astype({'Season': 'category', 'NOC': 'category'}),
+            'sports_by_season': self.sports_by_season,
+        }
+
+    @classmethod
+    def from_parts(cls, parts):
+        return cls(parts['by_sport'], parts['by_year'], parts['sports_by_season'])
+
+    # --- API de lecture utilisée par les callbacks ---
+    def sports(self, season):
+        return self.sports_by_season.get(season, [])
+
+    def top_nations(self, season, sport, n=3):
+        bounds = self._top_slices.get((season, sport))
+        if bounds is None:
+            return pd.DataFrame(columns=['NOC', 'Count'])
+        start, stop = bounds
+        return self._top.iloc[start:min(stop, start + n)].reset_index(drop=True)
+
+    def yearly_counts(self, season, nocs):
+        frames = [
+            self._yearly.iloc[slice(*self._yearly_slices[(season, noc)])]
+            for noc in dict.fromkeys(nocs) if (season, noc) in self._yearly_slices
+        ]
+        if not frames:
+            return pd.DataFrame(columns=['Year', 'NOC', 'Total Medals'])
+        return pd.concat(frames, ignore_index=True).sort_values(['Year', 'NOC'], ignore_index=True)
@@ -1,5 +1,9 @@
 import dash
 from dash import html, dcc
+import exports
+import health
+import metrics
+import request_log
 
 # Initialisation de l'application Dash en mode multi-pages
 # Le paramètre use_pages=True active la fonctionnalité des pages automatiques
@@ -7,6 +11,15 @@ app = dash.Dash(__name__, use_pages=True, suppress_callback_exceptions=True)
 
 server = app.server
 
+# Instrumentation des callbacks et route /metrics (si METRICS_ENABLED=1)
+metrics.init_app(app)
+# Journal des requêtes (latence, statut, session) -> admin_metrics
+request_log.init_app(app)
+# Sondes /healthz et /readyz (l'application sert pendant le chargement des données)
+health.init_app(app)
+# Export CSV / Parquet en flux et en tâche de fond (/export/...)
+exports.init_app(app)
+
 # Définition de la mise en page (Layout) principale
 app.layout = html.Div([
     html.H1('Tableau de Bord Olympique par Rôle', style={'textAlign': 'center'}),
@@ -0,0 +1,35 @@
+// --- Callbacks exécutés dans le navigateur ---
+// Interactions de pure présentation : elles ne lisent que des propriétés déjà
+// présentes dans la page (Stores remplis par render()), sans aller-retour serveur.
+// Chargé automatiquement par Dash (dossier assets/), voir clientside_callback
+// dans pages/*.py.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dataviz: {
+        // Data Manager : liste des sports de la saison (table saison -> sports du Store dm-sports)
+        sportsOptions: function (season, sportsBySeason) {
+            var sports = (sportsBySeason || {})[season] || [];
+            var options = sports.map(function (sport) {
+                return {label: sport, value: sport};
+            });
+            return [options, sports.length ? sports[0] : null];
+        },
+
+        // Data Manager : lien de téléchargement direct (même URL que export_url côté Python)
+        exportUrl: function (filterQuery, sortBy) {
+            var args = new URLSearchParams({format: 'csv', gzip: '1'});
+            if (filterQuery) {
+                args.set('filter', filterQuery);
+            }
+            if (sortBy && sortBy.length) {
+                args.set('sort', JSON.stringify(sortBy));
+            }
+            return '/export/athlete_events?' + args.toString();
+        },
+
+        // Admin / Développeur : le sondage live ne tourne que si le mode est coché
+        // et que les graphiques ont un curseur (plage ouverte, points non agrégés)
+        liveDisabled: function (toggle, cursor) {
+            return (toggle || []).indexOf('live') === -1 || !cursor;
+        }
+    }
+});
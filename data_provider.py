@@ -0,0 +1,150 @@
+import threading
+import time
+
+from config import DATA_TTL_SECONDS, DATA_RETRY_SECONDS
+from shared_cache import shared_cache, digest
+
+# --- Fournisseur de données partagé ---
+# Les pages ne lisent plus la BDD à l'import : elles déclarent leurs jeux de
+# données ici, qui sont chargés au premier accès puis rafraîchis en tâche de
+# fond une fois le TTL expiré. Pendant un rafraîchissement (ou après un échec),
+# on continue de servir la dernière version valide.
+# Avec le cache partagé (shared_cache), un jeu versionné n'est chargé depuis la
+# BDD que par un seul nœud par version : les autres le relisent dans Redis.
+
+
+class _Dataset:
+    def __init__(self, name, loader, ttl, version, codec):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.version_fn = version
+        self.codec = codec
+        self.value = None
+        self.version = None
+        self.loaded_at = None
+        self.next_attempt = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+
+class DataProvider:
+    def __init__(self, ttl=DATA_TTL_SECONDS, retry_delay=DATA_RETRY_SECONDS, clock=time.monotonic, shared=shared_cache):
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self._clock = clock
+        self.shared = shared
+        self._datasets = {}
+
+    def register(self, name, loader, ttl=None, version=None, codec=None):
+        # loader  : fonction sans argument qui renvoie le jeu de données (ou lève une exception)
+        # version : fonction optionnelle peu coûteuse ; si elle renvoie la même valeur
+        #           qu'au dernier chargement, le rechargement complet est évité
+        # codec   : (dump, load) vers / depuis des DataFrames, listes, dicts... pour le
+        #           cache partagé, si le jeu n'en est pas déjà fait ; seuls les jeux
+        #           versionnés y sont partagés
+        self._datasets[name] = _Dataset(name, loader, self.ttl if ttl is None else ttl, version, codec)
+
+    def get(self, name, default=None):
+        ds = self._datasets[name]
+        now = self._clock()
+
+        if ds.value is None:
+            # Premier accès : chargement synchrone (un seul thread le fait)
+            if now >= ds.next_attempt:
+                with ds.lock:
+                    if ds.value is None and self._clock() >= ds.next_attempt:
+                        self._load(ds)
+        elif now - ds.loaded_at >= ds.ttl and now >= ds.next_attempt and not ds.refreshing:
+            # Données périmées : on sert l'ancienne version et on rafraîchit en arrière-plan
+            ds.refreshing = True
+            threading.Thread(target=self._refresh, args=(ds,), daemon=True).start()
+
+        return default if ds.value is None else ds.value
+
+    def warm(self):
+        # Chargement immédiat de tous les jeux (gunicorn --preload : fait une seule
+        # fois dans le processus maître, puis partagé en copy-on-write par les workers)
+        return {name: self.get(name) is not None for name in self._datasets}
+
+    def is_ready(self, name):
+        return self._datasets[name].value is not None
+
+    def prefetch(self, name):
+        # Comme get, sans jamais attendre : le chargement initial part en arrière-plan
+        # (pages et /readyz pendant que la BDD se remplit). Renvoie True si prêt
+        ds = self._datasets[name]
+        if ds.value is not None:
+            return True
+        if self._clock() >= ds.next_attempt and not ds.refreshing:
+            ds.refreshing = True
+            threading.Thread(target=self._initial_load, args=(ds,), daemon=True).start()
+        return False
+
+    def names(self):
+        return list(self._datasets)
+
+    def version(self, name):
+        # Version (issue de la BDD, donc commune à tous les workers) du snapshot servi
+        ds = self._datasets[name]
+        return ds.version if ds.value is not None else None
+
+    def invalidate(self, name=None):
+        # Force un rechargement au prochain accès (sans perdre la version servie)
+        names = [name] if name else list(self._datasets)
+        for n in names:
+            ds = self._datasets[n]
+            if ds.loaded_at is not None:
+                ds.loaded_at = -ds.ttl
+            ds.version = None
+            ds.next_attempt = 0.0
+
+    def reset(self, name=None):
+        # Oublie les données chargées : le prochain accès recharge de façon
+        # synchrone, comme au démarrage (benchmarks de démarrage à froid)
+        names = [name] if name else list(self._datasets)
+        for n in names:
+            ds = self._datasets[n]
+            with ds.lock:
+                ds.value, ds.version, ds.loaded_at, ds.next_attempt = None, None, None, 0.0
+
+    def _initial_load(self, ds):
+        try:
+            with ds.lock:
+                # Un get() concurrent a pu charger le jeu pendant l'attente du verrou
+                if ds.value is None and self._clock() >= ds.next_attempt:
+                    self._load(ds)
+        finally:
+            ds.refreshing = False
+
+    def _refresh(self, ds):
+        try:
+            with ds.lock:
+                self._load(ds)
+        finally:
+            ds.refreshing = False
+
+    def _load(self, ds):
+        try:
+            version = ds.version_fn() if ds.version_fn else None
+            if ds.value is not None and version is not None and version == ds.version:
+                ds.loaded_at = self._clock()
+                return
+
+            value = self._fetch(ds, version)
+            if value is None:
+                raise ValueError("aucune donnée renvoyée")
+            ds.value, ds.version, ds.loaded_at = value, version, self._clock()
+        except Exception as e:
+            print(f"Erreur de chargement du jeu de données '{ds.name}': {e}")
+            ds.next_attempt = self._clock() + self.retry_delay
+
+    def _fetch(self, ds, version):
+        if self.shared is None or version is None:
+            return ds.loader()
+        dump, load = ds.codec or (None, None)
+        return self.shared.get_or_compute(f"dataset:{ds.name}:{digest(version)}", ds.loader, dump, load)
+
+
+# Instance partagée par toutes les pages
+provider = DataProvider()
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from live_updates import series_values
+
+# --- Réduction des séries temporelles avant affichage ---
+# Deux étages :
+# 1. en SQL (queries.read_metrics_range) : agrégation par intervalles de temps
+#    quand la plage contient beaucoup plus de lignes que le budget ;
+# 2. ici : LTTB (Largest-Triangle-Three-Buckets), qui choisit dans chaque
+#    intervalle le point formant le plus grand triangle avec ses voisins.
+#    Contrairement à une moyenne, les pics restent visibles.
+
+
+def lttb(x, y, threshold):
+    # Indices des `threshold` points à garder (le premier et le dernier toujours)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+    # threshold - 2 intervalles entre le premier et le dernier point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Aire (au facteur 1/2 près) du triangle (point retenu, candidat, moyenne suivante)
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(df, column, budget):
+    # Lignes à tracer pour une colonne : au plus `budget` points
+    if len(df) <= budget:
+        return df
+    epoch = pd.to_datetime(df['date']).astype('int64').to_numpy()
+    return df.iloc[lttb(epoch, df[column].to_numpy(), budget)]
+
+
+def trace_xy(df, column, budget):
+    # (x, y) d'une trace, en listes
+    df = downsample(df, column, budget)
+    return series_values(df['date']), series_values(df[column])
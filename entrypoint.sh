@@ -6,9 +6,23 @@ set -e
 echo "--- DÉMARRAGE DU CONTENEUR ---"
 
 # 1. Lancer le script de chargement de données
-# Grâce à notre modification Python, il va gérer l'attente et la vérification tout seul
-python scripts/load_data.py
+# Il gère seul l'attente de la BDD (backoff exponentiel). Par défaut il tourne en
+# arrière-plan : l'application répond tout de suite (/healthz, /readyz, pages en
+# "chargement" qui se remplissent dès que les données sont prêtes).
+# LOAD_IN_BACKGROUND=0 : ancien comportement, l'application attend la fin du chargement
+if [ "${LOAD_IN_BACKGROUND:-1}" = "1" ]; then
+    python scripts/load_data.py &
+else
+    python scripts/load_data.py
+fi
 
 # 2. Lancer l'application principale
-echo "--- LANCEMENT DE DASH ---"
-exec python app.py
\ No newline at end of file
+# APP_MODE=dev  : serveur de développement Flask (debug, un seul processus)
+# APP_MODE=prod : gunicorn (plusieurs workers, voir gunicorn.conf.py)
+if [ "${APP_MODE:-dev}" = "prod" ]; then
+    echo "--- LANCEMENT DE DASH (gunicorn) ---"
+    exec gunicorn -c gunicorn.conf.py app:server
+else
+    echo "--- LANCEMENT DE DASH ---"
+    exec python app.py
+fi
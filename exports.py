@@ -0,0 +1,410 @@
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+from flask import Response, jsonify, request, send_file
+from sqlalchemy import text
+
+from config import (get_engine, EXPORT_DIR, EXPORT_CHUNKSIZE, EXPORT_GZIP_LEVEL, EXPORT_MAX_JOBS,
+                    EXPORT_MAX_STREAMS, EXPORT_RETENTION_SECONDS)
+import queries
+
+# pyarrow est optionnel : sans lui, seul l'export CSV est proposé
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# --- Export des données brutes (CSV / Parquet) ---
+# Ce que montre la table brute de data_manager (filtre + tri du DataTable) est
+# exporté sans jamais être chargé en entier. En CSV sous PostgreSQL, le serveur
+# produit lui-même le fichier (COPY ... TO STDOUT), lu par blocs ; sinon (Parquet,
+# SQLite) les lignes sortent par un curseur côté serveur, EXPORT_CHUNKSIZE à la
+# fois, et chaque morceau est encodé (CSV ou groupe de lignes Parquet). Le CSV est
+# compressé gzip au fil de l'eau. La mémoire reste celle d'un bloc, quelle que soit la taille.
+# - GET  /export/athlete_events     : téléchargement en flux direct (503 quand
+#                                     EXPORT_MAX_STREAMS flux sont déjà en cours) ;
+# - POST /export/jobs               : export long en tâche de fond, écrit dans EXPORT_DIR ;
+# - GET  /export/jobs/<id>          : avancement (lignes écrites / total) ;
+# - GET  /export/jobs/<id>/download : fichier terminé.
+# L'état des tâches est un fichier JSON par tâche : tous les workers le voient.
+
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+# Types Parquet explicites : les morceaux ont tous le même schéma
+PARQUET_TYPES = {'ID': 'int32', 'Age': 'int8', 'Year': 'int16', 'Height': 'float32', 'Weight': 'float32'}
+# COPY : taille des blocs transmis au générateur, et blocs en attente au plus
+COPY_BLOCK_BYTES = 1 << 20
+COPY_QUEUE_BLOCKS = 8
+# Délai suggéré au client quand tous les flux sont occupés (secondes)
+STREAM_RETRY_AFTER = 10
+
+# Chaque export garde une connexion du pool jusqu'à son dernier octet : sans
+# limite, quelques téléchargements lents videraient le pool des callbacks
+_job_slots = threading.BoundedSemaphore(EXPORT_MAX_JOBS)
+_stream_slots = threading.BoundedSemaphore(EXPORT_MAX_STREAMS)
+
+
+def parquet_available():
+    return pa is not None
+
+
+def filename(fmt, compress):
+    suffix = FORMATS[fmt][1] + ('.gz' if compress and fmt == 'csv' else '')
+    return 'athlete_events' + suffix
+
+
+# --- Encodage en flux ---
+class _Sink:
+    # Fichier en écriture seule dont on retire les octets au fur et à mesure
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _csv_bytes(frames):
+    header = True
+    for df in frames:
+        yield df.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+
+class _CopyPipe:
+    # Fichier passé à copy_expert : psycopg2 y écrit ligne par ligne, les lignes
+    # sont regroupées en blocs déposés dans une file bornée (le COPY attend quand
+    # le client lit moins vite) ; write échoue si le générateur a été abandonné
+    def __init__(self, blocks, stop):
+        self.blocks = blocks
+        self.stop = stop
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        if self.size >= COPY_BLOCK_BYTES:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.parts:
+            self.put(b''.join(self.parts))
+            self.parts, self.size = [], 0
+
+    def put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.blocks.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
+        raise IOError("export abandonné")
+
+
+def _copy_csv(engine, where, params):
+    # CSV produit par PostgreSQL : COPY n'accepte pas de paramètres. Les valeurs du
+    # filtre (chaînes et nombres, toujours passées en paramètres par
+    # filter_query_to_sql) sont liées par cursor.mogrify, c'est-à-dire par la même
+    # citation côté client que psycopg2 applique à toute requête paramétrée
+    column_list = ', '.join(f'"{c}"' for c in queries.ATHLETE_COLUMNS)
+    select = text(f"SELECT {column_list} FROM athlete_events{where}").compile(dialect=engine.dialect)
+    select_params = select.construct_params(params)
+    blocks = queue.Queue(maxsize=COPY_QUEUE_BLOCKS)
+    stop = threading.Event()
+    errors = []
+
+    def run():
+        pipe = _CopyPipe(blocks, stop)
+        try:
+            raw = engine.raw_connection()
+            try:
+                with raw.cursor() as cursor:
+                    sql = cursor.mogrify(str(select), select_params)
+                    cursor.copy_expert(b"COPY (" + sql + b") TO STDOUT WITH (FORMAT csv, HEADER)", pipe)
+                pipe.flush()
+            finally:
+                raw.close()
+        except Exception as e:
+            if not stop.is_set():
+                errors.append(e)
+        finally:
+            try:
+                pipe.put(None)
+            except IOError:
+                pass
+
+    threading.Thread(target=run, name='export-copy', daemon=True).start()
+    try:
+        while True:
+            block = blocks.get()
+            if block is None:
+                break
+            yield block
+        if errors:
+            raise errors[0]
+    finally:
+        # Client déconnecté : le COPY s'interrompt à sa prochaine écriture
+        stop.set()
+
+
+def _parquet_bytes(frames, compression):
+    # Un groupe de lignes par morceau ; le pied de fichier est écrit à la fermeture
+    schema = pa.schema([
+        (c, getattr(pa, PARQUET_TYPES[c])() if c in PARQUET_TYPES else pa.string())
+        for c in queries.ATHLETE_COLUMNS
+    ])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    try:
+        for df in frames:
+            writer.write_table(pa.Table.from_pandas(df, preserve_index=False).cast(schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(chunks):
+    # wbits=31 : en-tête et somme de contrôle gzip, compression en continu
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(engine, fmt='csv', compress=True, filter_query='', sort_by=None,
+                  chunksize=EXPORT_CHUNKSIZE, progress=None):
+    # Générateur des octets du fichier exporté ; progress(lignes) après chaque morceau
+    where, params = queries.filter_query_to_sql(filter_query)
+    where += queries.sort_by_to_sql(sort_by)
+    if fmt == 'csv' and engine.dialect.name == 'postgresql':
+        encoded = _copy_csv(engine, where, params)
+        if progress is not None:
+            encoded = _counted_lines(encoded, progress)
+        return _gzip(encoded) if compress else encoded
+
+    frames = queries.iter_athlete_events(engine, where=where, params=params, chunksize=chunksize)
+    if progress is not None:
+        frames = _counted(frames, progress)
+    if fmt == 'parquet':
+        # Parquet compresse lui-même ses colonnes
+        return _parquet_bytes(frames, 'gzip' if compress else 'snappy')
+    encoded = _csv_bytes(frames)
+    return _gzip(encoded) if compress else encoded
+
+
+def _counted(frames, progress):
+    rows = 0
+    for df in frames:
+        yield df
+        rows += len(df)
+        progress(rows)
+
+
+def _counted_lines(blocks, progress, every=EXPORT_CHUNKSIZE):
+    # Avancement du COPY en lignes de texte (en-tête exclu), signalé tous les `every`
+    lines = reported = 0
+    for block in blocks:
+        yield block
+        lines += block.count(b'\n')
+        if lines - reported >= every:
+            reported = lines
+            progress(max(lines - 1, 0))
+    progress(max(lines - 1, 0))
+
+
+# --- Tâches de fond ---
+def _job_path(job_id, suffix='.json'):
+    return os.path.join(EXPORT_DIR, job_id + suffix)
+
+
+def write_job(job_id, **state):
+    # Remplacement atomique (voir health.write_load_status)
+    state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    fd, tmp = tempfile.mkstemp(dir=EXPORT_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, _job_path(job_id))
+    return state
+
+
+def read_job(job_id):
+    if not job_id or not JOB_ID.match(job_id):
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def prune_jobs(retention=EXPORT_RETENTION_SECONDS):
+    # Fichiers des tâches plus anciennes que la rétention (état + export)
+    limit = time.time() - retention
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def start_job(fmt='csv', compress=True, filter_query='', sort_by=None):
+    if fmt not in FORMATS or (fmt == 'parquet' and not parquet_available()):
+        raise ValueError(f"Format d'export indisponible : {fmt}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    prune_jobs()
+    job_id = uuid.uuid4().hex
+    job = {'id': job_id, 'state': 'queued', 'format': fmt, 'compress': compress,
+           'filter_query': filter_query or '', 'sort_by': sort_by or [],
+           'filename': filename(fmt, compress), 'rows': 0, 'total': None}
+    write_job(job_id, **job)
+    threading.Thread(target=_run_job, args=(job,), name=f'export-{job_id[:8]}', daemon=True).start()
+    return job_id
+
+
+def _run_job(job):
+    job_id = job['id']
+    # Au plus EXPORT_MAX_JOBS exports en parallèle par processus (une connexion chacun)
+    with _job_slots:
+        start = time.perf_counter()
+        output = _job_path(job_id, '.part')
+        try:
+            engine = get_engine()
+            if engine is None:
+                raise RuntimeError("BDD indisponible")
+            job = write_job(job_id, **dict(job, state='running',
+                                           total=queries.count_athlete_events(engine, job['filter_query'])))
+
+            def progress(rows):
+                write_job(job_id, **dict(job, rows=rows))
+
+            size = 0
+            with open(output, 'wb') as f:
+                for chunk in export_chunks(engine, job['format'], job['compress'], job['filter_query'],
+                                           job['sort_by'], progress=progress):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(output, _job_path(job_id, FORMATS[job['format']][1]))
+            final = read_job(job_id) or job
+            write_job(job_id, **dict(final, state='done', bytes=size,
+                                     seconds=round(time.perf_counter() - start, 2)))
+        except Exception as e:
+            print(f"Erreur d'export {job_id}: {e}")
+            write_job(job_id, **dict(job, state='failed', error=f"{type(e).__name__}: {e}"))
+            if os.path.exists(output):
+                os.remove(output)
+
+
+def describe_job(job):
+    # Texte court pour la page
+    if job is None:
+        return "Export introuvable (expiré ?)"
+    if job['state'] == 'failed':
+        return f"Échec de l'export : {job.get('error')}"
+    if job['state'] == 'done':
+        return f"Export terminé : {job['rows']} lignes, {job['bytes'] / 1e6:.1f} Mo en {job['seconds']} s"
+    if job.get('total'):
+        return f"Export en cours : {job['rows']} / {job['total']} lignes ({100 * job['rows'] // job['total']} %)"
+    return "Export en préparation..."
+
+
+# --- Routes ---
+def _export_args(values):
+    fmt = values.get('format', 'csv')
+    compress = values.get('gzip', '1') == '1'
+    try:
+        sort_by = json.loads(values.get('sort') or '[]')
+    except ValueError:
+        sort_by = []
+    return fmt, compress, values.get('filter', ''), sort_by
+
+
+def init_app(app):
+    server = app.server
+
+    @server.route('/export/athlete_events')
+    def export_stream():
+        fmt, compress, filter_query, sort_by = _export_args(request.args)
+        if fmt not in FORMATS or (fmt == 'parquet' and not parquet_available()):
+            return jsonify(error=f"format indisponible : {fmt}"), 400
+        engine = get_engine()
+        if engine is None:
+            return jsonify(error="BDD indisponible"), 503
+        if not _stream_slots.acquire(blocking=False):
+            return jsonify(error="trop d'exports en cours, réessayez plus tard"), 503, \
+                {'Retry-After': str(STREAM_RETRY_AFTER)}
+        try:
+            # Le générateur garde sa connexion jusqu'au dernier octet (ou à la déconnexion du client)
+            body = export_chunks(engine, fmt, compress, filter_query, sort_by)
+            mimetype = 'application/gzip' if compress and fmt == 'csv' else FORMATS[fmt][0]
+            response = Response(body, mimetype=mimetype, headers={
+                'Content-Disposition': f'attachment; filename="{filename(fmt, compress)}"',
+                'X-Accel-Buffering': 'no',
+            })
+        except Exception:
+            _stream_slots.release()
+            raise
+        # Libéré par le serveur WSGI à la fin de la réponse, même interrompue
+        response.call_on_close(_stream_slots.release)
+        return response
+
+    @server.route('/export/jobs', methods=['POST'])
+    def export_job_start():
+        fmt, compress, filter_query, sort_by = _export_args(request.values)
+        try:
+            job_id = start_job(fmt, compress, filter_query, sort_by)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        return jsonify(id=job_id, status=f'/export/jobs/{job_id}', download=f'/export/jobs/{job_id}/download'), 202
+
+    @server.route('/export/jobs/<job_id>')
+    def export_job_status(job_id):
+        job = read_job(job_id)
+        if job is None:
+            return jsonify(error="export inconnu"), 404
+        return jsonify(job)
+
+    @server.route('/export/jobs/<job_id>/download')
+    def export_job_download(job_id):
+        job = read_job(job_id)
+        if job is None:
+            return jsonify(error="export inconnu"), 404
+        if job['state'] != 'done':
+            return jsonify(job), 409
+        return send_file(os.path.abspath(_job_path(job_id, FORMATS[job['format']][1])),
+                         as_attachment=True, download_name=job['filename'])
@@ -0,0 +1,183 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+from config import FIGURE_CACHE_SIZE, FIGURE_CACHE_DIR, FIGURE_CACHE_DISK_MAX
+from data_provider import provider
+from figure_payload import compact_figure
+from shared_cache import shared_cache, digest
+
+# --- Cache des figures ---
+# Les entrées des callbacks (saison, sport, pays...) forment un petit espace fini :
+# on garde le résultat déjà converti en JSON, indexé par (callback, entrées,
+# versions des données). Une requête répétée n'exécute plus ni pandas ni Plotly.
+# Quand le loader modifie les données, la version change et les anciennes
+# entrées ne sont plus jamais lues (elles sortent du LRU d'elles-mêmes).
+# Niveaux : mémoire du processus, dossier commun aux workers (optionnel), puis
+# cache partagé entre nœuds (shared_cache), où une figure n'est tracée qu'une fois.
+
+
+class LRUBackend:
+    # Cache en mémoire du processus, borné en nombre d'entrées. Les valeurs sont
+    # gardées en texte JSON (immuable) : chaque lecture renvoie un nouvel objet,
+    # qu'un appelant peut modifier sans altérer le cache
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            data = self._data[key]
+        return json.loads(data)
+
+    def set(self, key, value):
+        data = json.dumps(value)
+        with self._lock:
+            self._data[key] = data
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskBackend:
+    # Cache partagé entre les workers gunicorn d'une même machine (un fichier JSON par entrée)
+    def __init__(self, directory, max_files):
+        self.directory = directory
+        self.max_files = max_files
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value):
+        # Écriture atomique : un autre worker ne lit jamais un fichier à moitié écrit
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp, self._path(key))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def _prune(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def to_json_ready(value):
+    # Figure Plotly -> dict JSON pur et compact (sérialisé une seule fois, au moment du calcul)
+    if isinstance(value, go.Figure):
+        return compact_figure(value)
+    if isinstance(value, (tuple, list)) and any(isinstance(v, go.Figure) for v in value):
+        return [to_json_ready(v) for v in value]
+    return value
+
+
+class FigureCache:
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE, directory=FIGURE_CACHE_DIR, disk_max=FIGURE_CACHE_DISK_MAX,
+                 shared=shared_cache):
+        self.memory = LRUBackend(maxsize)
+        self.disk = DiskBackend(directory, disk_max) if directory else None
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    def memoize(self, name, datasets=()):
+        # datasets : jeux du fournisseur dont dépend le callback (leur version entre dans la clé)
+        def decorator(fn):
+            signature = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                # provider.get déclenche le chargement initial / le rafraîchissement TTL,
+                # même quand la figure sera servie depuis le cache
+                for ds in datasets:
+                    provider.get(ds)
+                versions = [provider.version(ds) for ds in datasets]
+                if any(v is None for v in versions):
+                    # Données pas encore chargées : on ne met pas en cache un graphique vide
+                    return to_json_ready(fn(*args, **kwargs))
+
+                # Arguments liés à la signature, valeurs par défaut comprises : f(a, b),
+                # f(a, b, None) et f(a, b=b) partagent la même clé
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = json.dumps([name, versions, list(bound.arguments.items())], default=str)
+                value = self.get(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+
+                self.misses += 1
+                if self.shared is not None:
+                    value = self.shared.get_or_compute(f"figure:{name}:{digest(key)}",
+                                                       lambda: to_json_ready(fn(*args, **kwargs)))
+                else:
+                    value = to_json_ready(fn(*args, **kwargs))
+                self.set(key, value)
+                return value
+            return wrapper
+        return decorator
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except OSError as e:
+                print(f"Erreur d'écriture du cache de figures: {e}")
+
+    def clear(self):
+        # Vide le cache en mémoire du processus (le dossier partagé est conservé)
+        self.memory.clear()
+
+    def stats(self):
+        stats = {'hits': self.hits, 'misses': self.misses, 'entries': len(self.memory)}
+        if self.shared is not None:
+            stats['shared'] = self.shared.stats()
+        return stats
+
+
+# Instance partagée par toutes les pages
+figure_cache = FigureCache()
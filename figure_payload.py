@@ -0,0 +1,184 @@
+import base64
+import json
+import re
+
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+from config import FIGURE_COMPACT, FIGURE_SIGNIFICANT_DIGITS
+import metrics
+
+# --- Figures compactes envoyées au navigateur ---
+# Étage de sortie appliqué à toutes les figures des callbacks (figure_cache) :
+# 1. gabarit : le template Plotly par défaut (~7 ko par figure, dont les styles
+#    de 25 types de traces et des scènes 3D / cartes / polaires) est réduit aux
+#    types de traces présents et aux parties de mise en page utilisées ;
+# 2. valeurs : arrondies à FIGURE_SIGNIFICANT_DIGITS chiffres significatifs
+#    (au-delà, rien ne change à l'affichage ni au survol) ;
+# 3. tableaux numériques : encodés en binaire typé (base64, format
+#    {'dtype', 'bdata'} lu nativement par plotly.js) dans le plus petit type
+#    qui les représente (i1 / u1 / i2 / u2 / i4 / u4, f4 sinon) ;
+# 4. dates en x / y des séries temporelles : millisecondes depuis l'epoch (f8)
+#    sur un axe de type 'date', au lieu de chaînes ISO deux fois plus longues.
+# binary=False garde les listes telles quelles (arrondies) : traces du mode
+# live, auxquelles dash.Patch ajoute des points (impossible sur un tableau binaire).
+
+# Parties du template jamais utilisées par les pages (graphiques 2D uniquement)
+UNUSED_TEMPLATE_LAYOUT = ('scene', 'ternary', 'polar', 'geo', 'mapbox', 'map', 'annotationdefaults', 'shapedefaults')
+INT_DTYPES = ['i1', 'u1', 'i2', 'u2', 'i4', 'u4']
+# Les listes plus courtes ne gagnent rien à être encodées
+MIN_BINARY_LENGTH = 8
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+
+def _decode(spec):
+    array = np.frombuffer(base64.b64decode(spec['bdata']), dtype=spec['dtype'])
+    return array.reshape(spec['shape']) if 'shape' in spec else array
+
+
+def _encode(array):
+    spec = {'dtype': array.dtype.str.lstrip('<|='), 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+    if array.ndim > 1:
+        spec['shape'] = list(array.shape)
+    return spec
+
+
+def _numeric_list(value):
+    # Liste plate de nombres (None = valeur manquante), sinon None
+    numbers = 0
+    for v in value:
+        if v is None:
+            continue
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return None
+        numbers += 1
+    if not numbers:
+        return None
+    floats = any(v is None or isinstance(v, float) for v in value)
+    return np.array([np.nan if v is None else v for v in value], dtype='float64' if floats else 'int64')
+
+
+def round_significant(array, digits):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(array)))
+    scale = 10.0 ** (digits - 1 - np.nan_to_num(magnitude, nan=0, posinf=0, neginf=0))
+    return np.round(array * scale) / scale
+
+
+def smallest_dtype(array):
+    # Plus petit type lisible par plotly.js qui représente exactement le tableau
+    if array.dtype.kind == 'f':
+        finite = np.isfinite(array)
+        if not finite.all() or not np.array_equal(array, np.round(array)):
+            return array.astype('float32') if array.dtype.itemsize > 4 else array
+    if array.size == 0:
+        return array.astype('i1')
+    low, high = array.min(), array.max()
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return array.astype(dtype)
+    # Pas d'entiers 64 bits en JavaScript
+    return array.astype('float64')
+
+
+def _compact_value(value, binary, digits):
+    if isinstance(value, dict) and 'bdata' in value:
+        array = _decode(value)
+        binary = True
+    elif isinstance(value, list):
+        array = _numeric_list(value)
+        if array is None:
+            return value
+        binary = binary and len(value) >= MIN_BINARY_LENGTH
+    else:
+        return value
+
+    if array.dtype.kind == 'f' and digits:
+        array = round_significant(array, digits)
+    if binary:
+        return _encode(smallest_dtype(array))
+    # Listes (mode live, petites listes) : arrondies, NaN -> null
+    return [None if isinstance(v, float) and np.isnan(v) else v for v in array.tolist()]
+
+
+def _epoch_ms(value):
+    # Liste de dates ISO (sans fuseau) -> tableau f8 de millisecondes, sinon None
+    if len(value) < MIN_BINARY_LENGTH or not all(isinstance(v, str) and ISO_DATE.match(v) for v in value):
+        return None
+    dates = pd.to_datetime(pd.Series(value), format='ISO8601')
+    return (dates - pd.Timestamp(0)) / pd.Timedelta(milliseconds=1)
+
+
+def _compact_dates(figure, trace):
+    # x / y en dates ISO -> epoch ms binaire, et l'axe correspondant forcé en 'date'.
+    # Renvoie les clés converties : leurs valeurs (~1.7e12) ne doivent pas être
+    # arrondies, 6 chiffres significatifs en feraient des pas de ~17 minutes
+    converted = set()
+    for key in ('x', 'y'):
+        value = trace.get(key)
+        ms = _epoch_ms(value) if isinstance(value, list) else None
+        if ms is None:
+            continue
+        trace[key] = _encode(ms.to_numpy(dtype='float64'))
+        ref = trace.get(key + 'axis', key)
+        axis = figure['layout'].setdefault(key + 'axis' + ref[1:], {})
+        axis['type'] = 'date'
+        converted.add(key)
+    return converted
+
+
+def _compact_trace(node, binary, digits, skip=()):
+    for key, value in node.items():
+        if key in skip:
+            continue
+        if isinstance(value, dict) and 'bdata' not in value:
+            _compact_trace(value, binary, digits)
+        else:
+            node[key] = _compact_value(value, binary, digits)
+
+
+def _uses_default_colorscale(figure):
+    # Une trace colore par valeur sans échelle explicite (ni la sienne, ni celle d'un coloraxis)
+    coloraxes = {k: v for k, v in figure.get('layout', {}).items() if k.startswith('coloraxis')}
+    for trace in figure.get('data', []):
+        for holder in (trace, trace.get('marker', {})):
+            if 'colorscale' in holder:
+                continue
+            axis = holder.get('coloraxis')
+            if axis and 'colorscale' in coloraxes.get(axis, {}):
+                continue
+            color = holder.get('color') if holder is not trace else trace.get('z')
+            if isinstance(color, (list, dict)) or axis:
+                return True
+    return False
+
+
+def trim_template(figure):
+    template = figure.get('layout', {}).get('template')
+    if not template:
+        return
+    types = {trace.get('type', 'scatter') for trace in figure.get('data', [])}
+    template['data'] = {t: v for t, v in template.get('data', {}).items() if t in types}
+    unused = UNUSED_TEMPLATE_LAYOUT + (() if _uses_default_colorscale(figure) else ('colorscale',))
+    template['layout'] = {k: v for k, v in template.get('layout', {}).items() if k not in unused}
+
+
+def compact_figure(fig, binary=True, digits=FIGURE_SIGNIFICANT_DIGITS):
+    # go.Figure (ou dict) -> dict JSON pur, compacté si FIGURE_COMPACT
+    with metrics.stage('serialize'):
+        figure = json.loads(json.dumps(fig, cls=PlotlyJSONEncoder))
+        if not FIGURE_COMPACT:
+            return figure
+        trim_template(figure)
+        figure.setdefault('layout', {})
+        for trace in figure.get('data', []):
+            dates = _compact_dates(figure, trace) if binary else ()
+            _compact_trace(trace, binary, digits, skip=dates)
+    return figure
+
+
+def payload_size(value):
+    # Taille JSON (octets) de la réponse envoyée au navigateur
+    return len(json.dumps(value, cls=PlotlyJSONEncoder))
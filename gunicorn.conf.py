@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+
+# --- Configuration gunicorn (mode production) ---
+# Lancement : gunicorn -c gunicorn.conf.py app:server  (voir entrypoint.sh, APP_MODE=prod)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8050')}"
+
+# Processus x threads : les callbacks passent surtout du temps en I/O BDD et en
+# sérialisation, quelques threads par worker suffisent
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# L'application (et les données, voir on_starting) est chargée une seule fois dans
+# le maître puis partagée en copy-on-write par les workers
+preload_app = True
+
+# Recyclage progressif des workers (évite l'accumulation mémoire), sans coupure
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+
+
+def on_starting(server):
+    # Avec preload_app, app.py est déjà importé ici : on remplit le fournisseur de
+    # données avant le fork pour que chaque worker démarre avec les agrégats en mémoire
+    if os.getenv('PRELOAD_DATA', '1') != '1':
+        return
+    # BDD injoignable (conteneur qui démarre, chargement en cours) : on ne retarde
+    # pas le démarrage, les workers chargeront les données à la demande
+    import health
+    database = health.database_status()
+    if database != 'ok':
+        server.log.info(f"Préchargement ignoré (BDD : {database})")
+        return
+    from data_provider import provider
+    ready = provider.warm()
+    server.log.info(f"Données préchargées : {ready}")
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from flask import jsonify
+from sqlalchemy import text
+
+from config import get_engine, LOAD_STATUS_FILE
+from data_provider import provider
+
+# --- Sondes de vie / disponibilité et état du chargement ---
+# Le conteneur sert les pages dès le démarrage, pendant que load_data.py remplit
+# la BDD en arrière-plan (entrypoint.sh) :
+# - /healthz : le processus répond (liveness), sans toucher à la BDD ;
+# - /readyz  : 200 quand tous les jeux de données des pages sont chargés, 503 sinon
+#   (le chargement de ceux qui manquent est lancé en arrière-plan, sans attendre).
+# Le loader publie son avancement dans LOAD_STATUS_FILE, affiché par /readyz et
+# par le bandeau d'attente des pages.
+
+LOAD_STATES = {
+    'waiting_db': "En attente de la base de données...",
+    'loading': "Chargement des données",
+    'ready': "Données chargées.",
+    'failed': "Échec du chargement des données",
+}
+
+
+def write_load_status(state, step=None, **details):
+    # Remplacement atomique : un lecteur ne voit jamais un fichier à moitié écrit
+    status = {'state': state, 'step': step, 'pid': os.getpid(),
+              'updated_at': datetime.now().isoformat(timespec='seconds'), **details}
+    directory = os.path.dirname(LOAD_STATUS_FILE) or '.'
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(status, f)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, LOAD_STATUS_FILE)
+    except OSError as e:
+        print(f"Erreur d'écriture de l'état du chargement: {e}")
+
+
+def read_load_status():
+    try:
+        with open(LOAD_STATUS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def describe_load_status(status):
+    # Texte court pour le bandeau d'attente des pages
+    if status is None:
+        return "Connexion à la base de données..."
+    message = LOAD_STATES.get(status['state'], status['state'])
+    if status.get('step'):
+        message += f" : {status['step']}"
+    if status.get('total'):
+        message += f" ({status.get('done', 0)}/{status['total']})"
+    if status.get('error'):
+        message += f" - {status['error']}"
+    return message
+
+
+def database_status():
+    engine = get_engine()
+    if engine is None:
+        return 'indisponible'
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return 'ok'
+    except Exception as e:
+        return f"erreur: {type(e).__name__}"
+
+
+def readiness():
+    # prefetch sur chaque jeu (pas de court-circuit) : tous partent en arrière-plan
+    datasets = {name: provider.prefetch(name) for name in provider.names()}
+    return all(datasets.values()), datasets
+
+
+def init_app(app):
+    @app.server.route('/healthz')
+    def healthz():
+        return jsonify(status='ok')
+
+    @app.server.route('/readyz')
+    def readyz():
+        ready, datasets = readiness()
+        body = {
+            'status': 'ready' if ready else 'loading',
+            'datasets': datasets,
+            'database': database_status(),
+            'ingestion': read_load_status(),
+        }
+        return jsonify(body), 200 if ready else 503
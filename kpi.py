@@ -0,0 +1,149 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+# --- KPIs des pages admin / développeur à partir d'agrégats quotidiens ---
+# Les cartes KPI sommaient toute la table de métriques en pandas. Chaque table
+# a maintenant son agrégat `<table>_rollup` : une ligne par jour avec, pour
+# chaque colonne suivie, la somme et le nombre de valeurs du jour ainsi que
+# leurs cumuls depuis le début de l'historique. Une fenêtre de N jours est la
+# différence de deux cumuls : une seule requête (deux lectures de l'index sur
+# day), quelle que soit la longueur de l'historique ou de la fenêtre.
+# L'agrégat est tenu à jour de façon incrémentale : seuls les jours à partir du
+# dernier jour agrégé (ou de `since`) sont recalculés.
+
+# Colonnes suivies par table (sommes pour les totaux, nombres pour les moyennes)
+KPI_COLUMNS = {
+    'admin_metrics': ['active_users', 'server_errors', 'avg_response_time_ms'],
+    'dev_metrics': ['commits_count', 'bugs_reported', 'avg_build_time_sec'],
+}
+# Fenêtres proposées par les pages (jours), et fenêtre affichée par défaut
+WINDOWS = [7, 30, 90]
+DEFAULT_WINDOW = 30
+# Jour d'un horodatage, et jour décalé de :days, selon le dialecte (SQLite des benchmarks)
+DAY_OF = {'sqlite': "date({})"}
+DAYS_BEFORE = {'sqlite': "date({}, '-' || :days || ' days')"}
+
+
+def rollup_table(table):
+    return f"{table}_rollup"
+
+
+def _sql(engine, variants, default, value):
+    return variants.get(engine.dialect.name, default).format(value)
+
+
+def _as_date(value):
+    # SQLite renvoie les dates en texte
+    return value if value is None or isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _rollup_columns(table):
+    columns = ['row_count']
+    for c in KPI_COLUMNS[table]:
+        columns += [f"{c}_sum", f"{c}_count"]
+    return columns
+
+
+def ensure_rollup(engine, table):
+    columns = ', '.join(
+        f"{c} DOUBLE PRECISION NOT NULL, cum_{c} DOUBLE PRECISION NOT NULL" for c in _rollup_columns(table)
+    )
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {rollup_table(table)} (day DATE PRIMARY KEY, {columns})"))
+
+
+def refresh_rollup(engine, table, since=None, full=False):
+    # Recalcule les jours à partir de `since` (par défaut : le dernier jour agrégé,
+    # qui a pu être complété depuis) ; full=True reconstruit tout l'agrégat.
+    # Renvoie le nombre de jours réécrits
+    rollup = rollup_table(table)
+    ensure_rollup(engine, table)
+    columns = _rollup_columns(table)
+    daily = ', '.join(
+        ['COUNT(*) AS row_count'] +
+        [f"SUM({c}) AS {c}_sum, COUNT({c}) AS {c}_count" for c in KPI_COLUMNS[table]]
+    )
+    # Cumuls : cumul de la veille de `since` + somme courante des jours recalculés
+    cumulative = ', '.join(
+        f"COALESCE((SELECT cum_{c} FROM {rollup} WHERE day < :since ORDER BY day DESC LIMIT 1), 0) "
+        f"+ SUM({c}) OVER (ORDER BY day)" for c in columns
+    )
+
+    with engine.begin() as conn:
+        if full:
+            since = None
+        elif since is None:
+            since = conn.execute(text(f"SELECT MAX(day) FROM {rollup}")).scalar()
+        since = date.min if since is None else since.date() if isinstance(since, datetime) else since
+        conn.execute(text(f"DELETE FROM {rollup} WHERE day >= :since"), {'since': since})
+        return conn.execute(text(
+            f"INSERT INTO {rollup} (day, {', '.join(columns)}, {', '.join('cum_' + c for c in columns)}) "
+            f"SELECT day, {', '.join(columns)}, {cumulative} FROM ("
+            f"  SELECT {_sql(engine, DAY_OF, 'CAST({} AS DATE)', 'date')} AS day, {daily} FROM {table}"
+            f"  WHERE date >= :since GROUP BY 1"
+            f") d"
+        ), {'since': since}).rowcount
+
+
+def sync_rollup(engine, table):
+    # Mise à jour incrémentale, puis contrôle du nombre total de lignes : si la
+    # table a été réécrite en amont du dernier jour agrégé (rechargement complet,
+    # suppression), l'agrégat est reconstruit
+    days = refresh_rollup(engine, table)
+    with engine.connect() as conn:
+        total = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        rolled = conn.execute(
+            text(f"SELECT cum_row_count FROM {rollup_table(table)} ORDER BY day DESC LIMIT 1")
+        ).scalar() or 0
+    if int(rolled) != total:
+        print(f"Agrégat KPI de '{table}' incohérent ({int(rolled)} lignes sur {total}) : reconstruction.")
+        days = refresh_rollup(engine, table, full=True)
+    return days
+
+
+def rollup_state(engine, table):
+    # Nombre de jours agrégés et dernier jour (lève une exception tant que l'agrégat n'existe pas)
+    with engine.connect() as conn:
+        days, last = conn.execute(text(f"SELECT COUNT(*), MAX(day) FROM {rollup_table(table)}")).one()
+    return {'days': days, 'last': _as_date(last)}
+
+
+def read_window(engine, table, days=None):
+    # Sommes et nombres de valeurs sur les `days` derniers jours de données
+    # (None = tout l'historique) : {'first', 'last', 'sum': {...}, 'count': {...}},
+    # ou None si l'agrégat est vide ou illisible
+    rollup = rollup_table(table)
+    columns = KPI_COLUMNS[table]
+    # Cumul à la veille de la fenêtre : dernier jour agrégé <= dernier jour - days (aucun : tout l'historique)
+    cutoff = "NULL" if days is None else _sql(engine, DAYS_BEFORE, "{} - :days", 'last.day')
+    selected = ', '.join(
+        f"last.cum_{c}_{kind} - COALESCE(base.cum_{c}_{kind}, 0) AS {c}_{kind}"
+        for c in columns for kind in ('sum', 'count')
+    )
+    query = text(
+        f"SELECT last.day, base.day AS base_day, (SELECT MIN(day) FROM {rollup}) AS first_day, {selected} "
+        f"FROM {rollup} last LEFT JOIN {rollup} base "
+        f"ON base.day = (SELECT MAX(day) FROM {rollup} WHERE day <= {cutoff}) "
+        f"WHERE last.day = (SELECT MAX(day) FROM {rollup})"
+    )
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(query, {} if days is None else {'days': days}).mappings().first()
+    except Exception as e:
+        print(f"Erreur de lecture des KPIs de '{table}': {e}")
+        return None
+    if row is None:
+        return None
+    base_day = _as_date(row['base_day'])
+    return {
+        'first': base_day + timedelta(days=1) if base_day else _as_date(row['first_day']),
+        'last': _as_date(row['day']),
+        'sum': {c: row[f"{c}_sum"] for c in columns},
+        'count': {c: int(row[f"{c}_count"]) for c in columns},
+    }
+
+
+def mean(window, column):
+    count = window['count'][column]
+    return window['sum'][column] / count if count else 0
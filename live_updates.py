@@ -0,0 +1,73 @@
+import pandas as pd
+from dash import Patch
+
+# --- Mode live des graphiques de métriques ---
+# La page garde dans un dcc.Store un curseur : date de la dernière ligne affichée,
+# son indice dans les traces et ses valeurs. À chaque tick, seules les lignes
+# à partir de cette date sont relues, et on renvoie des mises à jour partielles
+# des figures (dash.Patch) : ajout des nouveaux points, et réécriture du dernier
+# point si l'agrégation l'a modifié (jour / heure en cours). Rien n'est envoyé
+# si rien n'a changé.
+#
+# Les traces concernées doivent être construites avec des listes (.tolist()) :
+# Plotly encode sinon les colonnes numériques en tableaux binaires (bdata),
+# auxquels on ne peut pas ajouter de points côté navigateur.
+
+
+def _plain(value):
+    # Valeur sérialisable en JSON (numpy / Timestamp -> types Python)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def series_values(series):
+    return [_plain(v) for v in series]
+
+
+def make_cursor(df, columns):
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    return {
+        'last': pd.Timestamp(last['date']).isoformat(),
+        'index': len(df) - 1,
+        'row': [_plain(last[c]) for c in columns],
+    }
+
+
+def patch_figures(rows, cursor, figures, columns):
+    # rows : lignes lues depuis cursor['last'] inclus
+    # figures : pour chaque figure, liste de (indice de trace, chemin de l'attribut, colonne)
+    # Renvoie (patches, nouveau curseur) ou None si rien n'a changé
+    if rows.empty:
+        return None
+    last = pd.Timestamp(cursor['last'])
+    revised = rows[rows['date'] == last]
+    new = rows[rows['date'] > last]
+    changed = not revised.empty and [_plain(revised.iloc[0][c]) for c in columns] != cursor['row']
+    if new.empty and not changed:
+        return None
+
+    patches = []
+    for spec in figures:
+        patch = Patch()
+        for trace, path, column in spec:
+            target = patch['data'][trace]
+            for key in path:
+                target = target[key]
+            if changed and column != 'date':
+                target[cursor['index']] = _plain(revised.iloc[0][column])
+            if not new.empty:
+                target.extend(series_values(new[column]))
+        patches.append(patch)
+
+    tail = rows.iloc[-1]
+    new_cursor = {
+        'last': pd.Timestamp(tail['date']).isoformat(),
+        'index': cursor['index'] + len(new),
+        'row': [_plain(tail[c]) for c in columns],
+    }
+    return patches, new_cursor
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+# --- Index inversé des médailles (filtres croisés et exploration) ---
+# Les lignes médaillées de athlete_events sont codées en entiers, colonne par
+# colonne (codes triés par valeur). Pour chaque dimension filtrable, les numéros
+# de ligne sont regroupés par valeur (listes triées, stockées bout à bout avec
+# leurs bornes) : un filtre combiné part de la plus courte de ces listes, puis
+# vérifie les autres conditions sur les codes des seules lignes candidates.
+# Les comptages (par pays, sport, épreuve, athlète, type de médaille) sont des
+# np.bincount sur ces lignes : aucun parcours du DataFrame complet.
+
+DIMENSIONS = ['Season', 'NOC', 'Sport', 'Event', 'Year']
+COLUMNS = DIMENSIONS + ['Name', 'Medal']
+MEDALS = ['Gold', 'Silver', 'Bronze']
+
+
+class MedalIndex:
+    def __init__(self, df):
+        # df : lignes médaillées, colonnes COLUMNS (texte, 'category' ou entiers)
+        self.size = len(df)
+        self.codes = {}
+        self.values = {}
+        self._lookup = {}
+        self._postings = {}
+        for column in COLUMNS:
+            codes, uniques = pd.factorize(df[column], sort=True)
+            self.codes[column] = codes.astype(np.int32)
+            self.values[column] = np.asarray(uniques, dtype=object)
+            self._lookup[column] = {value: code for code, value in enumerate(self.values[column].tolist())}
+        for column in DIMENSIONS:
+            # Tri stable : les lignes de chaque valeur restent dans l'ordre croissant
+            codes = self.codes[column]
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.values[column])))])
+            self._postings[column] = (order, bounds)
+        self.empty = self.size == 0
+
+    @classmethod
+    def from_dataframe(cls, df):
+        # Lignes brutes de athlete_events : on ne garde que les médailles
+        medal = df['Medal'].astype(object)
+        return cls(df.loc[medal.notna() & (medal != 'None'), COLUMNS].reset_index(drop=True))
+
+    @classmethod
+    def empty_index(cls):
+        return cls(pd.DataFrame({column: pd.Series(dtype=object) for column in COLUMNS}))
+
+    # --- Cache partagé : les lignes médaillées en colonnes 'category' (dictionnaires
+    # Arrow), l'index (listes de lignes) est recalculé à la lecture ---
+    def to_parts(self):
+        return {'frame': pd.DataFrame({
+            column: pd.Categorical.from_codes(self.codes[column], pd.Index(self.values[column].tolist()))
+            for column in COLUMNS
+        })}
+
+    @classmethod
+    def from_parts(cls, parts):
+        return cls(parts['frame'])
+
+    # --- Filtres ---
+    def _codes_of(self, column, value):
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        lookup = self._lookup[column]
+        return [lookup[v] for v in values if v in lookup]
+
+    def _posting(self, column, codes):
+        order, bounds = self._postings[column]
+        parts = [order[bounds[c]:bounds[c + 1]] for c in codes]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts)) if parts else order[:0]
+
+    def rows(self, **filters):
+        # Numéros (triés) des lignes qui vérifient toutes les conditions
+        # colonne=valeur ou colonne=[valeurs] ; None ou [] = pas de condition
+        conditions = []
+        for column, value in filters.items():
+            if value is None or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            codes = self._codes_of(column, value)
+            if not codes:
+                return np.empty(0, dtype=np.int32)
+            bounds = self._postings[column][1]
+            conditions.append((sum(bounds[c + 1] - bounds[c] for c in codes), column, codes))
+        if not conditions:
+            return np.arange(self.size, dtype=np.int32)
+
+        conditions.sort(key=lambda condition: condition[0])
+        _, column, codes = conditions[0]
+        rows = self._posting(column, codes)
+        for _, column, codes in conditions[1:]:
+            if not len(rows):
+                break
+            found = self.codes[column][rows]
+            rows = rows[found == codes[0] if len(codes) == 1 else np.isin(found, codes)]
+        return rows
+
+    # --- Comptages ---
+    def count_by(self, column, rows, n=None):
+        # Médailles par valeur de `column` sur les lignes données, décroissant
+        # (à égalité : ordre des valeurs) -> DataFrame [column, 'Count']
+        counts = np.bincount(self.codes[column][rows], minlength=len(self.values[column]))
+        present = np.flatnonzero(counts)
+        present = present[np.argsort(-counts[present], kind='stable')][:n]
+        return pd.DataFrame({column: self.values[column][present], 'Count': counts[present]})
+
+    def medal_breakdown(self, column, rows, n=None):
+        # Comme count_by, détaillé par type de médaille, pour les n valeurs qui en
+        # ont le plus -> DataFrame [column, 'Gold', 'Silver', 'Bronze', 'Count']
+        top = self.count_by(column, rows, n)
+        medals = self.values['Medal'].tolist()
+        width = max(len(medals), 1)
+        pairs = self.codes[column][rows].astype(np.int64) * width + self.codes['Medal'][rows]
+        counts = np.bincount(pairs, minlength=len(self.values[column]) * width).reshape(-1, width)
+        selected = counts[[self._lookup[column][value] for value in top[column].tolist()]]
+        data = {column: top[column].to_numpy()}
+        for medal in MEDALS:
+            data[medal] = selected[:, medals.index(medal)] if medal in medals else np.zeros(len(top), dtype=np.int64)
+        data['Count'] = top['Count'].to_numpy()
+        return pd.DataFrame(data)
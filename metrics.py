@@ -0,0 +1,211 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import inspect
+import threading
+import time
+
+from flask import Response
+
+from config import METRICS_ENABLED
+
+# --- Instrumentation des callbacks et des requêtes SQL ---
+# Désactivé (METRICS_ENABLED=0) : rien n'est enveloppé, aucun listener n'est posé,
+# la route /metrics n'existe pas, `stage()` renvoie un contexte vide partagé.
+# Activé : chaque callback est chronométré (total + part SQL + part sérialisation),
+# avec la taille de la réponse JSON, et exposé au format Prometheus sur /metrics.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            base = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), label_values + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{base} {total}")
+            lines.append(f"{self.name}_count{base} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _samples(name, help_text, kind, values):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{{{key}}} {value}" if key else f"{name} {value}" for key, value in values]
+    return lines
+
+
+CALLBACK_DURATION = Histogram('dataviz_callback_duration_seconds', 'Durée totale des callbacks Dash (sérialisation comprise)', ('callback',))
+CALLBACK_STAGE = Counter('dataviz_callback_stage_seconds_total', 'Temps cumulé par étape (sql, serialize, other)', ('callback', 'stage'))
+CALLBACK_PAYLOAD = Histogram('dataviz_callback_payload_bytes', 'Taille de la réponse JSON des callbacks', ('callback',), SIZE_BUCKETS)
+CALLBACK_ERRORS = Counter('dataviz_callback_errors_total', 'Callbacks terminés par une exception', ('callback',))
+DB_QUERY_DURATION = Histogram('dataviz_db_query_duration_seconds', 'Durée des requêtes SQL')
+INSTRUMENTS = [CALLBACK_DURATION, CALLBACK_STAGE, CALLBACK_PAYLOAD, CALLBACK_ERRORS, DB_QUERY_DURATION]
+
+# Temps par étape du callback en cours (None hors callback ou si désactivé)
+_current_stages = contextvars.ContextVar('dataviz_callback_stages', default=None)
+_NOOP = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        stages = _current_stages.get()
+        if stages is not None:
+            stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def stage(name):
+    # Chronomètre une étape (ex : 'serialize') à l'intérieur du callback courant
+    return _Stage(name) if METRICS_ENABLED else _NOOP
+
+
+def _instrument(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        stages = {'sql': 0.0, 'serialize': 0.0}
+        token = _current_stages.set(stages)
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            CALLBACK_ERRORS.inc(1, name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_stages.reset(token)
+            CALLBACK_DURATION.observe(elapsed, name)
+            for stage_name, seconds in stages.items():
+                CALLBACK_STAGE.inc(seconds, name, stage_name)
+            CALLBACK_STAGE.inc(max(elapsed - stages['sql'] - stages['serialize'], 0.0), name, 'other')
+        # Dash renvoie ici la réponse déjà sérialisée en JSON
+        if isinstance(result, str):
+            CALLBACK_PAYLOAD.observe(len(result), name)
+        return result
+
+    wrapper.__dataviz_instrumented__ = True
+    return wrapper
+
+
+def _instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('dataviz_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['dataviz_query_start'].pop()
+        DB_QUERY_DURATION.observe(elapsed)
+        stages = _current_stages.get()
+        if stages is not None:
+            stages['sql'] += elapsed
+
+
+def render():
+    # Texte au format d'exposition Prometheus
+    from config import pool_stats
+    from figure_cache import figure_cache
+    from request_log import request_log
+
+    lines = []
+    for instrument in INSTRUMENTS:
+        lines += instrument.render()
+
+    cache = figure_cache.stats()
+    lookups = cache['hits'] + cache['misses']
+    lines += _samples('dataviz_figure_cache_hits_total', 'Figures servies depuis le cache', 'counter', [('', cache['hits'])])
+    lines += _samples('dataviz_figure_cache_misses_total', 'Figures recalculées', 'counter', [('', cache['misses'])])
+    lines += _samples('dataviz_figure_cache_hit_ratio', 'Taux de succès du cache de figures', 'gauge',
+                      [('', round(cache['hits'] / lookups, 4) if lookups else 0)])
+    lines += _samples('dataviz_figure_cache_entries', 'Entrées du cache de figures en mémoire', 'gauge', [('', cache['entries'])])
+    if 'shared' in cache:
+        # Cache partagé entre nœuds (jeux de données et figures confondus)
+        lines += _samples('dataviz_shared_cache_lookups_total', 'Cache partagé : lectures, calculs, attentes, erreurs',
+                          'counter', [(f'result="{key}"', value) for key, value in sorted(cache['shared'].items())])
+    lines += _samples('dataviz_db_pool', 'État du pool de connexions SQLAlchemy', 'gauge',
+                      [(f'stat="{key}"', value) for key, value in sorted(pool_stats().items())])
+    lines += _samples('dataviz_request_log_entries_total', 'Journal des requêtes : entrées écrites / perdues', 'counter',
+                      [('status="flushed"', request_log.flushed), ('status="failed"', request_log.failed)])
+    lines += _samples('dataviz_request_log_buffered', 'Entrées en attente dans le tampon', 'gauge', [('', len(request_log.buffer))])
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    if not METRICS_ENABLED:
+        return
+
+    from dash import _callback
+    from config import get_engine
+
+    # Callbacks enregistrés par les pages (Dash les recopie dans app.callback_map
+    # au premier appel : il suffit de les envelopper ici)
+    # (les callbacks exécutés dans le navigateur n'ont pas de fonction Python)
+    for entry in _callback.GLOBAL_CALLBACK_MAP.values():
+        fn = entry.get('callback')
+        if fn is None:
+            continue
+        if not getattr(fn, '__dataviz_instrumented__', False) and not inspect.iscoroutinefunction(fn):
+            entry['callback'] = _instrument(fn)
+
+    engine = get_engine()
+    if engine is not None:
+        _instrument_engine(engine)
+
+    @app.server.route('/metrics')
+    def prometheus_metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
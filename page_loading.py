@@ -0,0 +1,58 @@
+import dash
+from dash import dcc, html, callback
+from dash.dependencies import Input, Output
+
+from data_provider import provider
+import health
+
+# --- État "chargement" des pages ---
+# Tant que les jeux de données d'une page ne sont pas prêts (BDD en cours de
+# remplissage au démarrage du conteneur), la page ne bloque pas la requête :
+# elle affiche un bandeau d'attente, le chargement part en arrière-plan, et un
+# sondage remplace le bandeau par la page complète dès que les données sont là.
+POLL_INTERVAL_MS = 1000
+
+banner_style = {
+    'textAlign': 'center',
+    'padding': '40px',
+    'margin': '20px',
+    'backgroundColor': '#f8f9fa',
+    'borderRadius': '10px',
+    'color': '#666'
+}
+
+
+def datasets_ready(datasets):
+    return all([provider.prefetch(name) for name in datasets])
+
+
+def page_when_ready(prefix, datasets, render):
+    # Renvoie la fonction `layout` de la page : render(**kwargs) si tout est prêt,
+    # sinon le bandeau d'attente (et son callback de sondage)
+    container, poll, status = f'{prefix}-page', f'{prefix}-ready-poll', f'{prefix}-ready-status'
+
+    @callback(
+        [Output(container, 'children'),
+         Output(status, 'children')],
+        [Input(poll, 'n_intervals')],
+        prevent_initial_call=True
+    )
+    def poll_page_ready(_):
+        if datasets_ready(datasets):
+            # Le sondage disparaît avec le bandeau
+            return render(), dash.no_update
+        return dash.no_update, health.describe_load_status(health.read_load_status())
+
+    def layout(**kwargs):
+        if datasets_ready(datasets):
+            return render(**kwargs)
+        return html.Div(id=container, children=[
+            html.Div([
+                html.H3("Chargement des données en cours..."),
+                html.P(health.describe_load_status(health.read_load_status()), id=status),
+                html.P("La page s'affichera automatiquement dès que les données seront prêtes."),
+            ], style=banner_style),
+            dcc.Interval(id=poll, interval=POLL_INTERVAL_MS),
+        ])
+
+    return layout
@@ -1,36 +1,58 @@
 import dash
-from dash import dcc, html, callback
-from dash.dependencies import Input, Output
+from dash import dcc, html, callback, clientside_callback
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from config import get_engine
+from config import get_engine, LIVE_INTERVAL_MS, CHART_POINT_BUDGET
+from data_provider import provider
+from figure_cache import figure_cache
+import queries
+import kpi
+from page_loading import page_when_ready
+import live_updates
+import downsampling
+from figure_payload import compact_figure
 
 dash.register_page(__name__, path='/admin', name='Administrateur', order=1)
 
-# --- 1. Récupération des données Admin ---
+# --- 1. Déclaration des données Admin (chargées à la demande) ---
 engine = get_engine()
-df = pd.DataFrame()
 
-try:
-    if engine:
-        # On récupère les 30 derniers jours triés par date
-        query = "SELECT * FROM admin_metrics ORDER BY date ASC"
-        df = pd.read_sql(query, engine)
-except Exception as e:
-    print(f"Erreur Admin SQL: {e}")
+
+def load_admin_metrics():
+    # La table n'est plus lue en entier : état de l'agrégat des KPIs (prêt dès
+    # qu'il existe), les graphiques et les KPIs interrogent la BDD par plage
+    return kpi.rollup_state(engine, 'admin_metrics')
+
+
+# La version (nombre de lignes, dernière date) évite de relire une table inchangée
+provider.register('admin_metrics', load_admin_metrics, version=lambda: queries.table_version(engine, 'admin_metrics'))
+
+
+# Colonnes tracées, et leur emplacement dans les figures (mode live)
+LIVE_COLUMNS = ['active_users', 'new_signups', 'server_errors']
+LIVE_TRACES = [
+    [(0, ('x',), 'date'), (0, ('y',), 'active_users'), (1, ('x',), 'date'), (1, ('y',), 'new_signups')],
+    [(0, ('x',), 'date'), (0, ('y',), 'server_errors'), (0, ('marker', 'color'), 'server_errors')],
+]
+# Agrégat SQL par intervalle quand la plage dépasse le budget de points
+GRAPH_AGGREGATES = {'active_users': 'max', 'new_signups': 'sum', 'server_errors': 'sum'}
+
 
 # --- 2. Calcul des KPIs (Indicateurs Clés) ---
-if not df.empty:
-    total_users_active = df['active_users'].sum()
-    avg_latency = round(df['avg_response_time_ms'].mean(), 2)
-    total_errors = df['server_errors'].sum()
-    last_update = df['date'].iloc[-1].strftime('%d/%m/%Y')
-else:
-    total_users_active = 0
-    avg_latency = 0
-    total_errors = 0
-    last_update = "N/A"
+# Lus à chaque affichage dans l'agrégat quotidien (kpi.py) : une requête, quelle que soit la fenêtre
+def compute_kpis(days=kpi.DEFAULT_WINDOW):
+    window = kpi.read_window(engine, 'admin_metrics', days)
+    if window is not None:
+        return {
+            'total_users_active': int(window['sum']['active_users']),
+            'avg_latency': round(kpi.mean(window, 'avg_response_time_ms'), 2),
+            'total_errors': int(window['sum']['server_errors']),
+            'last_update': window['last'].strftime('%d/%m/%Y'),
+        }
+    return {'total_users_active': 0, 'avg_latency': 0, 'total_errors': 0, 'last_update': "N/A"}
 
 # Style CSS pour les cartes KPIs
 card_style = {
@@ -44,82 +66,175 @@ card_style = {
 }
 
 # --- 3. Mise en page (Layout) ---
-layout = html.Div([
-    html.H2("Tableau de Bord Supervision (Admin)", style={'textAlign': 'center', 'marginBottom': '30px'}),
-
-    # --- LIGNE 1 : Les KPIs ---
-    html.Div([
+def kpi_cards(days):
+    kpis = compute_kpis(days)
+    return [
         # Carte 1
         html.Div([
-            html.H4("Trafic Mensuel", style={'color': '#666'}),
-            html.H2(f"{total_users_active}", style={'color': '#007bff'}),
-            html.P("Utilisateurs actifs cumulés")
+            html.H4("Trafic", style={'color': '#666'}),
+            html.H2(f"{kpis['total_users_active']}", style={'color': '#007bff'}),
+            html.P(f"Utilisateurs actifs cumulés ({days}j)")
         ], style=card_style),
 
         # Carte 2
         html.Div([
             html.H4("Santé Serveur", style={'color': '#666'}),
-            html.H2(f"{total_errors}", style={'color': '#dc3545'}), # Rouge si erreur
-            html.P("Total Erreurs (30j)")
+            html.H2(f"{kpis['total_errors']}", style={'color': '#dc3545'}), # Rouge si erreur
+            html.P(f"Total Erreurs ({days}j)")
         ], style=card_style),
 
         # Carte 3
         html.Div([
             html.H4("Performance Moyenne", style={'color': '#666'}),
-            html.H2(f"{avg_latency} ms", style={'color': '#28a745'}), # Vert
-            html.P("Temps de réponse moyen")
+            html.H2(f"{kpis['avg_latency']} ms", style={'color': '#28a745'}), # Vert
+            html.P(f"Temps de réponse moyen ({days}j)")
         ], style=card_style),
-        
-    ], style={'display': 'flex', 'justifyContent': 'center', 'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px'}),
+    ]
+
+
+# Fonction appelée à chaque affichage : les KPIs reflètent le dernier état des données
+def render(**kwargs):
+    # Graphiques de la période par défaut tracés ici (même cache que le callback) :
+    # la page arrive complète, sans aller-retour du navigateur au premier affichage
+    start_date = (pd.Timestamp.today() - pd.Timedelta(days=29)).date().isoformat()
+    fig_traffic, fig_errors, cursor = update_admin_graphs(start_date, None)
+
+    return html.Div([
+        html.H2("Tableau de Bord Supervision (Admin)", style={'textAlign': 'center', 'marginBottom': '30px'}),
+
+        # --- LIGNE 1 : Les KPIs (fenêtre glissante jusqu'au dernier jour de données) ---
+        dcc.RadioItems(
+            id='admin-kpi-window',
+            options=[{'label': f' {days} jours', 'value': days} for days in kpi.WINDOWS],
+            value=kpi.DEFAULT_WINDOW,
+            inline=True,
+            style={'textAlign': 'center', 'marginBottom': '10px'}
+        ),
+        html.Div(
+            kpi_cards(kpi.DEFAULT_WINDOW), id='admin-kpis',
+            style={'display': 'flex', 'justifyContent': 'center', 'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '10px'}
+        ),
+
+        html.Hr(),
+
+        # --- Période affichée (fin vide = jusqu'à la dernière donnée) + mode live ---
+        html.Div([
+            dcc.DatePickerRange(
+                id='admin-date-range',
+                start_date=start_date,
+                display_format='DD/MM/YYYY',
+                clearable=True
+            ),
+            dcc.Checklist(id='admin-live-toggle', options=[{'label': ' Mode live', 'value': 'live'}], value=['live']),
+        ], style={'display': 'flex', 'alignItems': 'center', 'gap': '20px'}),
+        dcc.Interval(id='admin-live-interval', interval=LIVE_INTERVAL_MS, disabled=cursor is None),
+        dcc.Store(id='admin-live-cursor', data=cursor),
+
+        # --- LIGNE 2 : Les Graphiques ---
+        html.Div([
+            # Graphique 1 : Évolution du trafic
+            html.Div([
+                html.H3("Évolution du Trafic Utilisateur"),
+                dcc.Graph(id='traffic-graph', figure=fig_traffic, style={'height': '400px'})
+            ], style={'width': '48%', 'padding': '1%'}),
 
-    html.Hr(),
+            # Graphique 2 : Corrélation Traffic vs Latence (ou Erreurs)
+            html.Div([
+                html.H3("Logs d'Erreurs Quotidien"),
+                dcc.Graph(id='errors-graph', figure=fig_errors, style={'height': '400px'})
+            ], style={'width': '48%', 'padding': '1%'})
+        ], style={'display': 'flex', 'justifyContent': 'space-between'})
+    ])
 
-    # --- LIGNE 2 : Les Graphiques ---
-    html.Div([
-        # Graphique 1 : Évolution du trafic
-        html.Div([
-            html.H3("Évolution du Trafic Utilisateur"),
-            dcc.Graph(id='traffic-graph', style={'height': '400px'})
-        ], style={'width': '48%', 'padding': '1%'}),
 
-        # Graphique 2 : Corrélation Traffic vs Latence (ou Erreurs)
-        html.Div([
-            html.H3("Logs d'Erreurs Quotidien"),
-            dcc.Graph(id='errors-graph', style={'height': '400px'})
-        ], style={'width': '48%', 'padding': '1%'})
-    ], style={'display': 'flex', 'justifyContent': 'space-between'})
-])
+# Tant que les données ne sont pas prêtes : bandeau d'attente, puis la page se remplit seule
+layout = page_when_ready('admin', ['admin_metrics'], render)
 
 
 # --- 4. Callbacks ---
-# Note : Ici les graphiques sont statiques car basés sur le CSV chargé au démarrage.
-# On utilise tout de même un callback pour les générer proprement au chargement.
+# Note : Les graphiques sont générés à chaque affichage à partir du dernier état
+# des données servi par le fournisseur (rafraîchi en arrière-plan).
+
+@callback(
+    Output('admin-kpis', 'children'),
+    Input('admin-kpi-window', 'value'),
+    prevent_initial_call=True
+)
+def update_admin_kpis(days):
+    # Cartes déjà calculées par render() pour la fenêtre par défaut
+    return kpi_cards(days or kpi.DEFAULT_WINDOW)
+
 
 @callback(
     [Output('traffic-graph', 'figure'),
-     Output('errors-graph', 'figure')],
-    [Input('traffic-graph', 'id')] # Dummy input juste pour déclencher le chargement
+     Output('errors-graph', 'figure'),
+     Output('admin-live-cursor', 'data')],
+    [Input('admin-date-range', 'start_date'),
+     Input('admin-date-range', 'end_date')],
+    # Période par défaut déjà tracée par render()
+    prevent_initial_call=True
 )
-def update_admin_graphs(_):
+@figure_cache.memoize('update_admin_graphs', datasets=['admin_metrics'])
+def update_admin_graphs(start_date, end_date):
+    start, end = queries.parse_date_range(start_date, end_date)
+    # Au plus CHART_POINT_BUDGET points par trace, quelle que soit la longueur de l'historique
+    df, width = queries.read_metrics_range(engine, 'admin_metrics', GRAPH_AGGREGATES, start, end, CHART_POINT_BUDGET)
     if df.empty:
         empty_fig = px.bar(title="Aucune donnée disponible")
-        return empty_fig, empty_fig
+        return empty_fig, empty_fig, None
+
+    suffix = f" (par intervalles de {pd.Timedelta(seconds=width)})" if width else ""
+    # Listes (et non colonnes pandas) : le mode live ajoute des points à ces traces
+    users_x, users_y = downsampling.trace_xy(df, 'active_users', CHART_POINT_BUDGET)
+    signups_x, signups_y = downsampling.trace_xy(df, 'new_signups', CHART_POINT_BUDGET)
+    errors_x, errors = downsampling.trace_xy(df, 'server_errors', CHART_POINT_BUDGET)
 
     # Graphique 1 : Ligne double (Active Users + New Signups)
     fig_traffic = go.Figure()
-    fig_traffic.add_trace(go.Scatter(x=df['date'], y=df['active_users'], mode='lines+markers', name='Utilisateurs Actifs'))
-    fig_traffic.add_trace(go.Bar(x=df['date'], y=df['new_signups'], name='Nouvelles Inscriptions', opacity=0.5))
-    fig_traffic.update_layout(title="Utilisateurs Actifs vs Inscriptions", hovermode="x unified")
-
-    # Graphique 2 : Barres rouges pour les erreurs
-    fig_errors = px.bar(
-        df, x='date', y='server_errors',
-        title="Distribution des erreurs serveur",
-        labels={'server_errors': 'Nombre d\'erreurs', 'date': 'Date'},
-        color='server_errors',
-        color_continuous_scale='Reds'
+    fig_traffic.add_trace(go.Scatter(x=users_x, y=users_y, mode='lines+markers', name='Utilisateurs Actifs'))
+    fig_traffic.add_trace(go.Bar(x=signups_x, y=signups_y, name='Nouvelles Inscriptions', opacity=0.5))
+    fig_traffic.update_layout(title="Utilisateurs Actifs vs Inscriptions" + suffix, hovermode="x unified")
+
+    # Graphique 2 : Barres rouges pour les erreurs (couleur = nombre d'erreurs)
+    fig_errors = go.Figure(go.Bar(x=errors_x, y=errors, marker=dict(color=errors, colorscale='Reds')))
+    fig_errors.update_layout(
+        title="Distribution des erreurs serveur" + suffix,
+        xaxis_title='Date', yaxis_title="Nombre d'erreurs"
     )
-    # On enlève la légende couleur inutile
-    fig_errors.update_layout(coloraxis_showscale=False)
 
-    return fig_traffic, fig_errors
\ No newline at end of file
+    # Mode live seulement si toutes les lignes sont tracées telles quelles et que la plage est ouverte
+    live = width is None and len(df) <= CHART_POINT_BUDGET and end is None
+    # Tableaux binaires, sauf en mode live (dash.Patch ajoute des points aux listes)
+    return (compact_figure(fig_traffic, binary=not live), compact_figure(fig_errors, binary=not live),
+            live_updates.make_cursor(df, LIVE_COLUMNS) if live else None)
+
+
+# Sondage live : activé ou non dans le navigateur (assets/clientside.js), selon la
+# case et la présence d'un curseur ; sans curseur, aucun sondage inutile
+clientside_callback(
+    ClientsideFunction(namespace='dataviz', function_name='liveDisabled'),
+    Output('admin-live-interval', 'disabled'),
+    [Input('admin-live-toggle', 'value'),
+     Input('admin-live-cursor', 'data')],
+    prevent_initial_call=True
+)
+
+
+@callback(
+    [Output('traffic-graph', 'figure', allow_duplicate=True),
+     Output('errors-graph', 'figure', allow_duplicate=True),
+     Output('admin-live-cursor', 'data', allow_duplicate=True)],
+    Input('admin-live-interval', 'n_intervals'),
+    State('admin-live-cursor', 'data'),
+    prevent_initial_call=True
+)
+def stream_admin_graphs(_, cursor):
+    # Seules les lignes à partir de la dernière date affichée sont lues et envoyées
+    if not cursor:
+        raise PreventUpdate
+    rows = queries.read_metrics_since(engine, 'admin_metrics', cursor['last'])
+    update = live_updates.patch_figures(rows, cursor, LIVE_TRACES, LIVE_COLUMNS)
+    if update is None:
+        raise PreventUpdate
+    (patch_traffic, patch_errors), new_cursor = update
+    return patch_traffic, patch_errors, new_cursor
\ No newline at end of file
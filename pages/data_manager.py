@@ -1,167 +1,292 @@
+import json
+from urllib.parse import urlencode
+
 import dash
-from dash import dcc, html, dash_table, callback
-from dash.dependencies import Input, Output
+from dash import dcc, html, dash_table, callback, clientside_callback, ctx
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import plotly.express as px
-import pandas as pd
+import plotly.graph_objects as go
 # Import de la fonction de connexion à la base de données
-from config import get_engine 
+from config import get_engine
+import exports
+from aggregates import MedalCube
+from medal_index import MedalIndex, MEDALS
+import medal_index
+from data_provider import provider
+from figure_cache import figure_cache
+import queries
+from page_loading import page_when_ready
+import snapshot
 
 # Enregistrement de la page dans le registre de Dash
 dash.register_page(__name__, path='/data_manager', name='Data Manager', order=2)
 
-# --- 1. Récupération des données depuis PostgreSQL ---
-# La connexion se fait au chargement de la page/app
+# --- 1. Déclaration des données (chargées à la demande) ---
+# Rien n'est lu à l'import : le fournisseur charge chaque jeu au premier accès
+# puis le rafraîchit en arrière-plan. On ne lit que les vues matérialisées
+# d'agrégats (quelques milliers de lignes) ; la table brute est paginée en SQL.
 engine = get_engine()
-df = pd.DataFrame()
-df_medals = pd.DataFrame()
-all_nations = []
-
-try:
-    if engine:
-        # Requête SQL pour récupérer toutes les données de la table
-        query = "SELECT * FROM athlete_events"
-        df = pd.read_sql(query, engine)
-        
-        # Préparation des données :
-        # On remplace les valeurs NULL dans 'Medal' par 'None' si ce n'est pas déjà fait en base
-        # Cela permet de filtrer facilement les médaillés
-        df_medals = df[df['Medal'] != 'None'].copy()
-        
-        # Liste de toutes les nations pour les menus déroulants
-        all_nations = sorted(df['NOC'].unique().tolist())
-    else:
-        print("Erreur: Impossible d'obtenir la connexion à la base de données (engine is None).")
-        
-except Exception as e:
-    print(f"Erreur lors de la récupération des données SQL: {e}")
 
-# Message de log si les données sont vides
-if df.empty:
-    print("Attention: Le DataFrame est vide. Vérifiez que la BDD est bien remplie via le script load_data.py")
+
+def load_medal_cube():
+    # Agrégats (Saison x Sport x NOC et Saison x Année x NOC) calculés par PostgreSQL
+    # Les callbacks ne font plus que des lectures dans ce cube
+    # Snapshot Arrow (mmap) s'il correspond à la version des vues, sinon SQL
+    version = queries.medal_fingerprint(engine)
+    by_sport = snapshot.read_frame('mv_medals_season_sport_noc', version)
+    by_year = snapshot.read_frame('mv_medals_year_noc', version)
+    sports = snapshot.read_frame('mv_sports_by_season', version)
+    if by_sport is not None and by_year is not None and sports is not None:
+        return MedalCube(by_sport, by_year, queries.sports_by_season(sports))
+    return MedalCube(
+        queries.read_medals_by_sport(engine),
+        queries.read_medals_by_year(engine),
+        queries.read_sports_by_season(engine)
+    )
+
+
+def load_nations():
+    df = snapshot.read_frame('mv_nations', queries.medal_fingerprint(engine))
+    return sorted(df['NOC'].tolist()) if df is not None else queries.read_nations(engine)
+
+
+def load_medal_index():
+    # Index inversé des lignes médaillées (exploration et filtres croisés) :
+    # colonnes utiles du snapshot Arrow, sinon lecture SQL des seules médailles
+    df = snapshot.read_frame('athlete_events', queries.medal_fingerprint(engine), columns=medal_index.COLUMNS)
+    if df is None:
+        df = queries.read_athlete_events(engine, medal_index.COLUMNS, where=" WHERE \"Medal\" <> 'None'")
+    return MedalIndex.from_dataframe(df)
+
+
+# Le cube n'est reconstruit que si la version des vues a changé (publiée par le loader après un REFRESH)
+provider.register('medal_cube', load_medal_cube, version=lambda: queries.medal_fingerprint(engine),
+                  codec=(MedalCube.to_parts, MedalCube.from_parts))
+# Liste de toutes les nations pour les menus déroulants (mv_nations suit la même version)
+provider.register('nations', load_nations, version=lambda: queries.medal_fingerprint(engine))
+provider.register('medal_index', load_medal_index, version=lambda: queries.medal_fingerprint(engine),
+                  codec=(MedalIndex.to_parts, MedalIndex.from_parts))
+
+
+EMPTY_CUBE = MedalCube.empty_cube()
+EMPTY_INDEX = MedalIndex.empty_index()
+
+# Exploration : pays -> sports -> épreuves -> athlètes (clé du filtre, colonne de l'index)
+DRILL_LEVELS = [('noc', 'NOC'), ('sport', 'Sport'), ('event', 'Event'), (None, 'Name')]
+EMPTY_DRILL = {'noc': None, 'sport': None, 'event': None, 'year': None}
+# Barres affichées par niveau d'exploration
+DRILL_TOP_N = 15
+MEDAL_COLORS = {'Gold': '#d4af37', 'Silver': '#a8a9ad', 'Bronze': '#cd7f32'}
+
+# Valeurs affichées à l'ouverture de la page
+DEFAULT_SEASON = 'Summer'
+DEFAULT_COUNTRIES = ('USA', 'FRA')
+# Nombre de lignes par page de la table brute
+RAW_PAGE_SIZE = 20
+# Période de suivi d'un export en tâche de fond (ms)
+EXPORT_POLL_MS = 1000
+
+
+def get_cube():
+    return provider.get('medal_cube', EMPTY_CUBE)
+
+
+def get_medal_index():
+    return provider.get('medal_index', EMPTY_INDEX)
 
 
 # --- 2. Mise en page (Layout) ---
-layout = html.Div([
-    html.H2("Visualisation des Performances Olympiques (Source: PostgreSQL)", style={'textAlign': 'center'}),
-
-    # --- FILTRE GLOBAL SAISON ---
-    html.Div([
-        html.Label("1. Choisissez la Saison :", style={'fontWeight': 'bold', 'marginRight': '10px'}),
-        dcc.RadioItems(
-            id='season-filter',
-            options=[
-                {'label': ' Jeux d\'Été (Summer)', 'value': 'Summer'},
-                {'label': ' Jeux d\'Hiver (Winter)', 'value': 'Winter'}
-            ],
-            value='Summer',
-            inline=True,
-            style={'display': 'inline-block'}
-        )
-    ], style={'textAlign': 'center', 'padding': '20px', 'backgroundColor': '#f9f9f9', 'marginBottom': '20px'}),
+# Fonction appelée à chaque affichage de la page : on y lit le dernier état des données
+def render(**kwargs):
+    all_nations = provider.get('nations', [])
+    if not all_nations:
+        print("Attention: Aucune donnée disponible. Vérifiez que la BDD est bien remplie via le script load_data.py")
 
-    # Conteneur Flexbox pour aligner les deux graphiques côte à côte
-    html.Div([
-        
-        # --- BLOC GAUCHE : TOP 3 NATIONS ---
+    # État initial complet calculé ici (mêmes fonctions et même cache que les
+    # callbacks B à D et F) : la page s'affiche sans aller-retour serveur ; la
+    # table saison -> sports part dans le Store dm-sports (callback A, navigateur)
+    sports_by_season = get_cube().sports_by_season
+    season_sports = sports_by_season.get(DEFAULT_SEASON, [])
+    sport = season_sports[0] if season_sports else None
+    drill_figure, breadcrumb = update_drilldown(DEFAULT_SEASON, EMPTY_DRILL)
+    raw_page, raw_page_count = update_raw_table(0, RAW_PAGE_SIZE, [], '')
+
+    return html.Div([
+        html.H2("Visualisation des Performances Olympiques (Source: PostgreSQL)", style={'textAlign': 'center'}),
+
+        # --- FILTRE GLOBAL SAISON ---
         html.Div([
-            html.H3("Top 3 Nations par Sport"),
-            html.Label("Sélectionnez un sport :"),
-            dcc.Dropdown(id='sport-dropdown', clearable=False), # Options remplies par callback
-            
-            # Note : Height fixée à 450px pour éviter le bug d'extension infinie
-            dcc.Graph(id='top-nations-graph', style={'height': '450px'}) 
-        ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 4px 8px 0 rgba(0,0,0,0.2)', 'borderRadius': '5px'}),
-        
-        # --- BLOC DROIT : COMPARATEUR ---
+            html.Label("1. Choisissez la Saison :", style={'fontWeight': 'bold', 'marginRight': '10px'}),
+            dcc.RadioItems(
+                id='season-filter',
+                options=[
+                    {'label': ' Jeux d\'Été (Summer)', 'value': 'Summer'},
+                    {'label': ' Jeux d\'Hiver (Winter)', 'value': 'Winter'}
+                ],
+                value=DEFAULT_SEASON,
+                inline=True,
+                style={'display': 'inline-block'}
+            ),
+            dcc.Store(id='dm-sports', data=sports_by_season),
+        ], style={'textAlign': 'center', 'padding': '20px', 'backgroundColor': '#f9f9f9', 'marginBottom': '20px'}),
+
+        # Conteneur Flexbox pour aligner les deux graphiques côte à côte
         html.Div([
-            html.H3("Comparateur de Nations"),
-            html.Label("Comparez l'historique des deux pays :"),
-            
+        
+            # --- BLOC GAUCHE : TOP 3 NATIONS ---
             html.Div([
+                html.H3("Top 3 Nations par Sport"),
+                html.Label("Sélectionnez un sport :"),
                 dcc.Dropdown(
-                    id='country-1-dropdown',
-                    options=[{'label': i, 'value': i} for i in all_nations],
-                    value='USA', # Valeur par défaut
-                    clearable=False,
-                    style={'marginBottom': '5px'}
-                ),
-                dcc.Dropdown(
-                    id='country-2-dropdown',
-                    options=[{'label': i, 'value': i} for i in all_nations],
-                    value='FRA', # Valeur par défaut
+                    id='sport-dropdown',
+                    options=[{'label': s, 'value': s} for s in season_sports], # Puis suivant la saison (callback A)
+                    value=sport,
                     clearable=False
-                )
-            ]),
+                ),
+            
+                # Note : Height fixée à 450px pour éviter le bug d'extension infinie
+                dcc.Graph(id='top-nations-graph', figure=top_nations_figure(DEFAULT_SEASON, sport),
+                          style={'height': '450px'}) 
+            ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 4px 8px 0 rgba(0,0,0,0.2)', 'borderRadius': '5px'}),
+        
+            # --- BLOC DROIT : COMPARATEUR ---
+            html.Div([
+                html.H3("Comparateur de Nations"),
+                html.Label("Comparez l'historique des deux pays :"),
+            
+                html.Div([
+                    dcc.Dropdown(
+                        id='country-1-dropdown',
+                        options=[{'label': i, 'value': i} for i in all_nations],
+                        value=DEFAULT_COUNTRIES[0], # Valeur par défaut
+                        clearable=False,
+                        style={'marginBottom': '5px'}
+                    ),
+                    dcc.Dropdown(
+                        id='country-2-dropdown',
+                        options=[{'label': i, 'value': i} for i in all_nations],
+                        value=DEFAULT_COUNTRIES[1], # Valeur par défaut
+                        clearable=False
+                    )
+                ]),
             
-            # Note : Height fixée à 450px ici aussi
-            dcc.Graph(id='comparison-graph', style={'height': '450px'}) 
-        ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 4px 8px 0 rgba(0,0,0,0.2)', 'borderRadius': '5px'})
+                # Note : Height fixée à 450px ici aussi
+                dcc.Graph(id='comparison-graph', figure=comparison_figure(DEFAULT_SEASON, *DEFAULT_COUNTRIES),
+                          style={'height': '450px'}) 
+            ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 4px 8px 0 rgba(0,0,0,0.2)', 'borderRadius': '5px'})
     
-    ], style={'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'flex-start', 'flexWrap': 'wrap'}),
+        ], style={'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'flex-start', 'flexWrap': 'wrap'}),
+
+        # --- EXPLORATION (filtres croisés) ---
+        # Un clic sur le Top 3, le comparateur ou ce graphique affine la sélection,
+        # partagée par les trois graphiques et la table brute
+        html.Div([
+            html.H3("Exploration des médailles"),
+            html.Div([
+                html.Button("Tout", id='drill-reset', style={'marginRight': '5px'}),
+                html.Button("Remonter", id='drill-up', style={'marginRight': '15px'}),
+                html.Span(breadcrumb, id='drill-breadcrumb', style={'fontWeight': 'bold'}),
+            ]),
+            html.P("Cliquez sur une barre : pays → sports → épreuves → athlètes. "
+                   "Un point du comparateur sélectionne le pays et l'édition.", style={'color': '#666'}),
+            dcc.Graph(id='drill-graph', figure=drill_figure, style={'height': '450px'}),
+            dcc.Store(id='dm-drill', data=EMPTY_DRILL),
+        ], style={'padding': '1%', 'marginTop': '20px', 'boxShadow': '0 4px 8px 0 rgba(0,0,0,0.2)', 'borderRadius': '5px'}),
     
-    html.Hr(),
+        html.Hr(),
     
-    # --- SECTION 3 : DONNÉES BRUTES ---
-    html.H4("Aperçu des Données Brutes (100 premières lignes)"),
-    dash_table.DataTable(
-        id='raw-data-table',
-        columns=[{"name": i, "id": i} for i in df.columns],
-        data=df.head(100).to_dict('records'),
-        sort_action="native",
-        filter_action="native",
-        style_table={'overflowX': 'auto', 'height': '300px', 'overflowY': 'auto'},
-        style_header={'backgroundColor': 'lightgrey', 'fontWeight': 'bold'},
-        style_cell={'minWidth': '100px', 'width': '150px', 'maxWidth': '300px', 'textAlign': 'left'}
-    )
-])
+        # --- SECTION 3 : DONNÉES BRUTES ---
+        # Pagination, tri et filtres exécutés par PostgreSQL (callback D) : toute la table est explorable
+        html.H4("Données Brutes (toute la table, pagination côté serveur)"),
+        dash_table.DataTable(
+            id='raw-data-table',
+            data=raw_page,
+            page_count=raw_page_count,
+            columns=[
+                {"name": c, "id": c, "type": 'numeric' if c in queries.NUMERIC_COLUMNS else 'text'}
+                for c in queries.ATHLETE_COLUMNS
+            ],
+            page_current=0,
+            page_size=RAW_PAGE_SIZE,
+            page_action="custom",
+            sort_action="custom",
+            sort_mode="multi",
+            sort_by=[],
+            filter_action="custom",
+            filter_query='',
+            style_table={'overflowX': 'auto', 'height': '300px', 'overflowY': 'auto'},
+            style_header={'backgroundColor': 'lightgrey', 'fontWeight': 'bold'},
+            style_cell={'minWidth': '100px', 'width': '150px', 'maxWidth': '300px', 'textAlign': 'left'}
+        ),
+
+        # Export de ce que montre la table (filtre + tri) : téléchargement direct
+        # en flux, ou tâche de fond suivie ici (callbacks H à J, voir exports.py)
+        html.Div([
+            html.A("Télécharger (CSV.gz)", id='export-link', href=export_url('csv'), style={'marginRight': '15px'}),
+            html.Button("Exporter en CSV", id='export-csv', style={'marginRight': '5px'}),
+            html.Button("Exporter en Parquet", id='export-parquet', disabled=not exports.parquet_available(),
+                        style={'marginRight': '15px'}),
+            html.Span(id='export-status'),
+            dcc.Store(id='export-job'),
+            dcc.Interval(id='export-interval', interval=EXPORT_POLL_MS, disabled=True),
+        ], style={'marginTop': '10px'})
+    ])
+
+
+# Tant que les données ne sont pas prêtes : bandeau d'attente, puis la page se remplit seule
+layout = page_when_ready('dm', ['medal_cube', 'nations', 'medal_index'], render)
 
 
 # --- 3. Callbacks (Logique Interactive) ---
 
-# Callback A : Mettre à jour la liste des sports (Dépend de la Saison)
-@callback(
+# Callback A : Liste des sports de la saison, dans le navigateur (assets/clientside.js)
+# à partir de la table saison -> sports du Store : aucune requête au serveur
+clientside_callback(
+    ClientsideFunction(namespace='dataviz', function_name='sportsOptions'),
     [Output('sport-dropdown', 'options'),
      Output('sport-dropdown', 'value')],
-    [Input('season-filter', 'value')]
+    Input('season-filter', 'value'),
+    State('dm-sports', 'data'),
+    prevent_initial_call=True
 )
-def set_sports_options(selected_season):
-    if df.empty:
-        return [], None
-    
-    # On ne garde que les sports existants dans la saison choisie
-    season_sports = sorted(df[df['Season'] == selected_season]['Sport'].unique().tolist())
-    
-    # On sélectionne le premier sport par défaut pour éviter un graphique vide
-    default_val = season_sports[0] if season_sports else None
-    
-    return [{'label': s, 'value': s} for s in season_sports], default_val
 
 
-# Callback B : Graphique Top 3 Nations (Dépend de Saison + Sport)
+# Callback B : Graphique Top 3 Nations (Dépend de Saison + Sport, et de l'édition sélectionnée)
 @callback(
     Output('top-nations-graph', 'figure'),
     [Input('season-filter', 'value'),
-     Input('sport-dropdown', 'value')]
+     Input('sport-dropdown', 'value'),
+     Input('dm-drill', 'data')],
+    prevent_initial_call=True
 )
-def update_top_nations(season, sport):
-    if df_medals.empty or not sport:
+def update_top_nations(season, sport, drill=None):
+    # Seule l'édition de la sélection change ce graphique (et entre dans la clé du cache)
+    return top_nations_figure(season, sport, (drill or {}).get('year'))
+
+
+@figure_cache.memoize('update_top_nations', datasets=['medal_cube', 'medal_index'])
+def top_nations_figure(season, sport, year=None):
+    cube = get_cube()
+    if cube.empty or not sport:
         return px.bar(title="Pas de données (Vérifiez la BDD)")
-        
-    # Filtrer par saison ET par sport
-    filtered = df_medals[(df_medals['Season'] == season) & (df_medals['Sport'] == sport)]
-    
-    # Compter les médailles par nation
-    counts = filtered['NOC'].value_counts().reset_index()
-    counts.columns = ['NOC', 'Count']
-    
-    # Garder le Top 3
-    top_3 = counts.head(3)
 
-    fig = px.bar(
-        top_3, x='NOC', y='Count', color='Count',
-        title=f"Top 3 - {sport} ({season})",
-        labels={'Count': 'Médailles', 'NOC': 'Pays'}
-    )
+    if year is None:
+        # Lecture directe du Top 3 pré-calculé pour (saison, sport)
+        top_3 = cube.top_nations(season, sport, n=3)
+        title = f"Top 3 - {sport} ({season})"
+    else:
+        # Édition choisie dans le comparateur : intersection des index (saison, sport, année)
+        index = get_medal_index()
+        top_3 = index.count_by('NOC', index.rows(Season=season, Sport=sport, Year=year), n=3)
+        title = f"Top 3 - {sport} ({season} {year})"
+
+    # go.Bar plutôt que px.bar : même rendu, construction ~10x plus rapide
+    fig = go.Figure(go.Bar(
+        x=top_3['NOC'].tolist(), y=top_3['Count'].tolist(),
+        marker=dict(color=top_3['Count'].tolist(), coloraxis='coloraxis'),
+        hovertemplate='Pays=%{x}<br>Médailles=%{y}<extra></extra>'
+    ))
+    fig.update_layout(title=title, xaxis_title='Pays', yaxis_title='Médailles')
     
     # SUPPRESSION DE LA BARRE DE COULEUR (LÉGENDE) À DROITE
     fig.update_layout(coloraxis_showscale=False)
@@ -169,40 +294,240 @@ def update_top_nations(season, sport):
     return fig
 
 
-# Callback C : Graphique Comparaison (Dépend de Saison + Pays 1 + Pays 2)
+# Callback C : Graphique Comparaison (Dépend de Saison + Pays 1 + Pays 2, et de l'édition sélectionnée)
 @callback(
     Output('comparison-graph', 'figure'),
     [Input('season-filter', 'value'),
      Input('country-1-dropdown', 'value'),
-     Input('country-2-dropdown', 'value')]
+     Input('country-2-dropdown', 'value'),
+     Input('dm-drill', 'data')],
+    prevent_initial_call=True
 )
-def update_comparison(season, country1, country2):
-    if df_medals.empty:
+def update_comparison(season, country1, country2, drill=None):
+    return comparison_figure(season, country1, country2, (drill or {}).get('year'))
+
+
+@figure_cache.memoize('update_comparison', datasets=['medal_cube'])
+def comparison_figure(season, country1, country2, year=None):
+    cube = get_cube()
+    if cube.empty:
         return px.line(title="Pas de données (Vérifiez la BDD)")
     
-    # 1. On ne garde que la saison choisie
-    season_df = df_medals[df_medals['Season'] == season]
-    
-    # 2. On ne garde que les lignes concernant les deux pays sélectionnés
-    comparison_df = season_df[season_df['NOC'].isin([country1, country2])].copy()
+    # Total de médailles par édition, déjà groupé par (Saison, Année, Pays)
+    yearly_counts = cube.yearly_counts(season, [country1, country2])
     
-    if comparison_df.empty:
+    if yearly_counts.empty:
         return px.line(title="Aucune médaille pour ces pays dans cette saison")
-
-    # 3. On groupe par Année et par Pays pour avoir le total par édition
-    yearly_counts = comparison_df.groupby(['Year', 'NOC'])['Medal'].count().reset_index()
-    yearly_counts.columns = ['Year', 'NOC', 'Total Medals']
     
-    # 4. Création du graphique multi-lignes
-    fig = px.line(
-        yearly_counts, 
-        x='Year', y='Total Medals', color='NOC',
-        markers=True,
+    # Création du graphique multi-lignes (une trace par pays ; customdata : pays cliqué)
+    fig = go.Figure()
+    for noc, counts in yearly_counts.groupby('NOC', sort=False):
+        fig.add_trace(go.Scatter(
+            x=counts['Year'].tolist(), y=counts['Total Medals'].tolist(),
+            name=noc, mode='lines+markers', customdata=[[noc]] * len(counts),
+            hovertemplate='Pays=' + noc + '<br>Année=%{x}<br>Nombre de Médailles=%{y}<extra></extra>'
+        ))
+    fig.update_layout(
         title=f"Comparaison : {country1} vs {country2} ({season})",
-        labels={'Total Medals': 'Nombre de Médailles', 'Year': 'Année', 'NOC': 'Pays'}
+        xaxis_title='Année', yaxis_title='Nombre de Médailles', legend_title='Pays'
     )
     
     # Petite amélioration pour que l'axe X affiche bien les années olympiques (tous les 4 ans souvent)
     fig.update_xaxes(dtick=4) 
+    # Édition sélectionnée (clic sur un point)
+    if year is not None:
+        fig.add_vline(x=year, line_dash='dot', line_color='#888')
     
-    return fig
\ No newline at end of file
+    return fig
+
+
+# Callback D : Table brute paginée / triée / filtrée côté serveur
+@callback(
+    [Output('raw-data-table', 'data'),
+     Output('raw-data-table', 'page_count')],
+    [Input('raw-data-table', 'page_current'),
+     Input('raw-data-table', 'page_size'),
+     Input('raw-data-table', 'sort_by'),
+     Input('raw-data-table', 'filter_query')],
+    prevent_initial_call=True
+)
+def update_raw_table(page_current, page_size, sort_by, filter_query):
+    try:
+        page, page_count = queries.read_athlete_page(
+            engine, page_current or 0, page_size or RAW_PAGE_SIZE, sort_by, filter_query
+        )
+    except Exception as e:
+        print(f"Erreur lors de la lecture de la table brute: {e}")
+        return [], 1
+    return page.to_dict('records'), page_count
+
+
+# Callback E : Sélection partagée (clics sur les graphiques, boutons, changement de saison)
+def next_drill(drill, trigger, point):
+    drill = dict(EMPTY_DRILL, **(drill or {}))
+    if trigger == 'drill-reset':
+        return dict(EMPTY_DRILL)
+    if trigger == 'season-filter':
+        # Sports, épreuves et éditions dépendent de la saison : seul le pays est conservé
+        return dict(EMPTY_DRILL, noc=drill['noc'])
+    if trigger == 'drill-up':
+        for key, _ in reversed(DRILL_LEVELS[:-1]):
+            if drill[key] is not None:
+                drill[key] = None
+                return drill
+        drill['year'] = None
+        return drill
+    if point is None:
+        return drill
+    if trigger == 'top-nations-graph':
+        return dict(drill, noc=point['x'], sport=None, event=None)
+    if trigger == 'comparison-graph':
+        return dict(drill, noc=point['customdata'][0], sport=None, event=None, year=int(point['x']))
+    if trigger == 'drill-graph':
+        # Niveau suivant du premier filtre vide (rien au-delà des athlètes)
+        for key, _ in DRILL_LEVELS[:-1]:
+            if drill[key] is None:
+                drill[key] = point['customdata']
+                return drill
+    return drill
+
+
+@callback(
+    [Output('dm-drill', 'data'),
+     Output('country-1-dropdown', 'value')],
+    [Input('top-nations-graph', 'clickData'),
+     Input('comparison-graph', 'clickData'),
+     Input('drill-graph', 'clickData'),
+     Input('drill-reset', 'n_clicks'),
+     Input('drill-up', 'n_clicks'),
+     Input('season-filter', 'value')],
+    State('dm-drill', 'data'),
+    prevent_initial_call=True
+)
+def update_drill(top_click, comparison_click, drill_click, _reset, _up, _season, drill):
+    trigger = ctx.triggered_id
+    click = {'top-nations-graph': top_click, 'comparison-graph': comparison_click, 'drill-graph': drill_click}.get(trigger)
+    point = click['points'][0] if click and click.get('points') else None
+    new_drill = next_drill(drill, trigger, point)
+    # Pays choisi dans le Top 3 : le comparateur le reprend
+    country = new_drill['noc'] if trigger == 'top-nations-graph' and new_drill['noc'] else dash.no_update
+    return new_drill, country
+
+
+# Callback F : Graphique d'exploration (niveau suivant de la sélection)
+@callback(
+    [Output('drill-graph', 'figure'),
+     Output('drill-breadcrumb', 'children')],
+    [Input('season-filter', 'value'),
+     Input('dm-drill', 'data')],
+    prevent_initial_call=True
+)
+@figure_cache.memoize('update_drilldown', datasets=['medal_index'])
+def update_drilldown(season, drill):
+    drill = dict(EMPTY_DRILL, **(drill or {}))
+    path = [season] + [drill[key] for key, _ in DRILL_LEVELS[:-1] if drill[key] is not None]
+    breadcrumb = ' › '.join(str(p) for p in path) + (f" ({drill['year']})" if drill['year'] is not None else '')
+
+    index = get_medal_index()
+    if index.empty:
+        return px.bar(title="Pas de données (Vérifiez la BDD)"), breadcrumb
+
+    # Colonne du niveau suivant, lignes filtrées par intersection des index
+    column = next(column for key, column in DRILL_LEVELS if key is None or drill[key] is None)
+    rows = index.rows(Season=season, NOC=drill['noc'], Sport=drill['sport'], Event=drill['event'], Year=drill['year'])
+    frame = index.medal_breakdown(column, rows, n=DRILL_TOP_N)
+
+    # Barres horizontales empilées par type de médaille (customdata : valeur à explorer)
+    labels = frame[column].astype(str).tolist()
+    fig = go.Figure([
+        go.Bar(y=labels, x=frame[medal], name=medal, orientation='h',
+               marker_color=MEDAL_COLORS[medal], customdata=labels)
+        for medal in MEDALS
+    ])
+    fig.update_layout(
+        barmode='stack',
+        title=f"Médailles par {'athlète' if column == 'Name' else column} - {breadcrumb} ({len(rows)} médailles)",
+        yaxis=dict(autorange='reversed'),
+        legend=dict(orientation='h', y=1.08),
+        margin=dict(l=220)
+    )
+    return fig, breadcrumb
+
+
+# Callback G : La table brute suit la sélection (filtre visible et modifiable dans l'en-tête)
+@callback(
+    [Output('raw-data-table', 'filter_query'),
+     Output('raw-data-table', 'page_current')],
+    Input('dm-drill', 'data'),
+    State('season-filter', 'value'),
+    prevent_initial_call=True
+)
+def filter_raw_table(drill, season):
+    drill = dict(EMPTY_DRILL, **(drill or {}))
+    # Valeurs échappées : les noms d'épreuves ou d'athlètes contiennent parfois " ou \
+    clauses = [f'{{Season}} s= {queries.quote_filter_value(season)}'] + [
+        f'{{{column}}} s= {queries.quote_filter_value(drill[key])}'
+        for key, column in DRILL_LEVELS[:-1] if drill[key] is not None
+    ]
+    if drill['year'] is not None:
+        clauses.append(f"{{Year}} = {drill['year']}")
+    return ' && '.join(clauses), 0
+
+
+# Callback H : Le lien de téléchargement direct suit le filtre et le tri de la table
+# (href initial calculé par render(), mises à jour dans le navigateur)
+def export_url(fmt, filter_query='', sort_by=None):
+    args = {'format': fmt, 'gzip': 1}
+    if filter_query:
+        args['filter'] = filter_query
+    if sort_by:
+        args['sort'] = json.dumps(sort_by)
+    return '/export/athlete_events?' + urlencode(args)
+
+
+clientside_callback(
+    ClientsideFunction(namespace='dataviz', function_name='exportUrl'),
+    Output('export-link', 'href'),
+    [Input('raw-data-table', 'filter_query'),
+     Input('raw-data-table', 'sort_by')],
+    prevent_initial_call=True
+)
+
+
+# Callback I : Lancement d'un export en tâche de fond
+@callback(
+    [Output('export-job', 'data'),
+     Output('export-interval', 'disabled'),
+     Output('export-status', 'children', allow_duplicate=True)],
+    [Input('export-csv', 'n_clicks'),
+     Input('export-parquet', 'n_clicks')],
+    [State('raw-data-table', 'filter_query'),
+     State('raw-data-table', 'sort_by')],
+    prevent_initial_call=True
+)
+def start_export(_csv, _parquet, filter_query, sort_by):
+    fmt = 'parquet' if ctx.triggered_id == 'export-parquet' else 'csv'
+    try:
+        job_id = exports.start_job(fmt, True, filter_query, sort_by)
+    except Exception as e:
+        print(f"Erreur au lancement de l'export: {e}")
+        return None, True, f"Export impossible : {e}"
+    return job_id, False, "Export en préparation..."
+
+
+# Callback J : Suivi de la tâche ; lien vers le fichier une fois terminée
+@callback(
+    [Output('export-status', 'children'),
+     Output('export-interval', 'disabled', allow_duplicate=True)],
+    Input('export-interval', 'n_intervals'),
+    State('export-job', 'data'),
+    prevent_initial_call=True
+)
+def poll_export(_n, job_id):
+    job = exports.read_job(job_id)
+    status = exports.describe_job(job)
+    if job is None or job['state'] == 'failed':
+        return status, True
+    if job['state'] == 'done':
+        return [status, ' — ', html.A(job['filename'], href=f'/export/jobs/{job_id}/download')], True
+    return status, False
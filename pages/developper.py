@@ -1,37 +1,60 @@
 import dash
-from dash import dcc, html, callback
-from dash.dependencies import Input, Output
+from dash import dcc, html, callback, clientside_callback
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from config import get_engine
+from config import get_engine, LIVE_INTERVAL_MS, CHART_POINT_BUDGET
+from data_provider import provider
+from figure_cache import figure_cache
+import queries
+import kpi
+from page_loading import page_when_ready
+import live_updates
+import downsampling
+from figure_payload import compact_figure
 
 dash.register_page(__name__, path='/developer', name='Développeur', order=3)
 
-# --- 1. Récupération des données Dev ---
+# --- 1. Déclaration des données Dev (chargées à la demande) ---
 engine = get_engine()
-df = pd.DataFrame()
 
-try:
-    if engine:
-        query = "SELECT * FROM dev_metrics ORDER BY date ASC"
-        df = pd.read_sql(query, engine)
-except Exception as e:
-    print(f"Erreur Dev SQL: {e}")
+
+def load_dev_metrics():
+    # État de l'agrégat des KPIs : la table n'est plus lue en entier
+    return kpi.rollup_state(engine, 'dev_metrics')
+
+
+# La version (nombre de lignes, dernière date) évite de relire une table inchangée
+provider.register('dev_metrics', load_dev_metrics, version=lambda: queries.table_version(engine, 'dev_metrics'))
+
+
+# Colonnes tracées, et leur emplacement dans les figures (mode live)
+LIVE_COLUMNS = ['commits_count', 'bugs_reported', 'cpu_usage_percent', 'memory_usage_percent']
+LIVE_TRACES = [
+    [(0, ('x',), 'date'), (0, ('y',), 'commits_count'), (1, ('x',), 'date'), (1, ('y',), 'bugs_reported')],
+    [(0, ('x',), 'date'), (0, ('y',), 'cpu_usage_percent'), (1, ('x',), 'date'), (1, ('y',), 'memory_usage_percent')],
+]
+# Agrégat SQL par intervalle quand la plage dépasse le budget de points
+GRAPH_AGGREGATES = {'commits_count': 'sum', 'bugs_reported': 'sum', 'cpu_usage_percent': 'max', 'memory_usage_percent': 'max'}
+
 
 # --- 2. Calcul des KPIs ---
-if not df.empty:
-    avg_build_time = round(df['avg_build_time_sec'].mean(), 1)
-    total_commits = df['commits_count'].sum()
-    total_bugs = df['bugs_reported'].sum()
-    
-    # Indicateur simple de santé (Ratio Bugs/Commits)
-    health_ratio = round((1 - (total_bugs / total_commits)) * 100, 1) if total_commits > 0 else 0
-else:
-    avg_build_time = 0
-    total_commits = 0
-    total_bugs = 0
-    health_ratio = 0
+# Fenêtre glissante lue dans l'agrégat quotidien (kpi.py)
+def compute_kpis(days=kpi.DEFAULT_WINDOW):
+    window = kpi.read_window(engine, 'dev_metrics', days)
+    if window is not None:
+        total_commits = int(window['sum']['commits_count'])
+        total_bugs = int(window['sum']['bugs_reported'])
+        return {
+            'avg_build_time': round(kpi.mean(window, 'avg_build_time_sec'), 1),
+            'total_commits': total_commits,
+            'total_bugs': total_bugs,
+            # Indicateur simple de santé (Ratio Bugs/Commits)
+            'health_ratio': round((1 - (total_bugs / total_commits)) * 100, 1) if total_commits > 0 else 0,
+        }
+    return {'avg_build_time': 0, 'total_commits': 0, 'total_bugs': 0, 'health_ratio': 0}
 
 # Style CSS commun
 card_style = {
@@ -46,81 +69,142 @@ card_style = {
 }
 
 # --- 3. Mise en page (Layout) ---
-layout = html.Div([
-    html.H2("Tableau de Bord Technique (DevOps)", style={'textAlign': 'center', 'marginBottom': '30px'}),
-
-    # --- LIGNE 1 : Les KPIs (Dark Theme) ---
-    html.Div([
+def kpi_cards(days):
+    kpis = compute_kpis(days)
+    return [
         html.Div([
             html.H4("Total Commits", style={'color': '#aaa'}),
-            html.H2(f"{total_commits}", style={'color': '#4caf50'}), # Vert
-            html.P("Code livré (30j)")
+            html.H2(f"{kpis['total_commits']}", style={'color': '#4caf50'}), # Vert
+            html.P(f"Code livré ({days}j)")
         ], style=card_style),
 
         html.Div([
             html.H4("Temps de Build", style={'color': '#aaa'}),
-            html.H2(f"{avg_build_time} s", style={'color': '#ff9800'}), # Orange
+            html.H2(f"{kpis['avg_build_time']} s", style={'color': '#ff9800'}), # Orange
             html.P("Moyenne CI/CD")
         ], style=card_style),
 
         html.Div([
             html.H4("Bugs Détectés", style={'color': '#aaa'}),
-            html.H2(f"{total_bugs}", style={'color': '#f44336'}), # Rouge
+            html.H2(f"{kpis['total_bugs']}", style={'color': '#f44336'}), # Rouge
             html.P("Tickets ouverts")
         ], style=card_style),
 
         html.Div([
             html.H4("Qualité du Code", style={'color': '#aaa'}),
-            html.H2(f"{health_ratio}%", style={'color': '#2196f3'}), # Bleu
+            html.H2(f"{kpis['health_ratio']}%", style={'color': '#2196f3'}), # Bleu
             html.P("Taux de succès")
         ], style=card_style),
-        
-    ], style={'display': 'flex', 'justifyContent': 'center', 'flexWrap': 'wrap'}),
+    ]
+
+
+def render(**kwargs):
+    # Graphiques de la période par défaut tracés ici (même cache que le callback) :
+    # la page arrive complète, sans aller-retour du navigateur au premier affichage
+    start_date = (pd.Timestamp.today() - pd.Timedelta(days=29)).date().isoformat()
+    fig_velocity, fig_monitoring, cursor = update_dev_graphs(start_date, None)
+
+    return html.Div([
+        html.H2("Tableau de Bord Technique (DevOps)", style={'textAlign': 'center', 'marginBottom': '30px'}),
 
-    html.Hr(),
+        # --- LIGNE 1 : Les KPIs (Dark Theme), sur la fenêtre choisie ---
+        dcc.RadioItems(
+            id='dev-kpi-window',
+            options=[{'label': f' {days} jours', 'value': days} for days in kpi.WINDOWS],
+            value=kpi.DEFAULT_WINDOW,
+            inline=True,
+            style={'textAlign': 'center', 'marginBottom': '10px'}
+        ),
+        html.Div(
+            kpi_cards(kpi.DEFAULT_WINDOW), id='dev-kpis',
+            style={'display': 'flex', 'justifyContent': 'center', 'flexWrap': 'wrap'}
+        ),
 
-    # --- LIGNE 2 : Les Graphiques ---
-    html.Div([
-        # Graphique 1 : Vélocité vs Qualité (Commits vs Bugs)
+        html.Hr(),
+
+        # --- Période affichée (fin vide = jusqu'à la dernière donnée) + mode live ---
         html.Div([
-            html.H3("Vélocité & Qualité"),
-            dcc.Graph(id='velocity-graph', style={'height': '400px'})
-        ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'}),
+            dcc.DatePickerRange(
+                id='dev-date-range',
+                start_date=start_date,
+                display_format='DD/MM/YYYY',
+                clearable=True
+            ),
+            dcc.Checklist(id='dev-live-toggle', options=[{'label': ' Mode live', 'value': 'live'}], value=['live']),
+        ], style={'display': 'flex', 'alignItems': 'center', 'gap': '20px'}),
+        dcc.Interval(id='dev-live-interval', interval=LIVE_INTERVAL_MS, disabled=cursor is None),
+        dcc.Store(id='dev-live-cursor', data=cursor),
 
-        # Graphique 2 : Monitoring Serveur (CPU/RAM)
+        # --- LIGNE 2 : Les Graphiques ---
         html.Div([
-            html.H3("Monitoring Serveur"),
-            dcc.Graph(id='monitoring-graph', style={'height': '400px'})
-        ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'})
-    ], style={'display': 'flex', 'justifyContent': 'space-between', 'flexWrap': 'wrap'})
-])
+            # Graphique 1 : Vélocité vs Qualité (Commits vs Bugs)
+            html.Div([
+                html.H3("Vélocité & Qualité"),
+                dcc.Graph(id='velocity-graph', figure=fig_velocity, style={'height': '400px'})
+            ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'}),
+
+            # Graphique 2 : Monitoring Serveur (CPU/RAM)
+            html.Div([
+                html.H3("Monitoring Serveur"),
+                dcc.Graph(id='monitoring-graph', figure=fig_monitoring, style={'height': '400px'})
+            ], style={'width': '48%', 'padding': '1%', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'})
+        ], style={'display': 'flex', 'justifyContent': 'space-between', 'flexWrap': 'wrap'})
+    ])
+
+
+# Tant que les données ne sont pas prêtes : bandeau d'attente, puis la page se remplit seule
+layout = page_when_ready('dev', ['dev_metrics'], render)
 
 
 # --- 4. Callbacks ---
 
+@callback(
+    Output('dev-kpis', 'children'),
+    Input('dev-kpi-window', 'value'),
+    prevent_initial_call=True
+)
+def update_dev_kpis(days):
+    return kpi_cards(days or kpi.DEFAULT_WINDOW)
+
+
 @callback(
     [Output('velocity-graph', 'figure'),
-     Output('monitoring-graph', 'figure')],
-    [Input('velocity-graph', 'id')]
+     Output('monitoring-graph', 'figure'),
+     Output('dev-live-cursor', 'data')],
+    [Input('dev-date-range', 'start_date'),
+     Input('dev-date-range', 'end_date')],
+    # Période par défaut déjà tracée par render()
+    prevent_initial_call=True
 )
-def update_dev_graphs(_):
+@figure_cache.memoize('update_dev_graphs', datasets=['dev_metrics'])
+def update_dev_graphs(start_date, end_date):
+    start, end = queries.parse_date_range(start_date, end_date)
+    # Au plus CHART_POINT_BUDGET points par trace, quelle que soit la longueur de l'historique
+    df, width = queries.read_metrics_range(engine, 'dev_metrics', GRAPH_AGGREGATES, start, end, CHART_POINT_BUDGET)
     if df.empty:
         empty = px.bar(title="Pas de données")
-        return empty, empty
+        return empty, empty, None
+
+    suffix = f" (par intervalles de {pd.Timedelta(seconds=width)})" if width else ""
+    # Listes (et non colonnes pandas) : le mode live ajoute des points à ces traces
+    commits_x, commits_y = downsampling.trace_xy(df, 'commits_count', CHART_POINT_BUDGET)
+    bugs_x, bugs_y = downsampling.trace_xy(df, 'bugs_reported', CHART_POINT_BUDGET)
+    cpu_x, cpu_y = downsampling.trace_xy(df, 'cpu_usage_percent', CHART_POINT_BUDGET)
+    ram_x, ram_y = downsampling.trace_xy(df, 'memory_usage_percent', CHART_POINT_BUDGET)
 
     # Graphique 1 : Combo Chart (Barres pour Commits, Ligne pour Bugs)
     fig_vel = go.Figure()
     fig_vel.add_trace(go.Bar(
-        x=df['date'], y=df['commits_count'], 
+        x=commits_x, y=commits_y,
         name='Commits', marker_color='#4caf50'
     ))
     fig_vel.add_trace(go.Scatter(
-        x=df['date'], y=df['bugs_reported'], 
+        x=bugs_x, y=bugs_y,
         name='Bugs', mode='lines+markers', line=dict(color='#f44336', width=3), yaxis='y2'
     ))
     
     fig_vel.update_layout(
-        title="Activité Git vs Bugs",
+        title="Activité Git vs Bugs" + suffix,
         yaxis=dict(title="Nombre de Commits"),
         yaxis2=dict(title="Nombre de Bugs", overlaying='y', side='right'),
         legend=dict(x=0, y=1.1, orientation='h'),
@@ -130,19 +214,54 @@ def update_dev_graphs(_):
     # Graphique 2 : Area Chart pour CPU/RAM
     fig_mon = go.Figure()
     fig_mon.add_trace(go.Scatter(
-        x=df['date'], y=df['cpu_usage_percent'], 
+        x=cpu_x, y=cpu_y,
         name='CPU Usage %', fill='tozeroy', line=dict(color='#2196f3')
     ))
     fig_mon.add_trace(go.Scatter(
-        x=df['date'], y=df['memory_usage_percent'], 
+        x=ram_x, y=ram_y,
         name='RAM Usage %', line=dict(color='#9c27b0', dash='dot')
     ))
     
     fig_mon.update_layout(
-        title="Consommation Ressources Serveur",
+        title="Consommation Ressources Serveur" + suffix,
         yaxis=dict(title="Pourcentage %", range=[0, 100]),
         legend=dict(x=0, y=1.1, orientation='h'),
         hovermode="x unified"
     )
 
-    return fig_vel, fig_mon
\ No newline at end of file
+    # Mode live seulement si toutes les lignes sont tracées telles quelles et que la plage est ouverte
+    live = width is None and len(df) <= CHART_POINT_BUDGET and end is None
+    # Tableaux binaires, sauf en mode live (dash.Patch ajoute des points aux listes)
+    return (compact_figure(fig_vel, binary=not live), compact_figure(fig_mon, binary=not live),
+            live_updates.make_cursor(df, LIVE_COLUMNS) if live else None)
+
+
+# Sondage live : activé ou non dans le navigateur (assets/clientside.js), selon la
+# case et la présence d'un curseur ; sans curseur, aucun sondage inutile
+clientside_callback(
+    ClientsideFunction(namespace='dataviz', function_name='liveDisabled'),
+    Output('dev-live-interval', 'disabled'),
+    [Input('dev-live-toggle', 'value'),
+     Input('dev-live-cursor', 'data')],
+    prevent_initial_call=True
+)
+
+
+@callback(
+    [Output('velocity-graph', 'figure', allow_duplicate=True),
+     Output('monitoring-graph', 'figure', allow_duplicate=True),
+     Output('dev-live-cursor', 'data', allow_duplicate=True)],
+    Input('dev-live-interval', 'n_intervals'),
+    State('dev-live-cursor', 'data'),
+    prevent_initial_call=True
+)
+def stream_dev_graphs(_, cursor):
+    # Seules les lignes à partir de la dernière date affichée sont lues et envoyées
+    if not cursor:
+        raise PreventUpdate
+    rows = queries.read_metrics_since(engine, 'dev_metrics', cursor['last'])
+    update = live_updates.patch_figures(rows, cursor, LIVE_TRACES, LIVE_COLUMNS)
+    if update is None:
+        raise PreventUpdate
+    (patch_vel, patch_mon), new_cursor = update
+    return patch_vel, patch_mon, new_cursor
\ No newline at end of file
@@ -0,0 +1,379 @@
+import math
+import re
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import text
+
+# --- Couche de requêtes SQL ---
+# Les agrégats de médailles sont calculés par PostgreSQL dans des vues
+# matérialisées : les pages ne lisent plus que ces petits résultats
+# au lieu de rapatrier toute la table athlete_events.
+
+MATERIALIZED_VIEWS = {
+    'mv_medals_season_sport_noc': (
+        'SELECT "Season", "Sport", "NOC", COUNT(*) AS "Count" '
+        "FROM athlete_events WHERE \"Medal\" <> 'None' "
+        'GROUP BY "Season", "Sport", "NOC"',
+        ['"Season"', '"Sport"', '"NOC"']
+    ),
+    'mv_medals_year_noc': (
+        'SELECT "Season", "Year", "NOC", COUNT(*) AS "Count" '
+        "FROM athlete_events WHERE \"Medal\" <> 'None' "
+        'GROUP BY "Season", "Year", "NOC"',
+        ['"Season"', '"Year"', '"NOC"']
+    ),
+    'mv_sports_by_season': (
+        'SELECT DISTINCT "Season", "Sport" FROM athlete_events',
+        ['"Season"', '"Sport"']
+    ),
+    'mv_nations': (
+        'SELECT DISTINCT "NOC" FROM athlete_events',
+        ['"NOC"']
+    ),
+}
+
+
+def _materialized(engine):
+    # Hors PostgreSQL (SQLite des benchmarks), les vues sont de simples tables
+    return engine.dialect.name == 'postgresql'
+
+
+def ensure_views(engine):
+    # Création (avec données) des vues manquantes + index unique,
+    # nécessaire pour un REFRESH ... CONCURRENTLY
+    kind = "MATERIALIZED VIEW" if _materialized(engine) else "TABLE"
+    with engine.begin() as conn:
+        for name, (query, key_columns) in MATERIALIZED_VIEWS.items():
+            conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} AS {query}"))
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} ({', '.join(key_columns)})"
+            ))
+
+
+def drop_views(engine):
+    # Les vues dépendent de athlete_events : à supprimer avant un remplacement de la table
+    kind = "MATERIALIZED VIEW" if _materialized(engine) else "TABLE"
+    with engine.begin() as conn:
+        for name in MATERIALIZED_VIEWS:
+            conn.execute(text(f"DROP {kind} IF EXISTS {name}"))
+
+
+def refresh_views(engine, concurrently=True):
+    # CONCURRENTLY : les pages continuent de lire l'ancienne version pendant le calcul
+    mode = "CONCURRENTLY " if concurrently else ""
+    with engine.begin() as conn:
+        for name, (query, _) in MATERIALIZED_VIEWS.items():
+            if _materialized(engine):
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW {mode}{name}"))
+            else:
+                conn.execute(text(f"DELETE FROM {name}"))
+                conn.execute(text(f"INSERT INTO {name} {query}"))
+
+
+# --- Lectures utilisées par les pages ---
+def read_medals_by_sport(engine):
+    return pd.read_sql('SELECT "Season", "Sport", "NOC", "Count" FROM mv_medals_season_sport_noc', engine)
+
+
+def read_medals_by_year(engine):
+    return pd.read_sql('SELECT "Season", "Year", "NOC", "Count" FROM mv_medals_year_noc', engine)
+
+
+def read_sports_by_season(engine):
+    return sports_by_season(pd.read_sql('SELECT "Season", "Sport" FROM mv_sports_by_season', engine))
+
+
+def sports_by_season(df):
+    # Lignes (Season, Sport) -> {saison: [sports]}
+    return {season: grp['Sport'].tolist() for season, grp in df.groupby('Season')}
+
+
+def read_nations(engine):
+    df = pd.read_sql('SELECT "NOC" FROM mv_nations ORDER BY "NOC"', engine)
+    return df['NOC'].tolist()
+
+
+# --- Table brute paginée côté serveur ---
+# Colonnes exposées au DataTable (liste blanche : seuls ces noms arrivent dans le SQL)
+ATHLETE_COLUMNS = ['ID', 'Name', 'Sex', 'Age', 'Height', 'Weight', 'Team', 'NOC',
+                   'Games', 'Year', 'Season', 'City', 'Sport', 'Event', 'Medal']
+NUMERIC_COLUMNS = {'ID', 'Age', 'Height', 'Weight', 'Year'}
+# Ordre stable par défaut : la clé unique créée par le loader
+DEFAULT_ORDER = ['ID', 'Games', 'Event']
+# Au-delà de ce nombre de pages, on arrête de compter (le total exact coûterait un parcours complet)
+MAX_COUNTED_PAGES = 100
+
+# --- Chargement typé et compact des lignes de athlete_events ---
+# Les colonnes texte répétitives deviennent des 'category' (un code entier par ligne
+# + un seul exemplaire de chaque valeur), les nombres des entiers courts.
+CATEGORY_COLUMNS = ['Sex', 'Team', 'NOC', 'Games', 'Season', 'City', 'Sport', 'Event', 'Medal']
+COMPACT_DTYPES = {'ID': 'int32', 'Age': 'Int8', 'Year': 'int16', 'Height': 'float32', 'Weight': 'float32'}
+
+
+def compact_frame(df):
+    for column in df.columns:
+        if column in CATEGORY_COLUMNS:
+            df[column] = df[column].astype('category')
+        elif column in COMPACT_DTYPES:
+            df[column] = df[column].astype(COMPACT_DTYPES[column])
+    return df
+
+
+def iter_athlete_events(engine, columns=None, where='', params=None, chunksize=50000):
+    # Lecture par morceaux, chacun converti aussitôt : les chaînes Python d'un seul
+    # morceau existent à la fois, jamais celles de toute la table. Sous PostgreSQL,
+    # curseur côté serveur : sans lui, psycopg2 rapatrie tout le résultat d'un coup
+    columns = columns or ATHLETE_COLUMNS
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    query = text(f"SELECT {column_list} FROM athlete_events{where}")
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        for chunk in pd.read_sql(query, conn, params=params, chunksize=chunksize):
+            yield compact_frame(chunk)
+
+
+def read_athlete_events(engine, columns=None, where='', params=None, chunksize=50000):
+    columns = columns or ATHLETE_COLUMNS
+    chunks = list(iter_athlete_events(engine, columns, where, params, chunksize))
+    if not chunks:
+        return compact_frame(pd.DataFrame({c: pd.Series(dtype='object') for c in columns}))
+
+    # pd.concat repasserait en 'object' des catégories différentes : on les fusionne
+    data = {}
+    for column in columns:
+        parts = [chunk[column] for chunk in chunks]
+        if column in CATEGORY_COLUMNS:
+            data[column] = pd.Series(union_categoricals(parts))
+        else:
+            data[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(data)
+
+
+def memory_report(df):
+    # Mémoire réelle (deep) par colonne, en Mo
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'MB': (usage / 1e6).round(2)})
+    report.loc['TOTAL'] = ['', round(usage.sum() / 1e6, 2)]
+    return report
+
+
+# Opérateurs de la syntaxe filter_query du DataTable -> SQL
+FILTER_OPERATORS = {
+    '=': '=', 'eq': '=', '!=': '<>', 'ne': '<>',
+    '<': '<', 'lt': '<', '<=': '<=', 'le': '<=',
+    '>': '>', 'gt': '>', '>=': '>=', 'ge': '>=',
+    'contains': 'LIKE', 'datestartswith': 'LIKE',
+}
+FILTER_PATTERN = re.compile(
+    r'^\{(?P<column>[^}]+)\}\s+(?P<case>[si]?)(?P<op>contains|datestartswith|eq|ne|lt|le|gt|ge|!=|<=|>=|=|<|>)\s+(?P<value>.+)$'
+)
+
+
+# Valeur entre guillemets de la syntaxe filter_query : la barre oblique inverse
+# échappe le caractère suivant (guillemet ou barre oblique inverse elle-même)
+QUOTED_VALUE = re.compile(r'^(["\'`])((?:\\.|(?!\1)[^\\])*)\1$', re.DOTALL)
+UNESCAPE = re.compile(r'\\(.)', re.DOTALL)
+
+
+def quote_filter_value(value):
+    # Inverse de la lecture ci-dessous : "valeur" avec \ et " échappés, comme le DataTable
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def split_filter_query(filter_query):
+    # Clauses séparées par " && ", hors des valeurs entre guillemets
+    clauses, start, quote, i = [], 0, None, 0
+    while i < len(filter_query):
+        char = filter_query[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'`' and (i == 0 or filter_query[i - 1] == ' '):
+            # Guillemet ouvrant une valeur (pas l'apostrophe de O'Brien non cité)
+            quote = char
+        elif filter_query.startswith(' && ', i):
+            clauses.append(filter_query[start:i])
+            start = i + 4
+            i += 3
+        i += 1
+    clauses.append(filter_query[start:])
+    return clauses
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def filter_query_to_sql(filter_query):
+    # Traduit "{NOC} s= FRA && {Year} >= 2000" en clause WHERE paramétrée.
+    # Les clauses invalides (colonne inconnue, nombre mal formé) sont ignorées.
+    clauses, params = [], {}
+    for i, part in enumerate(split_filter_query(filter_query or '')):
+        match = FILTER_PATTERN.match(part.strip())
+        if not match or match.group('column') not in ATHLETE_COLUMNS:
+            continue
+        column, op = match.group('column'), match.group('op')
+        value = match.group('value').strip()
+        quoted = QUOTED_VALUE.match(value)
+        if quoted:
+            value = UNESCAPE.sub(r'\1', quoted.group(2))
+
+        name = f"p{i}"
+        if op in ('contains', 'datestartswith'):
+            pattern = _escape_like(value) + '%'
+            if op == 'contains':
+                pattern = '%' + pattern
+            target = f'CAST("{column}" AS TEXT)' if column in NUMERIC_COLUMNS else f'"{column}"'
+            # Pas d'ILIKE (absent de SQLite) ; ESCAPE explicite : SQLite n'a pas d'échappement par défaut
+            if match.group('case') == 'i':
+                clauses.append(f"LOWER({target}) LIKE LOWER(:{name}) ESCAPE '\\'")
+            else:
+                clauses.append(f"{target} LIKE :{name} ESCAPE '\\'")
+            params[name] = pattern
+        elif column in NUMERIC_COLUMNS:
+            try:
+                params[name] = float(value)
+            except ValueError:
+                continue
+            clauses.append(f'"{column}" {FILTER_OPERATORS[op]} :{name}')
+        else:
+            if match.group('case') == 'i':
+                clauses.append(f'LOWER("{column}") {FILTER_OPERATORS[op]} LOWER(:{name})')
+            else:
+                clauses.append(f'"{column}" {FILTER_OPERATORS[op]} :{name}')
+            params[name] = value
+
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    return where, params
+
+
+def sort_by_to_sql(sort_by):
+    order = [
+        f'"{s["column_id"]}" {"DESC" if s.get("direction") == "desc" else "ASC"}'
+        for s in (sort_by or []) if s.get('column_id') in ATHLETE_COLUMNS
+    ]
+    # La clé unique en fin de tri garantit des pages stables
+    order += [f'"{c}" ASC' for c in DEFAULT_ORDER]
+    return ' ORDER BY ' + ', '.join(order)
+
+
+def read_athlete_page(engine, page_current, page_size, sort_by=None, filter_query=''):
+    # Une page de athlete_events (LIMIT/OFFSET) + nombre de pages (None si > MAX_COUNTED_PAGES)
+    where, params = filter_query_to_sql(filter_query)
+    columns = ', '.join(f'"{c}"' for c in ATHLETE_COLUMNS)
+    page_query = text(
+        f"SELECT {columns} FROM athlete_events{where}{sort_by_to_sql(sort_by)} LIMIT :limit OFFSET :offset"
+    )
+    count_query = text(f"SELECT COUNT(*) FROM (SELECT 1 FROM athlete_events{where} LIMIT :cap) AS t")
+
+    cap = page_size * MAX_COUNTED_PAGES + 1
+    with engine.connect() as conn:
+        page = pd.read_sql(page_query, conn, params={**params, 'limit': page_size, 'offset': page_current * page_size})
+        count = conn.execute(count_query, {**params, 'cap': cap}).scalar()
+
+    page_count = None if count >= cap else max(1, -(-count // page_size))
+    return page, page_count
+
+
+def count_athlete_events(engine, filter_query=''):
+    # Nombre exact de lignes d'un filtre du DataTable (avancement des exports)
+    where, params = filter_query_to_sql(filter_query)
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM athlete_events{where}"), params).scalar()
+
+
+# Version des agrégats : jeton écrit par le loader dans load_metadata juste après
+# chaque REFRESH réussi des vues. Un simple COUNT / SUM sur les vues ne suffit pas :
+# une fusion peut corriger une médaille ou un NOC sans changer ces totaux
+MEDAL_VERSION_SOURCE = 'medal_views'
+MEDAL_VERSION_QUERY = text("SELECT watermark FROM load_metadata WHERE source = :source")
+
+
+def medal_fingerprint(engine):
+    # None tant que le loader n'a pas publié de version (rechargement à chaque accès)
+    try:
+        with engine.connect() as conn:
+            version = conn.execute(MEDAL_VERSION_QUERY, {'source': MEDAL_VERSION_SOURCE}).scalar()
+        return (version,) if version is not None else None
+    except Exception as e:
+        print(f"Erreur empreinte des médailles: {e}")
+        return None
+
+
+def table_version(engine, table):
+    # Version d'une table de métriques quotidiennes (index unique sur date) ; la
+    # dernière ligne entre dans la version car l'agrégation la réécrit sur place
+    with engine.connect() as conn:
+        count, last = conn.execute(text(f"SELECT COUNT(*), MAX(date) FROM {table}")).one()
+        row = conn.execute(text(f"SELECT * FROM {table} ORDER BY date DESC LIMIT 1")).first()
+    return (count, str(last), str(tuple(row)) if row else None)
+
+
+def read_metrics_since(engine, table, since):
+    # Lignes d'une table de métriques à partir de `since` inclus (mode live) :
+    # parcours de l'index sur date, coût proportionnel aux nouvelles lignes
+    query = text(f"SELECT * FROM {table} WHERE date >= :since ORDER BY date ASC")
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn, params={'since': since}, parse_dates=['date'])
+
+
+def parse_date_range(start_date, end_date):
+    # Valeurs d'un dcc.DatePickerRange ('YYYY-MM-DD') -> bornes [start, end[ ; None = ouverte
+    start = pd.Timestamp(start_date).normalize().to_pydatetime() if start_date else None
+    end = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_pydatetime() if end_date else None
+    return start, end
+
+
+# Agrégation par intervalle de temps : au plus budget * OVERSAMPLE intervalles
+# sortent de PostgreSQL, LTTB (downsampling.py) réduit ensuite au budget
+OVERSAMPLE = 4
+AGGREGATES = {'sum', 'avg', 'max', 'min'}
+# Noms de colonnes de métriques acceptés dans le SQL (identifiants simples)
+METRIC_COLUMN = re.compile(r'^[a-z_][a-z0-9_]*$')
+# Début de l'intervalle de :width secondes contenant `date`, selon le dialecte
+# (date_bin : PostgreSQL 14+ ; SQLite des benchmarks : secondes epoch entières)
+DATE_BIN = {
+    'sqlite': "datetime(:origin_s + (CAST(strftime('%s', date) AS INTEGER) - :origin_s) / :width * :width, 'unixepoch')",
+}
+DATE_BIN_DEFAULT = "date_bin(make_interval(secs => :width), date, :origin)"
+
+
+def read_metrics_range(engine, table, aggregates, start=None, end=None, budget=1000):
+    # aggregates : {colonne: 'sum' | 'avg' | 'max' | 'min'} (fonction appliquée par intervalle)
+    # Renvoie (DataFrame date + colonnes, largeur d'intervalle en secondes ou None si lignes brutes)
+    # Contrôle avant toute requête : les noms sont écrits dans le SQL, quel que soit le chemin
+    for column, agg in aggregates.items():
+        if not METRIC_COLUMN.match(column):
+            raise ValueError(f"Colonne invalide : {column}")
+        if agg not in AGGREGATES:
+            raise ValueError(f"Agrégat inconnu : {agg}")
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append("date >= :start")
+        params['start'] = start
+    if end is not None:
+        conditions.append("date < :end")
+        params['end'] = end
+    where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+    columns = ', '.join(aggregates)
+
+    with engine.connect() as conn:
+        count, first, last = conn.execute(
+            text(f"SELECT COUNT(*), MIN(date), MAX(date) FROM {table}{where}"), params
+        ).one()
+        if count <= budget * OVERSAMPLE:
+            query = text(f"SELECT date, {columns} FROM {table}{where} ORDER BY date ASC")
+            return pd.read_sql(query, conn, params=params, parse_dates=['date']), None
+
+        # SQLite renvoie MIN / MAX en texte
+        first, last = pd.Timestamp(first), pd.Timestamp(last)
+        width = max(1, math.ceil((last - first).total_seconds() / (budget * OVERSAMPLE)))
+        selected = ', '.join(f"{agg}({c}) AS {c}" for c, agg in aggregates.items())
+        bucket = DATE_BIN.get(engine.dialect.name, DATE_BIN_DEFAULT)
+        query = text(f"SELECT {bucket} AS date, {selected} FROM {table}{where} GROUP BY 1 ORDER BY 1")
+        params.update(width=width, origin=first.to_pydatetime(), origin_s=first.value // 10 ** 9)
+        df = pd.read_sql(query, conn, params=params, parse_dates=['date'])
+        return df, width
@@ -0,0 +1,303 @@
+import atexit
+import contextlib
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import g, request
+from sqlalchemy import column, insert, table, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import (
+    get_engine, REQUEST_LOG_ENABLED, REQUEST_LOG_BUFFER, REQUEST_LOG_FLUSH_SECONDS,
+    REQUEST_LOG_ROLLUP_SECONDS, REQUEST_LOG_RETENTION_DAYS
+)
+import kpi
+
+# --- Journal des requêtes -> admin_metrics ---
+# Chaque requête HTTP est mesurée (latence, statut, session) et ajoutée à un tampon
+# circulaire en mémoire : aucun aller-retour BDD sur le chemin de la requête.
+# Un thread d'arrière-plan vide le tampon par lots dans request_logs, puis agrège
+# périodiquement les jours / heures récents dans admin_metrics et admin_metrics_hourly.
+
+SESSION_COOKIE = 'dataviz_session'
+# Fichiers statiques et sondes : ils ne reflètent pas l'activité des utilisateurs
+IGNORED_PREFIXES = ('/_dash-component-suites/', '/assets/', '/_favicon', '/metrics', '/healthz', '/readyz')
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS request_logs (
+        ts TIMESTAMP NOT NULL,
+        method TEXT,
+        path TEXT,
+        status SMALLINT,
+        latency_ms REAL,
+        session_id TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS request_logs_ts_idx ON request_logs (ts)",
+    # Première apparition de chaque session (pour compter les nouveaux utilisateurs)
+    """CREATE TABLE IF NOT EXISTS request_sessions (
+        session_id TEXT PRIMARY KEY,
+        first_seen TIMESTAMP NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS admin_metrics (
+        date TIMESTAMP,
+        active_users BIGINT,
+        new_signups BIGINT,
+        server_errors BIGINT,
+        avg_response_time_ms DOUBLE PRECISION
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS admin_metrics_key ON admin_metrics (date)",
+    """CREATE TABLE IF NOT EXISTS admin_metrics_hourly (
+        date TIMESTAMP,
+        active_users BIGINT,
+        new_signups BIGINT,
+        server_errors BIGINT,
+        avg_response_time_ms DOUBLE PRECISION
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS admin_metrics_hourly_key ON admin_metrics_hourly (date)",
+]
+
+# Constructions insert() (et non text()) : exécutées avec une liste de lignes,
+# SQLAlchemy les regroupe en INSERT ... VALUES multi-lignes (insertmanyvalues)
+# au lieu d'un INSERT par ligne côté psycopg2
+request_logs = table('request_logs', *[column(c) for c in
+                                       ('ts', 'method', 'path', 'status', 'latency_ms', 'session_id')])
+request_sessions = table('request_sessions', column('session_id'), column('first_seen'))
+INSERT_LOGS = insert(request_logs)
+# Première apparition d'une session, selon le dialecte (SQLite des benchmarks)
+INSERT_SESSIONS = {
+    'sqlite': sqlite_insert(request_sessions).on_conflict_do_nothing(index_elements=['session_id']),
+}
+INSERT_SESSIONS_DEFAULT = pg_insert(request_sessions).on_conflict_do_nothing(index_elements=['session_id'])
+
+# Début de l'intervalle ('day' ou 'hour') contenant un horodatage, selon le dialecte
+TRUNCATE = {
+    'sqlite': {'day': "datetime({0}, 'start of day')", 'hour': "datetime({0}, 'start of day', strftime('+%H hours', {0}))"},
+}
+TRUNCATE_DEFAULT = "date_trunc('{unit}', {{0}})"
+
+# Agrégation d'une granularité à partir de :since
+ROLLUP = """
+    INSERT INTO {table} (date, active_users, new_signups, server_errors, avg_response_time_ms)
+    SELECT {bucket} AS bucket,
+           COUNT(DISTINCT l.session_id),
+           COUNT(DISTINCT l.session_id) FILTER (WHERE {first_seen_bucket} = {bucket}),
+           COUNT(*) FILTER (WHERE l.status >= 500),
+           AVG(l.latency_ms)
+    FROM request_logs l
+    LEFT JOIN request_sessions s ON s.session_id = l.session_id
+    WHERE l.ts >= :since
+    GROUP BY bucket
+    ON CONFLICT (date) DO UPDATE SET
+        active_users = EXCLUDED.active_users,
+        new_signups = EXCLUDED.new_signups,
+        server_errors = EXCLUDED.server_errors,
+        avg_response_time_ms = EXCLUDED.avg_response_time_ms
+"""
+
+
+def ensure_tables(engine):
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+
+
+# Verrou consultatif PostgreSQL : le loader et le thread de chaque worker
+# réécrivent les mêmes intervalles, un seul agrège à la fois
+ROLLUP_LOCK_ID = 7_412_001
+
+
+@contextlib.contextmanager
+def rollup_lock(engine):
+    # Verrou de transaction tenu sur une connexion dédiée : les agrégations,
+    # faites sur d'autres connexions, sont validées avant sa libération
+    if engine.dialect.name != 'postgresql':
+        yield
+        return
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {'id': ROLLUP_LOCK_ID})
+        yield
+
+
+def last_rolled_since(engine):
+    # Début de la veille du dernier jour agrégé (ce jour a pu être complété depuis) ;
+    # tout l'historique si admin_metrics est vide
+    with engine.connect() as conn:
+        last = conn.execute(text("SELECT MAX(date) FROM admin_metrics")).scalar()
+    if last is None:
+        return datetime(1970, 1, 1)
+    # SQLite renvoie les dates en texte
+    last = last if isinstance(last, datetime) else datetime.fromisoformat(str(last))
+    return datetime.combine(last.date() - timedelta(days=1), datetime.min.time())
+
+
+# Tables agrégées et leur granularité
+ROLLUP_TABLES = {'admin_metrics': 'day', 'admin_metrics_hourly': 'hour'}
+
+
+def _truncate(engine, unit):
+    return TRUNCATE.get(engine.dialect.name, {}).get(unit, TRUNCATE_DEFAULT.format(unit=unit))
+
+
+def rollup_statement(engine, table, unit):
+    truncate = _truncate(engine, unit)
+    return text(ROLLUP.format(table=table, bucket=truncate.format('l.ts'),
+                              first_seen_bucket=truncate.format('s.first_seen')))
+
+
+def drop_unlogged_buckets(engine):
+    # Supprime les lignes agrégées sans aucune requête journalisée dans leur
+    # intervalle (données fictives d'un ancien ADMIN_DEMO_DATA=1). Renvoie leur nombre
+    removed = 0
+    with rollup_lock(engine):
+        with engine.begin() as conn:
+            for table, unit in ROLLUP_TABLES.items():
+                bucket = _truncate(engine, unit).format('ts')
+                removed += conn.execute(text(
+                    f"DELETE FROM {table} WHERE date NOT IN (SELECT DISTINCT {bucket} FROM request_logs)"
+                )).rowcount
+        kpi.refresh_rollup(engine, 'admin_metrics', full=True)
+    return removed
+
+
+def rollup(engine, since=None):
+    # Recalcule les agrégats à partir de `since` (par défaut : depuis le début du jour
+    # précédent, ce qui couvre le passage de minuit). Coût borné par la fenêtre.
+    if since is None:
+        since = datetime.combine(datetime.now().date() - timedelta(days=1), datetime.min.time())
+    with rollup_lock(engine):
+        with engine.begin() as conn:
+            for table, unit in ROLLUP_TABLES.items():
+                conn.execute(rollup_statement(engine, table, unit), {'since': since})
+        # Agrégat des KPIs : mêmes jours recalculés
+        kpi.refresh_rollup(engine, 'admin_metrics', since=since)
+
+
+def purge(engine, retention_days=REQUEST_LOG_RETENTION_DAYS):
+    # Les journaux bruts ne servent qu'aux agrégats : on ne garde que la rétention.
+    # Limite calculée ici, avec la même horloge que les horodatages enregistrés
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM request_logs WHERE ts < :cutoff"), {'cutoff': cutoff})
+
+
+class RequestLog:
+    def __init__(self, maxlen=REQUEST_LOG_BUFFER, flush_seconds=REQUEST_LOG_FLUSH_SECONDS,
+                 rollup_seconds=REQUEST_LOG_ROLLUP_SECONDS):
+        # deque bornée : append/popleft sont atomiques, les plus anciennes entrées
+        # sont perdues si la BDD ne suit pas (jamais de blocage des requêtes)
+        self.buffer = deque(maxlen=maxlen)
+        self.flush_seconds = flush_seconds
+        self.rollup_seconds = rollup_seconds
+        self.flushed = 0
+        self.failed = 0
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._tables_ready = False
+
+    def record(self, entry):
+        self.buffer.append(entry)
+
+    def start(self):
+        # Démarré dans chaque worker (jamais dans le maître gunicorn avant le fork)
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='request-log-flusher', daemon=True)
+            self._thread.start()
+            # Arrêt du worker : on écrit ce qui reste dans le tampon
+            atexit.register(self._flush_at_exit)
+
+    def _flush_at_exit(self):
+        engine = get_engine()
+        if engine is not None:
+            self.flush(engine)
+
+    def drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.buffer.popleft())
+            except IndexError:
+                return batch
+
+    def flush(self, engine):
+        batch = self.drain()
+        if not batch:
+            return 0
+        try:
+            if not self._tables_ready:
+                ensure_tables(engine)
+                self._tables_ready = True
+            # Une seule transaction et des INSERT multi-lignes par lot ; une ligne
+            # par session (sa première requête du lot) dans request_sessions
+            sessions = {}
+            for e in batch:
+                sessions.setdefault(e['session_id'], e['ts'])
+            with engine.begin() as conn:
+                conn.execute(INSERT_LOGS, batch)
+                conn.execute(INSERT_SESSIONS.get(engine.dialect.name, INSERT_SESSIONS_DEFAULT), [{'session_id': s, 'first_seen': ts} for s, ts in sessions.items()])
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Erreur d'écriture du journal des requêtes ({len(batch)} entrées perdues): {e}")
+        return len(batch)
+
+    def _run(self):
+        last_rollup = time.monotonic()
+        while True:
+            time.sleep(self.flush_seconds)
+            engine = get_engine()
+            if engine is None:
+                continue
+            self.flush(engine)
+            if time.monotonic() - last_rollup >= self.rollup_seconds and self._tables_ready:
+                last_rollup = time.monotonic()
+                try:
+                    rollup(engine)
+                    purge(engine)
+                except Exception as e:
+                    print(f"Erreur d'agrégation des métriques admin: {e}")
+
+
+request_log = RequestLog()
+
+
+def init_app(app):
+    if not REQUEST_LOG_ENABLED:
+        return
+    server = app.server
+
+    @server.before_request
+    def _start_timer():
+        g.dataviz_request_start = time.perf_counter()
+        request_log.start()
+
+    @server.after_request
+    def _record(response):
+        start = getattr(g, 'dataviz_request_start', None)
+        if start is None or request.path.startswith(IGNORED_PREFIXES):
+            return response
+
+        session_id = request.cookies.get(SESSION_COOKIE)
+        if not session_id:
+            session_id = uuid.uuid4().hex
+            response.set_cookie(SESSION_COOKIE, session_id, max_age=365 * 24 * 3600, httponly=True, samesite='Lax')
+
+        request_log.record({
+            'ts': datetime.now(),
+            'method': request.method,
+            'path': request.path[:200],
+            'status': response.status_code,
+            'latency_ms': (time.perf_counter() - start) * 1000,
+            'session_id': session_id,
+        })
+        return response
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import time
+from sqlalchemy import text
+
+# Ajout du dossier parent au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import get_engine, CHART_POINT_BUDGET
+import downsampling
+import queries
+
+# --- Benchmark : taille des séries envoyées au navigateur selon l'historique ---
+# Usage : python scripts/bench_downsampling.py
+# Génère dans PostgreSQL une table 'bench_metrics' (une ligne par minute,
+# supprimée à la fin) et mesure, pour des historiques de plus en plus longs,
+# le nombre de points et la taille JSON de la trace envoyée au navigateur.
+BENCH_TABLE = 'bench_metrics'
+HISTORY_DAYS = [1, 7, 30, 365, 3 * 365]
+AGGREGATES = {'value': 'max'}
+
+
+def create_table(engine, days):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        # Série à la minute avec un cycle journalier, du bruit et quelques pics
+        conn.execute(text(f"""
+            CREATE TABLE {BENCH_TABLE} AS
+            SELECT d AS date,
+                   100 + 50 * sin(extract(epoch FROM d) / 86400 * 2 * pi()) + 20 * random()
+                   + CASE WHEN random() < 0.0005 THEN 500 ELSE 0 END AS value
+            FROM generate_series(now()::timestamp - make_interval(days => :days),
+                                 now()::timestamp, interval '1 minute') AS d
+        """), {'days': days})
+        conn.execute(text(f"CREATE UNIQUE INDEX {BENCH_TABLE}_key ON {BENCH_TABLE} (date)"))
+        conn.execute(text(f"ANALYZE {BENCH_TABLE}"))
+        return conn.execute(text(f"SELECT COUNT(*), MAX(value) FROM {BENCH_TABLE}")).one()
+
+
+def main():
+    engine = get_engine()
+    if engine is None:
+        sys.exit(1)
+
+    print(f"Budget : {CHART_POINT_BUDGET} points par trace")
+    print(f"{'Historique':>11}{'Lignes':>10}{'Points':>8}{'JSON (ko)':>11}{'Durée (ms)':>12}{'Pic conservé':>14}")
+    try:
+        for days in HISTORY_DAYS:
+            rows, peak = create_table(engine, days)
+            start = time.perf_counter()
+            df, width = queries.read_metrics_range(engine, BENCH_TABLE, AGGREGATES, budget=CHART_POINT_BUDGET)
+            x, y = downsampling.trace_xy(df, 'value', CHART_POINT_BUDGET)
+            payload = len(json.dumps({'x': x, 'y': y}))
+            elapsed = (time.perf_counter() - start) * 1000
+            kept = 'oui' if abs(max(y) - peak) < 1e-6 else 'non'
+            print(f"{days:>9} j{rows:>10}{len(y):>8}{payload / 1024:>11.1f}{elapsed:>12.1f}{kept:>14}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import pandas as pd
+from sqlalchemy import text
+
+# Ajout du dossier parent au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import get_engine
+from load_data import ATHLETE_SCHEMA, copy_chunks, read_olympic_chunks, supports_copy
+
+# --- Benchmark : ingestion COPY vs to_sql ---
+# Usage : python scripts/bench_ingestion.py [chemin_csv]
+# Charge le CSV dans une table temporaire 'bench_athlete_events' (supprimée à la fin),
+# jamais dans la table utilisée par l'application.
+BENCH_TABLE = 'bench_athlete_events'
+
+
+def bench_to_sql(engine, csv_path):
+    # Ancien chemin de load_olympic_data
+    df = pd.read_csv(csv_path)
+    df['Medal'] = df['Medal'].fillna('None')
+    df.to_sql(BENCH_TABLE, engine, if_exists='replace', index=False, chunksize=1000)
+    return len(df)
+
+
+def bench_copy(engine, csv_path):
+    return copy_chunks(engine, BENCH_TABLE, ATHLETE_SCHEMA, read_olympic_chunks(csv_path))
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('data', 'athlete_events.csv')
+    engine = get_engine()
+    if not supports_copy(engine):
+        print("Ce benchmark nécessite PostgreSQL avec psycopg2.")
+        sys.exit(1)
+
+    results = []
+    for label, fn in [('to_sql', bench_to_sql), ('copy', bench_copy)]:
+        start = time.perf_counter()
+        rows = fn(engine, csv_path)
+        elapsed = time.perf_counter() - start
+        results.append((label, rows, elapsed))
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+    print(f"{'Mode':<10}{'Lignes':>10}{'Durée (s)':>12}{'Lignes/s':>12}")
+    for label, rows, elapsed in results:
+        print(f"{label:<10}{rows:>10}{elapsed:>12.2f}{rows / elapsed:>12.0f}")
+    print(f"Gain COPY : {results[0][2] / results[1][2]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
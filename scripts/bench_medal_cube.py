@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Ajout du dossier parent au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from aggregates import MedalCube
+from synthetic import synthetic_events
+
+# --- Benchmark : filtrage pandas par callback vs cube pré-agrégé ---
+# Usage : python scripts/bench_medal_cube.py [nb_lignes]
+# Utilise data/athlete_events.csv s'il existe, sinon des données synthétiques.
+
+
+# Reproduction fidèle de l'ancien chemin des callbacks
+def old_top_nations(df_medals, season, sport):
+    filtered = df_medals[(df_medals['Season'] == season) & (df_medals['Sport'] == sport)]
+    counts = filtered['NOC'].value_counts().reset_index()
+    counts.columns = ['NOC', 'Count']
+    return counts.head(3)
+
+
+def old_comparison(df_medals, season, country1, country2):
+    season_df = df_medals[df_medals['Season'] == season]
+    comparison_df = season_df[season_df['NOC'].isin([country1, country2])].copy()
+    yearly_counts = comparison_df.groupby(['Year', 'NOC'])['Medal'].count().reset_index()
+    yearly_counts.columns = ['Year', 'NOC', 'Total Medals']
+    return yearly_counts
+
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    return (time.perf_counter() - start) / len(calls) * 1000
+
+
+def main():
+    csv_path = os.path.join('data', 'athlete_events.csv')
+    if len(sys.argv) > 1:
+        df = synthetic_events(int(sys.argv[1]))
+    elif os.path.exists(csv_path):
+        df = pd.read_csv(csv_path)
+        df['Medal'] = df['Medal'].fillna('None')
+    else:
+        df = synthetic_events(271116)
+    print(f"Lignes : {len(df)}")
+
+    start = time.perf_counter()
+    df_medals = df[df['Medal'] != 'None'].copy()
+    cube = MedalCube.from_dataframe(df)
+    print(f"Construction du cube : {(time.perf_counter() - start) * 1000:.1f} ms (une seule fois)")
+
+    rng = np.random.default_rng(0)
+    nations = sorted(df['NOC'].unique().tolist())
+    top_calls = [(s, sp) for s in ('Summer', 'Winter') for sp in cube.sports(s)]
+    cmp_calls = [(rng.choice(['Summer', 'Winter']), *rng.choice(nations, size=2)) for _ in range(200)]
+
+    old_top = timed(lambda s, sp: old_top_nations(df_medals, s, sp), top_calls)
+    new_top = timed(lambda s, sp: cube.top_nations(s, sp), top_calls)
+    old_cmp = timed(lambda s, a, b: old_comparison(df_medals, s, a, b), cmp_calls)
+    new_cmp = timed(lambda s, a, b: cube.yearly_counts(s, [a, b]), cmp_calls)
+
+    print(f"{'Callback':<20}{'pandas (ms)':>14}{'cube (ms)':>12}{'gain':>10}")
+    print(f"{'update_top_nations':<20}{old_top:>14.3f}{new_top:>12.3f}{old_top / new_top:>9.0f}x")
+    print(f"{'update_comparison':<20}{old_cmp:>14.3f}{new_cmp:>12.3f}{old_cmp / new_cmp:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# --- Suite de benchmarks : ingestion, agrégation, pages et callbacks ---
+# Usage :
+#   python scripts/benchmark.py --rows 270000 1000000 --output bench.json
+#   python scripts/benchmark.py --database-url postgresql://... --rows 270000 5000000 50000000
+#   python scripts/benchmark.py --compare ancien.json --output nouveau.json
+#
+# La base ciblée est ENTIÈREMENT réécrite (athlete_events, vues, métriques) :
+# par défaut une base SQLite temporaire, sinon une base PostgreSQL dédiée.
+# Les pages et callbacks mesurés sont ceux de l'application (import de app.py),
+# appelés directement, avec le cache de figures et le fournisseur de données.
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks de l'application Dash")
+    parser.add_argument('--database-url', default=None,
+                        help="base dédiée aux benchmarks (défaut : SQLite temporaire)")
+    parser.add_argument('--rows', type=int, nargs='+', default=[270000],
+                        help="tailles de athlete_events synthétiques (ex : 270000 1000000 50000000)")
+    parser.add_argument('--repeat', type=int, default=20, help="appels mesurés par callback")
+    parser.add_argument('--output', default=None, help="fichier JSON des résultats")
+    parser.add_argument('--compare', default=None, help="résultats JSON d'un run précédent")
+    return parser.parse_args()
+
+
+args = parse_args()
+# Avant tout import de l'application : config.py lit DATABASE_URL à l'import
+if args.database_url:
+    os.environ['DATABASE_URL'] = args.database_url
+elif 'BENCH_DATABASE_URL' in os.environ:
+    os.environ['DATABASE_URL'] = os.environ['BENCH_DATABASE_URL']
+else:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'dataviz_bench.sqlite')
+os.environ.setdefault('REQUEST_LOG_ENABLED', '0')
+sys.path[:0] = [ROOT, SCRIPTS]
+os.chdir(ROOT)
+
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+import app  # noqa: F401 (enregistre les pages)
+import load_data
+import queries
+from config import get_engine
+from data_provider import provider
+from figure_cache import figure_cache
+from synthetic import synthetic_chunks
+
+data_manager = sys.modules['pages.data_manager']
+admin = sys.modules['pages.admin']
+developper = sys.modules['pages.developper']
+
+
+def reset_peak_rss():
+    # Linux : remet le pic de mémoire résidente (VmHWM) à la valeur actuelle, pour
+    # mesurer le pic de chaque taille. Renvoie False si c'est impossible
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    # Pic de mémoire résidente depuis le dernier reset_peak_rss (VmHWM, en ko),
+    # sinon depuis le démarrage du processus (ru_maxrss, en ko sous Linux)
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextlib.contextmanager
+def uncached():
+    # Ni dossier commun aux workers, ni cache partagé entre nœuds (SHARED_CACHE_URL) :
+    # les mesures « sans cache » recalculent vraiment données et figures
+    saved = figure_cache.disk, figure_cache.shared, provider.shared
+    figure_cache.disk = figure_cache.shared = provider.shared = None
+    try:
+        yield
+    finally:
+        figure_cache.disk, figure_cache.shared, provider.shared = saved
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def json_size(value):
+    return len(json.dumps(value, cls=PlotlyJSONEncoder))
+
+
+# --- Phases ---
+def ingest(engine, n_rows):
+    # Chemin du loader : COPY sous PostgreSQL, to_sql sinon
+    queries.drop_views(engine)
+    chunks = synthetic_chunks(n_rows, chunksize=load_data.LOAD_CHUNKSIZE)
+    start = time.perf_counter()
+    rows = load_data.bulk_load(engine, 'athlete_events', load_data.ATHLETE_SCHEMA, chunks,
+                               load_data.ATHLETE_INDEXES, key=load_data.ATHLETE_KEY)
+    elapsed = time.perf_counter() - start
+    return {'rows': rows, 'seconds': round(elapsed, 3), 'rows_per_s': round(rows / elapsed)}
+
+
+def aggregate(engine):
+    start = time.perf_counter()
+    queries.ensure_views(engine)
+    load_data.bump_medal_version(engine)
+    return {'views_seconds': round(time.perf_counter() - start, 3)}
+
+
+def ensure_metric_tables(engine):
+    # Métriques admin / développeur (30 jours fictifs) si la base n'en a pas
+    load_data.ensure_metadata_table(engine)
+    load_data.generate_and_load_admin_data(engine)
+    load_data.generate_and_load_dev_data(engine)
+    load_data.rollup_metric_kpis(engine)
+
+
+def cold_start():
+    # 1. Démarrage d'un processus neuf (import de l'application et de ses pages)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, env=os.environ.copy())
+    result = {'app_import_s': round(time.perf_counter() - start, 3), 'pages': {}}
+
+    # 2. Première vue de chaque page : données et figures à charger
+    for page, view in PAGE_VIEWS.items():
+        provider.reset()
+        figure_cache.clear()
+        with uncached():
+            start = time.perf_counter()
+            view()
+            result['pages'][page] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+# render() trace lui-même les graphiques et la table de l'état initial
+def view_data_manager():
+    data_manager.render()
+
+
+def view_admin():
+    admin.render()
+
+
+def view_developer():
+    developper.render()
+
+
+PAGE_VIEWS = {'data_manager': view_data_manager, 'admin': view_admin, 'developer': view_developer}
+
+
+def callback_inputs(repeat):
+    rng = random.Random(0)
+    cube = data_manager.get_cube()
+    nations = provider.get('nations', [])
+    seasons = ['Summer', 'Winter']
+    sort_options = [[], [{'column_id': 'Name', 'direction': 'asc'}], [{'column_id': 'Year', 'direction': 'desc'}]]
+    filters = ['', '{Sport} contains Sport1', '{Year} >= 2000']
+
+    def pick_sport():
+        season = rng.choice(seasons)
+        return season, rng.choice(cube.sports(season))
+
+    def pick_drill():
+        # Exploration pays, ou pays + sport (intersection de deux listes de l'index)
+        season, sport = pick_sport()
+        drill = dict(data_manager.EMPTY_DRILL, noc=rng.choice(nations))
+        if rng.random() < 0.5:
+            drill['sport'] = sport
+        return season, drill
+
+    return {
+        'update_top_nations': (data_manager.update_top_nations, [pick_sport() for _ in range(repeat)]),
+        'update_comparison': (data_manager.update_comparison,
+                              [(rng.choice(seasons), *rng.sample(nations, 2)) for _ in range(repeat)]),
+        'update_drilldown': (data_manager.update_drilldown, [pick_drill() for _ in range(repeat)]),
+        'update_raw_table': (data_manager.update_raw_table,
+                             [(rng.randint(0, 50), data_manager.RAW_PAGE_SIZE, rng.choice(sort_options), rng.choice(filters))
+                              for _ in range(repeat)]),
+        'update_admin_graphs': (admin.update_admin_graphs, [(None, None)] * repeat),
+        'update_dev_graphs': (developper.update_dev_graphs, [(None, None)] * repeat),
+    }
+
+
+def measure_callbacks(repeat):
+    results = {}
+    for name, (fn, calls) in callback_inputs(repeat).items():
+        # Sans cache : le calcul complet à chaque appel
+        durations, sizes = [], []
+        with uncached():
+            for call in calls:
+                figure_cache.clear()
+                start = time.perf_counter()
+                value = fn(*call)
+                durations.append((time.perf_counter() - start) * 1000)
+                sizes.append(json_size(value))
+        # Avec cache : mêmes entrées, une fois en cache
+        cached = []
+        for call in calls:
+            fn(*call)
+            start = time.perf_counter()
+            fn(*call)
+            cached.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'p50_ms': round(percentile(durations, 0.5), 3),
+            'p95_ms': round(percentile(durations, 0.95), 3),
+            'max_ms': round(max(durations), 3),
+            'cached_p50_ms': round(percentile(cached, 0.5), 3),
+            'json_bytes_max': max(sizes),
+        }
+    return results
+
+
+def run(engine, n_rows, repeat):
+    print(f"--- {n_rows} lignes ---")
+    # Pic mémoire propre à cette taille (sinon : pic cumulé depuis le démarrage)
+    result = {'rows': n_rows, 'peak_rss_scope': 'run' if reset_peak_rss() else 'process'}
+    result['ingestion'] = ingest(engine, n_rows)
+    print(f"Ingestion : {result['ingestion']['rows_per_s']} lignes/s")
+    result['aggregation'] = aggregate(engine)
+    result['cold_start'] = cold_start()
+    print(f"Démarrage à froid : {result['cold_start']}")
+    result['callbacks'] = measure_callbacks(repeat)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def print_report(results):
+    for run_result in results['runs']:
+        print(f"\n{run_result['rows']} lignes - ingestion {run_result['ingestion']['rows_per_s']} lignes/s, "
+              f"vues {run_result['aggregation']['views_seconds']} s, pic mémoire {run_result['peak_rss_mb']} Mo")
+        print(f"{'Callback':<22}{'p50 (ms)':>10}{'p95 (ms)':>10}{'max (ms)':>10}{'caché (ms)':>12}{'JSON (o)':>10}")
+        for name, stats in run_result['callbacks'].items():
+            print(f"{name:<22}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+                  f"{stats['cached_p50_ms']:>12.3f}{stats['json_bytes_max']:>10}")
+
+
+def compare(previous, current):
+    # Ratio nouveau / ancien (> 1 = plus lent ou plus gros) pour chaque taille commune
+    old_runs = {r['rows']: r for r in previous['runs']}
+    print(f"\nComparaison avec {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')})")
+    for run_result in current['runs']:
+        old = old_runs.get(run_result['rows'])
+        if old is None:
+            continue
+        ratio = old['ingestion']['rows_per_s'] / run_result['ingestion']['rows_per_s']
+        print(f"{run_result['rows']} lignes - durée d'ingestion x{ratio:.2f}")
+        # Pics mémoire comparables seulement s'ils sont mesurés par taille dans les deux runs
+        if old.get('peak_rss_scope') == run_result['peak_rss_scope'] == 'run':
+            print(f"  pic mémoire x{run_result['peak_rss_mb'] / max(old['peak_rss_mb'], 1e-6):.2f}")
+        for name, stats in run_result['callbacks'].items():
+            if name in old['callbacks']:
+                before = old['callbacks'][name]
+                print(f"  {name:<22} p50 x{stats['p50_ms'] / max(before['p50_ms'], 1e-6):.2f}"
+                      f"  JSON x{stats['json_bytes_max'] / max(before['json_bytes_max'], 1):.2f}")
+
+
+def main():
+    engine = get_engine()
+    if engine is None:
+        sys.exit(1)
+    print(f"Base : {engine.dialect.name} ({engine.url.render_as_string(hide_password=True)})")
+    ensure_metric_tables(engine)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'dialect': engine.dialect.name,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'runs': [run(engine, n_rows, args.repeat) for n_rows in args.rows],
+    }
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nRésultats écrits dans {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
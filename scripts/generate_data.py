@@ -0,0 +1,77 @@
+import argparse
+import os
+import resource
+import sys
+import time
+import pandas as pd
+
+# Ajout du dossier parent au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import get_engine
+import kpi
+import load_data
+import queries
+from synthetic import synthetic_chunks, synthetic_metric_chunks, METRIC_PROFILES
+
+# --- Génération de données synthétiques en masse (tests de capacité) ---
+# Usage :
+#   python scripts/generate_data.py athlete_events --rows 50000000
+#   python scripts/generate_data.py admin_metrics --start 2020-01-01 --freq 1min
+#   python scripts/generate_data.py dev_metrics --days 365 --freq h --seed 7 --trend 0.3
+#
+# La table ciblée est REMPLACÉE, dans la base de DATABASE_URL (utiliser une base
+# dédiée). Les morceaux sont générés puis envoyés un par un (COPY sous
+# PostgreSQL) : la mémoire reste bornée quelle que soit la taille demandée.
+TABLES = ['athlete_events'] + list(METRIC_PROFILES)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Données synthétiques pour les tests de charge")
+    parser.add_argument('table', choices=TABLES)
+    parser.add_argument('--rows', type=int, default=1000000, help="lignes de athlete_events")
+    parser.add_argument('--start', default=None, help="première date des métriques (défaut : fin - days)")
+    parser.add_argument('--end', default=None, help="dernière date des métriques (défaut : aujourd'hui)")
+    parser.add_argument('--days', type=int, default=30, help="historique des métriques sans --start")
+    parser.add_argument('--freq', default='D', help="pas des métriques : D, h, 15min, min...")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--noise', type=float, default=1.0, help="facteur du bruit (0 = courbes lisses)")
+    parser.add_argument('--seasonality', type=float, default=1.0, help="facteur des cycles jour / semaine")
+    parser.add_argument('--trend', type=float, default=0.0, help="croissance annuelle (0.2 = +20 %% par an)")
+    parser.add_argument('--chunksize', type=int, default=200000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    engine = get_engine()
+    if engine is None:
+        sys.exit(1)
+
+    start = time.perf_counter()
+    if args.table == 'athlete_events':
+        # Les vues matérialisées dépendent de la table : supprimées puis recréées
+        queries.drop_views(engine)
+        chunks = synthetic_chunks(args.rows, chunksize=args.chunksize, seed=args.seed)
+        rows = load_data.bulk_load(engine, 'athlete_events', load_data.ATHLETE_SCHEMA, chunks,
+                                   load_data.ATHLETE_INDEXES, key=load_data.ATHLETE_KEY)
+        queries.ensure_views(engine)
+    else:
+        end = pd.Timestamp(args.end) if args.end else pd.Timestamp.today().normalize()
+        first = pd.Timestamp(args.start) if args.start else end - pd.Timedelta(days=args.days - 1)
+        chunks = synthetic_metric_chunks(
+            args.table, first, end, args.freq, chunksize=args.chunksize, seed=args.seed,
+            noise=args.noise, seasonality=args.seasonality, trend=args.trend
+        )
+        rows = load_data.bulk_load(engine, args.table, load_data.METRIC_SCHEMAS[args.table], chunks)
+        load_data.ensure_metric_indexes(engine)
+        if args.table in kpi.KPI_COLUMNS:
+            kpi.refresh_rollup(engine, args.table, full=True)
+    elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{args.table} : {rows} lignes en {elapsed:.1f} s ({rows / elapsed:.0f} lignes/s), "
+          f"pic mémoire {peak_mb:.0f} Mo")
+
+
+if __name__ == "__main__":
+    main()
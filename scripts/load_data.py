@@ -1,119 +1,722 @@
 import pandas as pd
+import concurrent.futures
+import contextlib
+import glob
+import hashlib
+import io
+import multiprocessing
 import os
 import sys
+import tempfile
 import time
 import random
-from datetime import datetime, timedelta
+import uuid
 from sqlalchemy import text, inspect
 
 # Ajout du dossier parent au path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import get_engine
+import health
+import kpi
+import queries
+import request_log
+import snapshot
+from synthetic import synthetic_metrics
+
+# Mode d'ingestion : 'copy' (COPY FROM STDIN, par défaut) ou 'to_sql' (INSERT par lots, ancien chemin)
+LOAD_MODE = os.getenv('LOAD_MODE', 'copy')
+# Nombre de lignes lues et envoyées par morceau : le CSV n'est jamais entièrement en mémoire
+LOAD_CHUNKSIZE = int(os.getenv('LOAD_CHUNKSIZE', '50000'))
+# Données admin fictives (démo) : par défaut, admin_metrics vient du journal des requêtes
+ADMIN_DEMO_DATA = os.getenv('ADMIN_DEMO_DATA', '0') == '1'
+# Historique généré au premier lancement pour les métriques fictives (jours)
+DEMO_HISTORY_DAYS = int(os.getenv('DEMO_HISTORY_DAYS', '30'))
+# Ingestion parallèle des CSV de data/ : processus de lecture et de conversion, et
+# nombre maximal de fichiers écrits en même temps dans PostgreSQL (une connexion chacun)
+LOAD_WORKERS = int(os.getenv('LOAD_WORKERS', str(os.cpu_count() or 1)))
+LOAD_DB_CONNECTIONS = int(os.getenv('LOAD_DB_CONNECTIONS', '4'))
+# Flux COPY d'un fichier converti : en mémoire jusqu'à cette taille, puis sur disque
+LOAD_SPOOL_BYTES = int(os.getenv('LOAD_SPOOL_MB', '64')) * 1024 * 1024
+# Attente de la BDD au démarrage : délai doublé à chaque essai (plafonné), abandon après ce délai
+LOAD_DB_WAIT_SECONDS = int(os.getenv('LOAD_DB_WAIT_SECONDS', '300'))
+LOAD_DB_BACKOFF_MAX = 15
+
+# --- 0. INGESTION EN MASSE (COPY) ---
+# Schéma explicite de athlete_events (au lieu des types devinés par to_sql)
+ATHLETE_SCHEMA = [
+    ('ID', 'INTEGER'),
+    ('Name', 'TEXT'),
+    ('Sex', 'TEXT'),
+    ('Age', 'SMALLINT'),
+    ('Height', 'REAL'),
+    ('Weight', 'REAL'),
+    ('Team', 'TEXT'),
+    ('NOC', 'TEXT'),
+    ('Games', 'TEXT'),
+    ('Year', 'SMALLINT'),
+    ('Season', 'TEXT'),
+    ('City', 'TEXT'),
+    ('Sport', 'TEXT'),
+    ('Event', 'TEXT'),
+    ('Medal', 'TEXT'),
+]
+# Types pandas correspondants (entiers nullables pour écrire "24" et non "24.0")
+ATHLETE_DTYPES = {'ID': 'Int32', 'Age': 'Int16', 'Year': 'Int16', 'Height': 'float32', 'Weight': 'float32'}
+ATHLETE_COLUMNS = [name for name, _ in ATHLETE_SCHEMA]
+# Index créés après le chargement (beaucoup plus rapide que de les maintenir ligne à ligne)
+ATHLETE_INDEXES = {
+    'athlete_events_season_sport_idx': ['Season', 'Sport'],
+    'athlete_events_noc_year_idx': ['NOC', 'Year'],
+    # Tri / filtres de la table brute paginée (data_manager)
+    'athlete_events_year_idx': ['Year'],
+    'athlete_events_name_idx': ['Name'],
+}
+
+
+def read_olympic_chunks(csv_path, chunksize=LOAD_CHUNKSIZE):
+    for chunk in pd.read_csv(csv_path, dtype=ATHLETE_DTYPES, chunksize=chunksize):
+        chunk['Medal'] = chunk['Medal'].fillna('None')
+        yield chunk
+
+
+def index_statements(table, indexes):
+    for name, columns in indexes.items():
+        cols = ', '.join(f'"{c}"' for c in columns)
+        yield f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})"
+
+
+def create_indexes(conn, table, indexes):
+    for statement in index_statements(table, indexes):
+        conn.execute(text(statement))
+
+
+def copy_statement(table, columns):
+    column_list = ', '.join(f'"{name}"' for name in columns)
+    return f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '')"
+
+
+def copy_into(cursor, table, columns, chunks):
+    # Envoie chaque morceau via COPY FROM STDIN ; renvoie le nombre de lignes copiées
+    copy_sql = copy_statement(table, columns)
+    total = 0
+    for chunk in chunks:
+        buffer = io.StringIO()
+        chunk[columns].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+        total += len(chunk)
+        print(f"  {table} : {total} lignes copiées...")
+    return total
+
+
+def copy_chunks(engine, table, schema, chunks, indexes=None, key=None):
+    # (Re)crée la table puis envoie chaque morceau via COPY FROM STDIN,
+    # le tout dans une seule transaction : en cas d'erreur, l'ancienne table reste en place.
+    # key : clé unique attendue par le chargement incrémental (créée après le COPY)
+    definition = ', '.join(f'"{name}" {sql_type}' for name, sql_type in schema)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TABLE {table} ({definition})")
+
+        total = copy_into(cursor, table, [name for name, _ in schema], chunks)
+
+        if key:
+            prepare_keyed_table(cursor, table, schema, key, indexes)
+        else:
+            for statement in index_statements(table, indexes or {}):
+                cursor.execute(statement)
+        cursor.execute(f"ANALYZE {table}")
+        raw.commit()
+        return total
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def prepare_keyed_table(cursor, table, schema, key, indexes=None):
+    # Table cible avec sa clé unique (nécessaire à ON CONFLICT) et ses index
+    definition = ', '.join(f'"{name}" {sql_type}' for name, sql_type in schema)
+    key_list = ', '.join(f'"{c}"' for c in key)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_key ON {table} ({key_list})")
+    for statement in index_statements(table, indexes or {}):
+        cursor.execute(statement)
+
+
+def create_staging(cursor, table):
+    # Table temporaire propre à la connexion, supprimée à la fin de la transaction
+    staging = f"{table}_staging"
+    cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    return staging
+
+
+def merge_staging(cursor, table, staging, columns, key):
+    # Fusionne la table temporaire dans la cible sur la clé ; seules les lignes
+    # nouvelles ou réellement modifiées sont écrites. Renvoie leur nombre
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    key_list = ', '.join(f'"{c}"' for c in key)
+    others = [c for c in columns if c not in key]
+    updates = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in others)
+    current = ', '.join(f'{table}."{c}"' for c in others)
+    incoming = ', '.join(f'EXCLUDED."{c}"' for c in others)
+    # DISTINCT ON : une seule ligne par clé (le CSV source contient des doublons exacts).
+    # Le tri par clé fixe aussi l'ordre des verrous : deux fusions simultanées
+    # sur des clés communes s'attendent au lieu de s'interbloquer
+    cursor.execute(
+        f"INSERT INTO {table} ({column_list}) "
+        f"SELECT DISTINCT ON ({key_list}) {column_list} FROM {staging} ORDER BY {key_list} "
+        f"ON CONFLICT ({key_list}) DO UPDATE SET {updates} "
+        f"WHERE ({current}) IS DISTINCT FROM ({incoming})"
+    )
+    return cursor.rowcount
+
+
+def upsert_rows(engine, table, df, key):
+    # Upsert d'un petit DataFrame (métriques quotidiennes) sur la clé donnée
+    if not inspect(engine).has_table(table):
+        df.head(0).to_sql(table, engine, index=False)
+    columns = list(df.columns)
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    key_list = ', '.join(f'"{c}"' for c in key)
+    updates = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in columns if c not in key)
+    statement = text(
+        f"INSERT INTO {table} ({column_list}) "
+        f"VALUES ({', '.join(':' + c for c in columns)}) "
+        f"ON CONFLICT ({key_list}) DO UPDATE SET {updates}"
+    )
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_key ON {table} ({key_list})"))
+        # Timestamp pandas -> datetime (seul type de date accepté par tous les pilotes)
+        records = [
+            {k: v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for k, v in row.items()}
+            for row in df.to_dict('records')
+        ]
+        conn.execute(statement, records)
+
+
+def supports_copy(engine):
+    # COPY n'est disponible qu'avec PostgreSQL via psycopg2
+    return engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+
+
+def bulk_load(engine, table, schema, chunks, indexes=None, key=None):
+    # Remplace la table par les morceaux générés / lus, sans jamais les réunir
+    # en mémoire : COPY sous PostgreSQL, to_sql par lots sinon. Renvoie le nombre de lignes.
+    # key : clé unique (ex. ATHLETE_KEY) ; sans elle, prepare_athlete_table
+    # reconstruirait la table au prochain chargement incrémental
+    if supports_copy(engine):
+        return copy_chunks(engine, table, schema, chunks, indexes, key)
+    rows = 0
+    for chunk in chunks:
+        chunk.to_sql(table, engine, if_exists='replace' if rows == 0 else 'append', index=False, chunksize=10000)
+        rows += len(chunk)
+    with engine.begin() as conn:
+        if key:
+            key_list = ', '.join(f'"{c}"' for c in key)
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_key ON {table} ({key_list})"))
+        create_indexes(conn, table, indexes or {})
+    return rows
+
+
+# --- 0b. MÉTADONNÉES DE CHARGEMENT ---
+# Une ligne par source : signature du fichier (taille, date, empreinte), nombre de
+# lignes et filigrane (dernière date/année chargée). Permet de relancer le script
+# à chaque démarrage du conteneur sans rien recharger si rien n'a changé.
+METADATA_TABLE = 'load_metadata'
+
+
+def ensure_metadata_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (
+                source TEXT PRIMARY KEY,
+                file_size BIGINT,
+                file_mtime DOUBLE PRECISION,
+                file_hash TEXT,
+                row_count BIGINT,
+                watermark TEXT,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+
+def read_metadata(engine, source):
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"SELECT * FROM {METADATA_TABLE} WHERE source = :source"), {'source': source}
+        ).mappings().first()
+    return dict(row) if row else None
+
+
+def write_metadata(engine, source, **values):
+    columns = ['source'] + list(values) + ['loaded_at']
+    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns[1:])
+    placeholders = ', '.join(f":{c}" for c in columns[:-1]) + ", CURRENT_TIMESTAMP"
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO {METADATA_TABLE} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT (source) DO UPDATE SET {updates}"
+        ), {'source': source, **values})
+
+
+def delete_metadata(engine, source):
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {METADATA_TABLE} WHERE source = :source"), {'source': source})
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 # --- 1. CHARGEMENT DES JO (Données Réelles) ---
+# Clé naturelle d'une participation : un athlète, une édition, une épreuve
+ATHLETE_KEY = ['ID', 'Games', 'Event']
+ATHLETE_TABLE = 'athlete_events'
+# Sources : tous les CSV au format athlete_events sous data/ (un fichier unique
+# ou des partitions par édition, par région...), chargés dans la même table
+SOURCES_DIR = 'data'
+# Sous-dossiers de data/ écrits par l'application (exports, snapshot Arrow) : jamais des sources
+IGNORED_DIRS = {'exports', 'snapshot'}
+
+
+def discover_sources(root=SOURCES_DIR):
+    paths = [
+        path for path in glob.glob(os.path.join(root, '**', '*.csv'), recursive=True)
+        if not IGNORED_DIRS & set(os.path.relpath(path, root).split(os.sep)[:-1])
+    ]
+    # Les plus gros d'abord : les petits fichiers comblent la fin du chargement
+    return sorted(paths, key=os.path.getsize, reverse=True)
+
+
+def is_unchanged(meta, stat):
+    # Même taille et même date de modification que lors du dernier chargement
+    return meta is not None and meta['file_size'] == stat.st_size and meta['file_mtime'] == stat.st_mtime
+
+
+# Partagé par les processus du pool (voir _init_worker)
+_db_slots = contextlib.nullcontext()
+
+
+def _init_worker(slots):
+    global _db_slots
+    _db_slots = slots
+
+
+def ingest_source(path, table=ATHLETE_TABLE, known_hash=None):
+    # Exécuté dans un processus du pool. Renvoie un dict de résultats ;
+    # une exception n'affecte que ce fichier (sa transaction est annulée)
+    start = time.perf_counter()
+    digest = file_hash(path)
+    if digest == known_hash:
+        # Fichier touché mais contenu identique
+        return {'hash': digest, 'rows': None, 'changed': 0, 'seconds': time.perf_counter() - start, 'wait': 0.0}
+
+    header = set(pd.read_csv(path, nrows=0).columns)
+    missing = [name for name in ATHLETE_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"colonnes manquantes : {', '.join(missing)}")
+
+    # 1. Lecture, typage et conversion au format COPY, sans connexion ouverte
+    rows, last_year = 0, None
+    with tempfile.SpooledTemporaryFile(max_size=LOAD_SPOOL_BYTES, mode='w+', newline='') as spool:
+        for chunk in read_olympic_chunks(path):
+            chunk[ATHLETE_COLUMNS].to_csv(spool, index=False, header=False)
+            rows += len(chunk)
+            if chunk['Year'].notna().any():
+                last_year = max(last_year or 0, int(chunk['Year'].max()))
+        spool.seek(0)
+
+        # 2. Écriture : au plus LOAD_DB_CONNECTIONS fichiers en même temps,
+        #    sur la connexion du pool de ce processus
+        waiting = time.perf_counter()
+        with _db_slots:
+            wait = time.perf_counter() - waiting
+            raw = get_engine().raw_connection()
+            try:
+                cursor = raw.cursor()
+                staging = create_staging(cursor, table)
+                cursor.copy_expert(copy_statement(staging, ATHLETE_COLUMNS), spool)
+                changed = merge_staging(cursor, table, staging, ATHLETE_COLUMNS, ATHLETE_KEY)
+                raw.commit()
+            except Exception:
+                raw.rollback()
+                raise
+            finally:
+                raw.close()
+
+    return {'hash': digest, 'rows': rows, 'changed': changed, 'watermark': last_year,
+            'seconds': time.perf_counter() - start, 'wait': wait}
+
+
+def run_ingestion(sources, table=ATHLETE_TABLE, workers=LOAD_WORKERS, connections=LOAD_DB_CONNECTIONS):
+    # sources : [(chemin, empreinte connue ou None)]. Génère (chemin, résultat ou exception)
+    # au fil des fichiers terminés. La table cible doit exister avec sa clé unique
+    slots = multiprocessing.BoundedSemaphore(max(1, connections))
+    workers = max(1, min(workers, len(sources)))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(slots,)) as executor:
+        futures = {executor.submit(ingest_source, path, table, known_hash): path for path, known_hash in sources}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+
+
+def prepare_athlete_table(engine):
+    # Une ancienne table sans clé unique (créée par to_sql) doit être reconstruite
+    if inspect(engine).has_table(ATHLETE_TABLE) and \
+            f"{ATHLETE_TABLE}_key" not in {ix['name'] for ix in inspect(engine).get_indexes(ATHLETE_TABLE)}:
+        queries.drop_views(engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {ATHLETE_TABLE}"))
+    raw = engine.raw_connection()
+    try:
+        prepare_keyed_table(raw.cursor(), ATHLETE_TABLE, ATHLETE_SCHEMA, ATHLETE_KEY, ATHLETE_INDEXES)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def load_olympic_sources(engine, paths):
+    # Charge en parallèle les fichiers nouveaux ou modifiés ; renvoie le nombre
+    # de lignes nouvelles ou modifiées. Un fichier en échec garde son ancienne
+    # signature et sera retenté au prochain lancement
+    has_table = inspect(engine).has_table(ATHLETE_TABLE)
+    pending = {}
+    for path in paths:
+        meta = read_metadata(engine, path)
+        stat = os.stat(path)
+        if not (has_table and is_unchanged(meta, stat)):
+            pending[path] = (stat, meta['file_hash'] if meta and has_table else None)
+    print(f"{len(paths)} fichier(s) CSV, {len(paths) - len(pending)} inchangé(s), {len(pending)} à charger.")
+    if not pending:
+        return 0
+
+    prepare_athlete_table(engine)
+    workers = max(1, min(LOAD_WORKERS, len(pending)))
+    print(f"Chargement des données Olympiques ({workers} processus, {LOAD_DB_CONNECTIONS} connexions)...")
+    start = time.perf_counter()
+    rows = changed = 0
+    failed = []
+    sources = [(path, known_hash) for path, (_, known_hash) in pending.items()]
+    for done, (path, result) in enumerate(run_ingestion(sources, workers=workers), 1):
+        health.write_load_status('loading', "données olympiques", done=done, total=len(pending))
+        progress = f"[{done}/{len(pending)}] {path}"
+        if isinstance(result, Exception):
+            failed.append(path)
+            print(f"{progress} : ÉCHEC ({type(result).__name__}: {result})")
+            continue
+        stat = pending[path][0]
+        if result['rows'] is None:
+            write_metadata(engine, path, file_size=stat.st_size, file_mtime=stat.st_mtime)
+            print(f"{progress} : contenu identique")
+            continue
+        write_metadata(
+            engine, path, file_size=stat.st_size, file_mtime=stat.st_mtime, file_hash=result['hash'],
+            row_count=result['rows'], watermark=str(result['watermark'])
+        )
+        rows += result['rows']
+        changed += result['changed']
+        print(f"{progress} : {result['rows']} lignes, {result['changed']} nouvelles ou modifiées "
+              f"({result['seconds']:.1f} s dont {result['wait']:.1f} s d'attente d'une connexion)")
+
+    elapsed = time.perf_counter() - start
+    if changed:
+        with engine.begin() as conn:
+            conn.execute(text(f"ANALYZE {ATHLETE_TABLE}"))
+    print(f"Données Olympiques chargées : {rows} lignes en {elapsed:.1f} s ({rows / elapsed:.0f} lignes/s), "
+          f"{changed} nouvelles ou modifiées.")
+    if failed:
+        print(f"{len(failed)} fichier(s) en échec, retentés au prochain lancement : {', '.join(failed)}")
+    return changed
+
+
+def load_olympic_data_to_sql(engine, csv_path):
+    # Ancien chemin (LOAD_MODE=to_sql ou base sans COPY) : un seul CSV, table remplacée
+    stat = os.stat(csv_path)
+    meta = read_metadata(engine, csv_path)
+    has_table = inspect(engine).has_table(ATHLETE_TABLE)
+    if has_table and is_unchanged(meta, stat):
+        print(f"Table '{ATHLETE_TABLE}' à jour ({meta['row_count']} lignes). Skip.")
+        return False
+    digest = file_hash(csv_path)
+    if meta and has_table and meta['file_hash'] == digest:
+        write_metadata(engine, csv_path, file_size=stat.st_size, file_mtime=stat.st_mtime)
+        print(f"Table '{ATHLETE_TABLE}' à jour (contenu identique). Skip.")
+        return False
+
+    print("Chargement des données Olympiques...")
+    df = pd.read_csv(csv_path)
+    df['Medal'] = df['Medal'].fillna('None')
+    # Les vues matérialisées dépendent de la table : on les supprime avant le remplacement
+    queries.drop_views(engine)
+    df.to_sql(ATHLETE_TABLE, engine, if_exists='replace', index=False, chunksize=1000)
+    with engine.begin() as conn:
+        create_indexes(conn, ATHLETE_TABLE, ATHLETE_INDEXES)
+        last_year = conn.execute(text(f'SELECT MAX("Year") FROM {ATHLETE_TABLE}')).scalar()
+    write_metadata(
+        engine, csv_path, file_size=stat.st_size, file_mtime=stat.st_mtime,
+        file_hash=digest, row_count=len(df), watermark=str(last_year)
+    )
+    print(f"Données Olympiques chargées ({len(df)} lignes).")
+    return True
+
+
 def load_olympic_data(engine):
-    csv_path = os.path.join('data', 'athlete_events.csv')
-    TABLE_NAME = 'athlete_events'
-    
-    inspector = inspect(engine)
-    if inspector.has_table(TABLE_NAME):
-        with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {TABLE_NAME}"))
-            count = result.scalar()
-        if count > 0:
-            print(f"Table '{TABLE_NAME}' déjà remplie ({count} lignes). Skip.")
-            return
+    # Renvoie True si la table a changé (vues et snapshot à rafraîchir)
+    if LOAD_MODE == 'copy' and supports_copy(engine):
+        paths = discover_sources()
+        if not paths:
+            print("Aucun fichier CSV trouvé pour les JO.")
+            return False
+        return load_olympic_sources(engine, paths) > 0
 
+    csv_path = os.path.join(SOURCES_DIR, 'athlete_events.csv')
     if not os.path.exists(csv_path):
         print("Fichier CSV introuvable pour les JO.")
+        return False
+    return load_olympic_data_to_sql(engine, csv_path)
+
+
+def ensure_athlete_indexes(engine):
+    # Index utiles à la table brute, créés aussi sur une base déjà chargée
+    with engine.begin() as conn:
+        create_indexes(conn, 'athlete_events', ATHLETE_INDEXES)
+    # Index trigramme pour les filtres "contient" sur le nom (extension pg_trgm, optionnelle)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                'CREATE INDEX IF NOT EXISTS athlete_events_name_trgm_idx '
+                'ON athlete_events USING gin ("Name" gin_trgm_ops)'
+            ))
+    except Exception as e:
+        print(f"Index trigramme non créé (pg_trgm indisponible): {e}")
+
+
+# --- 1b. VUES MATÉRIALISÉES (Agrégats lus par les pages) ---
+def refresh_medal_views(engine, reloaded):
+    if not inspect(engine).has_table('athlete_events'):
+        print("Table 'athlete_events' absente, vues non créées.")
         return
 
-    print("Chargement des données Olympiques...")
-    df = pd.read_csv(csv_path)
-    df['Medal'] = df['Medal'].fillna('None')
-    df.to_sql(TABLE_NAME, engine, if_exists='replace', index=False, chunksize=1000)
-    print("Données Olympiques chargées.")
+    ensure_athlete_indexes(engine)
+    # Création si besoin (les vues sont remplies à la création)
+    queries.ensure_views(engine)
+    if reloaded:
+        print("Rafraîchissement des vues matérialisées...")
+        queries.refresh_views(engine)
+    if reloaded or read_metadata(engine, queries.MEDAL_VERSION_SOURCE) is None:
+        bump_medal_version(engine)
+    print("Vues matérialisées prêtes.")
+
+
+def bump_medal_version(engine):
+    # Nouvelle version des agrégats (queries.medal_fingerprint), publiée une fois
+    # les vues à jour : caches de figures, cache partagé et snapshot la suivent
+    write_metadata(engine, queries.MEDAL_VERSION_SOURCE, watermark=uuid.uuid4().hex)
+
 
-# --- 2. DONNÉES ADMIN (Fictives) ---
+# --- 1c. SNAPSHOT ARROW (lu par mmap au démarrage des workers) ---
+def write_snapshots(engine, reloaded):
+    if not snapshot.available():
+        print("Snapshot Arrow désactivé (pyarrow absent ou SNAPSHOT_DIR vide).")
+        return
+    version = queries.medal_fingerprint(engine)
+    if version is None:
+        return
+    if not reloaded and snapshot.is_current(version):
+        print("Snapshot Arrow à jour. Skip.")
+        return
+
+    print("Écriture du snapshot Arrow...")
+    tables = {name: pd.read_sql(f"SELECT * FROM {name}", engine) for name in queries.MATERIALIZED_VIEWS}
+    # Table nettoyée et typée, écrite par morceaux
+    tables['athlete_events'] = queries.iter_athlete_events(engine)
+    manifest = snapshot.write_snapshot(version, tables)
+    print(f"Snapshot Arrow écrit ({manifest['tables']['athlete_events']['rows']} lignes).")
+
+
+# --- 1d. JOURS MANQUANTS (Métriques quotidiennes) ---
+def missing_days(engine, table, history_days=30):
+    # Jours à générer : depuis le lendemain du filigrane (dernière date en base)
+    # jusqu'à aujourd'hui, ou les `history_days` derniers jours si la table est vide
+    today = pd.Timestamp.today().normalize()
+    start = today - pd.Timedelta(days=history_days - 1)
+    if inspect(engine).has_table(table):
+        with engine.connect() as conn:
+            last = conn.execute(text(f"SELECT MAX(date) FROM {table}")).scalar()
+        if last is not None:
+            start = pd.Timestamp(last).normalize() + pd.Timedelta(days=1)
+    return list(pd.date_range(start, today, freq='D'))
+
+
+def table_count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+# --- 1e. INDEX DES MÉTRIQUES ---
+# Les graphiques lisent des plages de dates (queries.read_metrics_range) : index unique sur date
+METRIC_TABLES = ['admin_metrics', 'admin_metrics_hourly', 'dev_metrics']
+# Schémas explicites (chargement en masse de données synthétiques, scripts/generate_data.py)
+ADMIN_METRICS_SCHEMA = [
+    ('date', 'TIMESTAMP'),
+    ('active_users', 'BIGINT'),
+    ('new_signups', 'BIGINT'),
+    ('server_errors', 'BIGINT'),
+    ('avg_response_time_ms', 'DOUBLE PRECISION'),
+]
+METRIC_SCHEMAS = {
+    'admin_metrics': ADMIN_METRICS_SCHEMA,
+    'admin_metrics_hourly': ADMIN_METRICS_SCHEMA,
+    'dev_metrics': [
+        ('date', 'TIMESTAMP'),
+        ('commits_count', 'BIGINT'),
+        ('bugs_reported', 'BIGINT'),
+        ('avg_build_time_sec', 'DOUBLE PRECISION'),
+        ('cpu_usage_percent', 'DOUBLE PRECISION'),
+        ('memory_usage_percent', 'DOUBLE PRECISION'),
+    ],
+}
+
+
+def ensure_metric_indexes(engine):
+    existing = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for table in METRIC_TABLES:
+            if table in existing:
+                conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_key ON {table} (date)"))
+
+
+# --- 1f. AGRÉGATS DES KPIs ---
+def rollup_metric_kpis(engine):
+    # Jours ajoutés depuis le dernier passage (reconstruction si la table a été réécrite)
+    existing = set(inspect(engine).get_table_names())
+    for table in kpi.KPI_COLUMNS:
+        if table in existing:
+            days = kpi.sync_rollup(engine, table)
+            print(f"Agrégat KPI de '{table}' à jour ({days} jours recalculés).")
+
+
+# --- 2. DONNÉES ADMIN ---
+def rollup_admin_metrics(engine):
+    # Tables du journal des requêtes + agrégats depuis le dernier jour agrégé
+    # (tout l'historique au premier lancement) ; l'application met ensuite à jour
+    # le jour courant toutes les REQUEST_LOG_ROLLUP_SECONDS secondes
+    request_log.ensure_tables(engine)
+    # Données fictives d'un lancement précédent (ADMIN_DEMO_DATA=1, signalé par leur
+    # ligne de métadonnées) : retirées une fois, sinon elles se mêleraient aux
+    # vraies métriques dans les graphiques et les KPIs pour toujours
+    if not ADMIN_DEMO_DATA and read_metadata(engine, 'admin_metrics') is not None:
+        removed = request_log.drop_unlogged_buckets(engine)
+        delete_metadata(engine, 'admin_metrics')
+        print(f"Métriques admin fictives supprimées ({removed} lignes sans journal de requêtes).")
+    since = request_log.last_rolled_since(engine)
+    request_log.rollup(engine, since=since)
+    print(f"Métriques admin agrégées depuis request_logs (à partir du {since:%Y-%m-%d}).")
+
+
+def demo_seed(dates):
+    # Graine tirée du premier jour généré : une relance produit les mêmes valeurs
+    return int(dates[0].strftime('%Y%m%d'))
+
+
+# Données fictives, uniquement avec ADMIN_DEMO_DATA=1
 def generate_and_load_admin_data(engine):
     TABLE_NAME = 'admin_metrics'
-    
-    inspector = inspect(engine)
-    if inspector.has_table(TABLE_NAME):
-        with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {TABLE_NAME}"))
-            count = result.scalar()
-        if count > 0:
-            print(f"Table '{TABLE_NAME}' déjà remplie. Skip.")
-            return
-
-    print("Génération des données Administrateur...")
-    dates = [datetime.today() - timedelta(days=i) for i in range(30)]
-    dates.sort()
-    
-    data = {
-        'date': dates,
-        'active_users': [random.randint(50, 500) for _ in range(30)],
-        'new_signups': [random.randint(0, 20) for _ in range(30)],
-        'server_errors': [random.randint(0, 10) for _ in range(30)],
-        'avg_response_time_ms': [random.uniform(100, 800) for _ in range(30)]
-    }
-    pd.DataFrame(data).to_sql(TABLE_NAME, engine, if_exists='replace', index=False)
+
+    dates = missing_days(engine, TABLE_NAME, DEMO_HISTORY_DAYS)
+    if not dates:
+        print(f"Table '{TABLE_NAME}' à jour. Skip.")
+        return
+
+    print(f"Génération des données Administrateur ({len(dates)} jours)...")
+    upsert_rows(engine, TABLE_NAME, synthetic_metrics(TABLE_NAME, dates, seed=demo_seed(dates)), key=['date'])
+    write_metadata(engine, TABLE_NAME, row_count=table_count(engine, TABLE_NAME), watermark=str(dates[-1].date()))
     print("Données Admin chargées.")
 
+
 # --- 3. DONNÉES DÉVELOPPEUR (Fictives - NOUVEAU) ---
 def generate_and_load_dev_data(engine):
     TABLE_NAME = 'dev_metrics'
-    
-    inspector = inspect(engine)
-    if inspector.has_table(TABLE_NAME):
-        with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {TABLE_NAME}"))
-            count = result.scalar()
-        if count > 0:
-            print(f"Table '{TABLE_NAME}' déjà remplie. Skip.")
-            return
-
-    print("Génération des données Développeur...")
-    dates = [datetime.today() - timedelta(days=i) for i in range(30)]
-    dates.sort()
-    
-    data = {
-        'date': dates,
-        'commits_count': [random.randint(2, 25) for _ in range(30)],       # Activité Git
-        'bugs_reported': [random.randint(0, 5) for _ in range(30)],        # Qualité code
-        'avg_build_time_sec': [random.uniform(120, 400) for _ in range(30)], # CI/CD
-        'cpu_usage_percent': [random.uniform(20, 90) for _ in range(30)],  # Monitoring Serveur
-        'memory_usage_percent': [random.uniform(40, 85) for _ in range(30)]
-    }
-    
-    pd.DataFrame(data).to_sql(TABLE_NAME, engine, if_exists='replace', index=False)
+
+    dates = missing_days(engine, TABLE_NAME, DEMO_HISTORY_DAYS)
+    if not dates:
+        print(f"Table '{TABLE_NAME}' à jour. Skip.")
+        return
+
+    print(f"Génération des données Développeur ({len(dates)} jours)...")
+    # Activité Git, qualité du code, CI/CD et monitoring serveur (voir synthetic.METRIC_PROFILES)
+    upsert_rows(engine, TABLE_NAME, synthetic_metrics(TABLE_NAME, dates, seed=demo_seed(dates)), key=['date'])
+    write_metadata(engine, TABLE_NAME, row_count=table_count(engine, TABLE_NAME), watermark=str(dates[-1].date()))
     print("Données Développeur chargées.")
 
+
 # --- MAIN ---
-def main_load():
-    engine = None
-    retries = 0
-    while retries < 15:
+def wait_for_database(timeout=LOAD_DB_WAIT_SECONDS):
+    # Backoff exponentiel avec gigue (0.5 s, 1 s, 2 s... jusqu'à LOAD_DB_BACKOFF_MAX)
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while True:
         engine = get_engine()
-        if engine:
+        error = "moteur SQLAlchemy indisponible"
+        if engine is not None:
             try:
                 with engine.connect() as conn:
                     conn.execute(text("SELECT 1"))
                 print("Connecté à PostgreSQL !")
-                break
-            except Exception:
-                pass
-        print("En attente de la BDD...")
-        time.sleep(2)
-        retries += 1
-    
+                return engine
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}".strip()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"BDD injoignable après {timeout} s ({error})")
+            return None
+        wait = min(delay * random.uniform(1, 1.5), remaining)
+        print(f"En attente de la BDD (nouvel essai dans {wait:.1f} s)...")
+        time.sleep(wait)
+        delay = min(delay * 2, LOAD_DB_BACKOFF_MAX)
+
+
+def main_load():
+    # Lancé en arrière-plan par entrypoint.sh : l'application sert déjà les pages
+    # (bandeau d'attente) et suit l'avancement via health.read_load_status()
+    health.write_load_status('waiting_db')
+    engine = wait_for_database()
     if not engine:
+        health.write_load_status('failed', error="BDD injoignable")
         sys.exit(1)
 
-    load_olympic_data(engine)
-    generate_and_load_admin_data(engine)
-    generate_and_load_dev_data(engine) # <-- Appel de la nouvelle fonction
+    try:
+        ensure_metadata_table(engine)
+        health.write_load_status('loading', "données olympiques")
+        reloaded = load_olympic_data(engine)
+        health.write_load_status('loading', "agrégats")
+        refresh_medal_views(engine, reloaded)
+        write_snapshots(engine, reloaded)
+        health.write_load_status('loading', "métriques")
+        if ADMIN_DEMO_DATA:
+            generate_and_load_admin_data(engine)
+        rollup_admin_metrics(engine)
+        generate_and_load_dev_data(engine) # <-- Appel de la nouvelle fonction
+        ensure_metric_indexes(engine)
+        rollup_metric_kpis(engine)
+    except Exception as e:
+        health.write_load_status('failed', error=f"{type(e).__name__}: {e}")
+        raise
+    health.write_load_status('ready')
+
 
 if __name__ == "__main__":
     main_load()
\ No newline at end of file
@@ -0,0 +1,171 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+
+# --- Test de charge des trois pages ---
+# Usage : python scripts/load_test.py --url http://localhost:8050 --duration 30 --concurrency 16
+# Une "vue de page" rejoue ce que fait le navigateur : GET de la page, callback du
+# routeur Dash (qui appelle layout()), puis les callbacks déclenchés par la page.
+# Les pages arrivent complètes (graphiques de l'état initial tracés par layout()) et
+# les callbacks de présentation tournent dans le navigateur : seules les interactions
+# qui dépendent des données (Data Manager) font des requêtes en plus.
+
+SEASONS = ['Summer', 'Winter']
+NATIONS = ['USA', 'FRA', 'GBR', 'GER', 'ITA', 'CAN', 'RUS', 'CHN', 'JPN', 'AUS']
+
+
+def _prop(component_id, prop, value):
+    return {'id': component_id, 'property': prop, 'value': value}
+
+
+def _find_prop(component, component_id, prop):
+    # Propriété d'un composant dans l'arbre JSON renvoyé par le routeur
+    if isinstance(component, list):
+        for child in component:
+            found = _find_prop(child, component_id, prop)
+            if found is not None:
+                return found
+        return None
+    if not isinstance(component, dict):
+        return None
+    props = component.get('props', {})
+    if props.get('id') == component_id:
+        return props.get(prop)
+    return _find_prop(props.get('children'), component_id, prop)
+
+
+def _outputs(*targets):
+    outputs = [{'id': c, 'property': p} for c, p in targets]
+    if len(outputs) == 1:
+        return f"{targets[0][0]}.{targets[0][1]}", outputs[0]
+    return '..' + '...'.join(f"{c}.{p}" for c, p in targets) + '..', outputs
+
+
+class Client:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.requests = 0
+
+    def get(self, path):
+        with urllib.request.urlopen(self.base_url + path) as resp:
+            resp.read()
+        self.requests += 1
+
+    def callback(self, targets, inputs):
+        output, outputs = _outputs(*targets)
+        body = json.dumps({'output': output, 'outputs': outputs, 'inputs': inputs,
+                           'changedPropIds': [], 'state': []}).encode()
+        req = urllib.request.Request(
+            self.base_url + '/_dash-update-component', data=body,
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(req) as resp:
+            data = resp.read()
+        self.requests += 1
+        return json.loads(data) if data else {}
+
+    def open_page(self, path):
+        self.get(path)
+        resp = self.callback(
+            [('_pages_content', 'children'), ('_pages_store', 'data')],
+            [_prop('_pages_location', 'pathname', path), _prop('_pages_location', 'search', '')]
+        )
+        return resp.get('response', {}).get('_pages_content', {}).get('children')
+
+
+# --- Scénarios : une vue de chaque page ---
+def view_admin(client):
+    client.open_page('/admin')
+
+
+def view_developer(client):
+    client.open_page('/developer')
+
+
+def view_data_manager(client):
+    # Ouverture, puis choix d'une saison (sports lus dans le Store, comme le navigateur),
+    # de deux pays et d'une page de la table
+    season = random.choice(SEASONS)
+    country1, country2 = random.sample(NATIONS, 2)
+    page = client.open_page('/data_manager')
+    sports = (_find_prop(page, 'dm-sports', 'data') or {}).get(season) or [None]
+    sport = sports[0]
+    client.callback([('top-nations-graph', 'figure')],
+                    [_prop('season-filter', 'value', season), _prop('sport-dropdown', 'value', sport),
+                     _prop('dm-drill', 'data', None)])
+    client.callback([('comparison-graph', 'figure')],
+                    [_prop('season-filter', 'value', season),
+                     _prop('country-1-dropdown', 'value', country1),
+                     _prop('country-2-dropdown', 'value', country2),
+                     _prop('dm-drill', 'data', None)])
+    client.callback([('raw-data-table', 'data'), ('raw-data-table', 'page_count')],
+                    [_prop('raw-data-table', 'page_current', random.randint(0, 50)),
+                     _prop('raw-data-table', 'page_size', 20),
+                     _prop('raw-data-table', 'sort_by', []),
+                     _prop('raw-data-table', 'filter_query', '')])
+
+
+SCENARIOS = {'admin': view_admin, 'developer': view_developer, 'data_manager': view_data_manager}
+
+
+def worker(base_url, deadline, results, lock):
+    client = Client(base_url)
+    while time.monotonic() < deadline:
+        page = random.choice(list(SCENARIOS))
+        start = time.perf_counter()
+        try:
+            SCENARIOS[page](client)
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            results.append((page, elapsed, ok))
+    with lock:
+        results.append(('__requests__', client.requests, True))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge des pages Dash")
+    parser.add_argument('--url', default='http://localhost:8050')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    results, lock = [], threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=worker, args=(args.url, deadline, results, lock))
+               for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    total_requests = sum(n for page, n, _ in results if page == '__requests__')
+    views = [r for r in results if r[0] != '__requests__']
+    print(f"Durée : {wall:.1f} s, concurrence : {args.concurrency}")
+    print(f"Requêtes HTTP : {total_requests} ({total_requests / wall:.1f} req/s, "
+          f"{total_requests / max(len(views), 1):.1f} par vue)")
+    print(f"{'Page':<15}{'Vues':>8}{'Erreurs':>9}{'Vues/s':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for page in SCENARIOS:
+        durations = [d for p, d, ok in views if p == page and ok]
+        errors = sum(1 for p, _, ok in views if p == page and not ok)
+        if not durations:
+            print(f"{page:<15}{0:>8}{errors:>9}")
+            continue
+        print(f"{page:<15}{len(durations):>8}{errors:>9}{len(durations) / wall:>9.1f}"
+              f"{percentile(durations, 0.5) * 1000:>10.1f}{percentile(durations, 0.95) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+import pandas as pd
+
+# Ajout du dossier parent au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import get_engine
+import queries
+
+# --- Rapport mémoire : athlete_events en 'object' vs chargement typé ---
+# Usage : python scripts/memory_report.py
+
+
+def main():
+    engine = get_engine()
+
+    plain = pd.read_sql("SELECT * FROM athlete_events", engine)
+    plain_report = queries.memory_report(plain)
+    del plain
+
+    compact = queries.read_athlete_events(engine)
+    compact_report = queries.memory_report(compact)
+
+    report = plain_report.join(compact_report, lsuffix=' (object)', rsuffix=' (typé)')
+    print(f"Lignes : {len(compact)}")
+    print(report.to_string())
+    ratio = plain_report.loc['TOTAL', 'MB'] / compact_report.loc['TOTAL', 'MB']
+    print(f"Réduction : {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import gzip
+import json
+import os
+import sys
+import time
+
+# Ajout du dossier parent au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('REQUEST_LOG_ENABLED', '0')
+import app  # noqa: F401 (enregistre les pages)
+import figure_payload
+from data_provider import provider
+from figure_cache import figure_cache
+
+# --- Taille des réponses des callbacks : JSON Plotly complet vs figures compactes ---
+# Usage : python scripts/payload_report.py
+# Pour chaque callback à figures (entrées représentatives), affiche la taille de
+# la réponse, sa taille gzip (ce qui passe sur le réseau) et le temps de
+# JSON.parse côté client, approché par json.loads.
+# En production, /metrics expose la même taille par callback
+# (dataviz_callback_payload_bytes, METRICS_ENABLED=1).
+
+data_manager = sys.modules['pages.data_manager']
+admin = sys.modules['pages.admin']
+developper = sys.modules['pages.developper']
+
+
+def calls():
+    cube = data_manager.get_cube()
+    sport = cube.sports('Summer')[0] if not cube.empty else None
+    return [
+        ('update_top_nations', data_manager.update_top_nations, ('Summer', sport)),
+        ('update_comparison', data_manager.update_comparison, ('Summer', 'USA', 'FRA')),
+        ('update_admin_graphs (live)', admin.update_admin_graphs, (None, None)),
+        ('update_admin_graphs (1 an)', admin.update_admin_graphs, ('2000-01-01', '2100-01-01')),
+        ('update_dev_graphs (live)', developper.update_dev_graphs, (None, None)),
+        ('update_dev_graphs (1 an)', developper.update_dev_graphs, ('2000-01-01', '2100-01-01')),
+    ]
+
+
+def measure(fn, args, compact):
+    figure_payload.FIGURE_COMPACT = compact
+    figure_cache.clear()
+    body = json.dumps(fn(*args)).encode()
+    start = time.perf_counter()
+    for _ in range(20):
+        json.loads(body)
+    parse_ms = (time.perf_counter() - start) / 20 * 1000
+    return len(body), len(gzip.compress(body)), parse_ms
+
+
+def main():
+    provider.warm()
+    print(f"{'Callback':<30}{'JSON (o)':>18}{'gzip (o)':>16}{'parse (ms)':>16}")
+    totals = [0, 0, 0, 0]
+    for name, fn, args in calls():
+        full = measure(fn, args, False)
+        compact = measure(fn, args, True)
+        totals = [totals[0] + full[0], totals[1] + compact[0], totals[2] + full[1], totals[3] + compact[1]]
+        print(f"{name:<30}{full[0]:>8} -> {compact[0]:>7}{full[1]:>7} -> {compact[1]:>6}"
+              f"{full[2]:>7.2f} -> {compact[2]:>6.2f}")
+    print(f"{'Total':<30}{totals[0]:>8} -> {totals[1]:>7}{totals[2]:>7} -> {totals[3]:>6}"
+          f"   (x{totals[0] / max(totals[1], 1):.1f} JSON, x{totals[2] / max(totals[3], 1):.1f} gzip)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# --- Données synthétiques (tests de charge et benchmarks) ---
+# 1. athlete_events : mêmes colonnes et mêmes types que le CSV
+#    (load_data.ATHLETE_SCHEMA), avec des proportions proches des vraies données :
+#    ~230 nations, ~70 sports, 15 % de médailles.
+# 2. admin_metrics / dev_metrics : séries temporelles à granularité libre (jour,
+#    heure, minute...) avec cycles journalier et hebdomadaire, tendance et bruit.
+# Tout est vectorisé (NumPy), reproductible (graine) et généré par morceaux :
+# 50 millions de lignes ne tiennent jamais en mémoire d'un coup.
+
+NOCS = [f"N{i:03d}" for i in range(230)]
+SPORTS = {'Summer': [f"Sport{i}" for i in range(52)], 'Winter': [f"WSport{i}" for i in range(17)]}
+YEARS = {'Summer': np.arange(1896, 2020, 4), 'Winter': np.arange(1924, 2020, 4)}
+CITIES = [f"City{i}" for i in range(40)]
+EVENTS_PER_SPORT = 12
+
+
+def synthetic_events(n_rows, seed=42, first_id=1):
+    rng = np.random.default_rng(seed)
+    season = rng.choice(['Summer', 'Winter'], size=n_rows, p=[0.8, 0.2])
+    summer = season == 'Summer'
+    sport = np.where(
+        summer,
+        rng.choice(SPORTS['Summer'], size=n_rows),
+        rng.choice(SPORTS['Winter'], size=n_rows)
+    )
+    year = np.where(
+        summer,
+        rng.choice(YEARS['Summer'], size=n_rows),
+        rng.choice(YEARS['Winter'], size=n_rows)
+    ).astype('int16')
+    ids = np.arange(first_id, first_id + n_rows, dtype='int32')
+    event = rng.integers(0, EVENTS_PER_SPORT, size=n_rows)
+    noc = rng.choice(NOCS, size=n_rows)
+
+    df = pd.DataFrame({
+        'ID': pd.array(ids, dtype='Int32'),
+        'Name': np.char.add('Athlete ', ids.astype('U10')),
+        'Sex': rng.choice(['M', 'F'], size=n_rows, p=[0.72, 0.28]),
+        'Age': pd.array(rng.integers(14, 45, size=n_rows), dtype='Int16'),
+        'Height': rng.normal(175, 10, size=n_rows).round().astype('float32'),
+        'Weight': rng.normal(70, 14, size=n_rows).round().astype('float32'),
+        'Team': noc,
+        'NOC': noc,
+        'Games': pd.Series(year).astype(str) + ' ' + season,
+        'Year': pd.array(year, dtype='Int16'),
+        'Season': season,
+        'City': np.array(CITIES)[year % len(CITIES)],
+        'Sport': sport,
+        'Event': pd.Series(sport) + ' Event' + pd.Series(event).astype(str),
+        'Medal': rng.choice(['None', 'Gold', 'Silver', 'Bronze'], size=n_rows, p=[0.85, 0.05, 0.05, 0.05]),
+    })
+    # Mesures manquantes, comme dans le CSV d'origine
+    for column in ['Age', 'Height', 'Weight']:
+        df.loc[rng.random(n_rows) < 0.2, column] = None
+    return df
+
+
+def synthetic_chunks(n_rows, chunksize=50000, seed=42):
+    # Générateur de morceaux (graine différente par morceau, ID continus)
+    for index, start in enumerate(range(0, n_rows, chunksize)):
+        yield synthetic_events(min(chunksize, n_rows - start), seed=seed + index, first_id=start + 1)
+
+
+# --- Métriques admin / développeur ---
+# Par colonne : valeur de base (par jour), amplitudes relatives des cycles
+# journalier (pic en milieu de journée) et hebdomadaire (creux le week-end),
+# bruit relatif et bornes.
+# 'count' : tirage de Poisson ; additive=True : la base est ramenée à la durée
+# d'un pas (10 inscriptions par jour = ~0,007 par minute).
+# 'gauge' : valeur instantanée (latence, CPU...), indépendante du pas.
+METRIC_PROFILES = {
+    'admin_metrics': {
+        'active_users': {'kind': 'count', 'base': 275, 'daily': 0.6, 'weekly': 0.25, 'noise': 0.15},
+        'new_signups': {'kind': 'count', 'base': 10, 'additive': True, 'daily': 0.6, 'weekly': 0.3, 'noise': 0.3},
+        'server_errors': {'kind': 'count', 'base': 5, 'additive': True, 'daily': 0.3, 'noise': 0.5},
+        'avg_response_time_ms': {'kind': 'gauge', 'base': 450, 'daily': 0.3, 'noise': 0.2, 'low': 50},
+    },
+    'dev_metrics': {
+        'commits_count': {'kind': 'count', 'base': 13, 'additive': True, 'daily': 0.8, 'weekly': 0.8, 'noise': 0.3},
+        'bugs_reported': {'kind': 'count', 'base': 2.5, 'additive': True, 'weekly': 0.5, 'noise': 0.5},
+        'avg_build_time_sec': {'kind': 'gauge', 'base': 260, 'noise': 0.2, 'low': 60},
+        'cpu_usage_percent': {'kind': 'gauge', 'base': 55, 'daily': 0.4, 'noise': 0.15, 'low': 0, 'high': 100},
+        'memory_usage_percent': {'kind': 'gauge', 'base': 62, 'daily': 0.2, 'noise': 0.08, 'low': 0, 'high': 100},
+    },
+}
+METRIC_PROFILES['admin_metrics_hourly'] = METRIC_PROFILES['admin_metrics']
+DAY = pd.Timedelta(days=1)
+
+
+def parse_freq(freq):
+    # 'D', 'h', 'min', '15min'... -> Timedelta
+    return pd.Timedelta(freq if freq[:1].isdigit() else '1' + freq)
+
+
+def seasonal_factor(dates, profile, step, seasonality=1.0, trend=0.0, origin=None):
+    # Multiplicateur >= 0 de la valeur de base pour chaque date
+    factor = np.ones(len(dates))
+    if step < DAY:
+        hours = (dates - dates.normalize()) / pd.Timedelta(hours=1)
+        factor += seasonality * profile.get('daily', 0) * np.sin(2 * np.pi * (hours - 8) / 24)
+    weekend = np.asarray(dates.dayofweek >= 5)
+    factor += seasonality * profile.get('weekly', 0) * np.where(weekend, -1.0, 0.4)
+    if trend and origin is not None:
+        # Croissance (trend = +20 % par an, par exemple)
+        factor *= 1 + trend * ((dates - origin) / pd.Timedelta(days=365))
+    return np.clip(factor, 0, None)
+
+
+def synthetic_metrics(table, dates, seed=42, noise=1.0, seasonality=1.0, trend=0.0, origin=None):
+    # DataFrame (date + colonnes de METRIC_PROFILES[table]) pour les dates données
+    dates = pd.DatetimeIndex(dates)
+    step = dates[1] - dates[0] if len(dates) > 1 else DAY
+    rng = np.random.default_rng(seed)
+    data = {'date': dates}
+    for column, profile in METRIC_PROFILES[table].items():
+        base = profile['base'] * (step / DAY if profile.get('additive') else 1)
+        level = base * seasonal_factor(dates, profile, step, seasonality, trend, origin)
+        jitter = rng.normal(1, noise * profile.get('noise', 0), size=len(dates)).clip(0, None)
+        if profile['kind'] == 'count':
+            data[column] = rng.poisson(level * jitter).astype('int64')
+        else:
+            values = (level * jitter).clip(profile.get('low', -np.inf), profile.get('high', np.inf))
+            data[column] = values.round(2)
+    return pd.DataFrame(data)
+
+
+def synthetic_metric_chunks(table, start, end, freq='D', chunksize=500000, seed=42, **options):
+    # Générateur de morceaux de `start` à `end` inclus, au pas `freq`
+    # (options : noise, seasonality, trend ; voir synthetic_metrics)
+    start, step = pd.Timestamp(start), parse_freq(freq)
+    n_rows = int((pd.Timestamp(end) - start) // step) + 1
+    for index, first in enumerate(range(0, n_rows, chunksize)):
+        dates = start + step * np.arange(first, min(first + chunksize, n_rows))
+        yield synthetic_metrics(table, dates, seed=seed + index, origin=start, **options)
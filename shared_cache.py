@@ -0,0 +1,223 @@
+import hashlib
+import io
+import json
+import time
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from config import (SHARED_CACHE_URL, SHARED_CACHE_PREFIX, SHARED_CACHE_TTL_SECONDS,
+                    SHARED_CACHE_LOCK_SECONDS, SHARED_CACHE_WAIT_SECONDS)
+
+# redis (et msgpack) sont optionnels : sans eux, ou sans SHARED_CACHE_URL, chaque
+# processus garde ses propres caches comme avant
+try:
+    import redis
+    import msgpack
+except ImportError:
+    redis = None
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# --- Cache partagé entre nœuds (protocole Redis) ---
+# Derrière un répartiteur, chaque conteneur relisait les agrégats dans PostgreSQL
+# et retraçait les mêmes figures. Les jeux du fournisseur (data_provider) et les
+# figures (figure_cache) passent maintenant par un serveur Redis commun :
+# - clés versionnées : la version des données (empreinte de la BDD) fait partie
+#   de la clé, une nouvelle version n'écrase rien et les anciennes expirent (TTL) ;
+# - un seul calcul par clé (single-flight) : le premier nœud qui manque une clé
+#   prend un verrou (SET NX, expirant), les autres attendent que la valeur
+#   apparaisse au lieu de tous interroger la BDD en même temps ;
+# - sérialisation msgpack, DataFrames en flux Arrow IPC (pas de pickle) ;
+# - toute erreur Redis est journalisée et le calcul se fait localement.
+# SHARED_CACHE_URL=fakeredis:// donne un serveur en mémoire du processus (tests,
+# paquet fakeredis de requirements-dev.txt).
+
+# Types étendus msgpack
+EXT_FRAME = 1
+EXT_DATE = 2
+EXT_DATETIME = 3
+# Période de sondage d'un nœud qui attend la valeur calculée par un autre (s)
+POLL_SECONDS = 0.05
+
+
+# --- Sérialisation ---
+def _frame_bytes(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _default(value):
+    if isinstance(value, pd.DataFrame) and pa is not None:
+        return msgpack.ExtType(EXT_FRAME, _frame_bytes(value))
+    if isinstance(value, datetime):
+        return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, date):
+        return msgpack.ExtType(EXT_DATE, value.isoformat().encode())
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"type non sérialisable : {type(value).__name__}")
+
+
+def _ext_hook(code, data):
+    if code == EXT_FRAME:
+        return pa.ipc.open_stream(data).read_all().to_pandas()
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def pack(value):
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def unpack(data):
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+def digest(value):
+    # Partie de clé courte et stable pour une version ou des entrées de callback
+    return hashlib.sha1(json.dumps(value, default=str).encode()).hexdigest()[:20]
+
+
+class SharedCache:
+    def __init__(self, client, prefix=SHARED_CACHE_PREFIX, ttl=SHARED_CACHE_TTL_SECONDS,
+                 lock_seconds=SHARED_CACHE_LOCK_SECONDS, wait_seconds=SHARED_CACHE_WAIT_SECONDS):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.lock_ms = int(lock_seconds * 1000)
+        self.wait_seconds = wait_seconds
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url=SHARED_CACHE_URL):
+        # None si le cache partagé n'est pas configuré (ou ses dépendances absentes)
+        if not url:
+            return None
+        if redis is None:
+            print(f"ATTENTION : SHARED_CACHE_URL={url} mais paquets redis / msgpack absents "
+                  f"(pip install -r requirements.txt) : cache partagé désactivé, calculs locaux.")
+            return None
+        if url.startswith('fakeredis://'):
+            if fakeredis is None:
+                print(f"ATTENTION : SHARED_CACHE_URL={url} mais paquet fakeredis absent "
+                      f"(pip install -r requirements-dev.txt) : cache partagé désactivé, calculs locaux.")
+                return None
+            return cls(fakeredis.FakeRedis())
+        return cls(redis.Redis.from_url(url, socket_timeout=5, socket_connect_timeout=5))
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def get_or_compute(self, key, compute, dump=None, load=None):
+        # Valeur de `key` lue dans Redis, sinon compute() (un seul nœud à la fois).
+        # dump / load : conversion vers / depuis une structure sérialisable
+        key = self._key(key)
+        lock = key + ':lock'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        try:
+            while True:
+                found, value = self._read(key, load)
+                if found:
+                    self.hits += 1
+                    return value
+                if self.client.set(lock, token, nx=True, px=self.lock_ms):
+                    break
+                # Un autre nœud calcule cette valeur : on attend qu'elle soit écrite
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                if time.monotonic() >= deadline:
+                    print(f"Cache partagé : attente de '{key}' trop longue, calcul local.")
+                    self.misses += 1
+                    return compute()
+                time.sleep(POLL_SECONDS)
+        except redis.RedisError as e:
+            print(f"Erreur du cache partagé ({key}): {e}")
+            self.errors += 1
+            self.misses += 1
+            return compute()
+
+        try:
+            # La valeur a pu être écrite entre la lecture et la prise du verrou
+            try:
+                found, value = self._read(key, load)
+            except redis.RedisError as e:
+                print(f"Erreur du cache partagé ({key}): {e}")
+                self.errors += 1
+                found = False
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = compute()
+            self._write(key, value, dump)
+            return value
+        finally:
+            self._release(lock, token)
+
+    def _read(self, key, load):
+        data = self.client.get(key)
+        if data is None:
+            return False, None
+        try:
+            value = unpack(data)
+            return True, load(value) if load else value
+        except Exception as e:
+            # Entrée illisible (format d'une autre version du code) : elle sera réécrite
+            print(f"Entrée illisible dans le cache partagé ({key}): {e}")
+            return False, None
+
+    def _write(self, key, value, dump):
+        if value is None:
+            return
+        try:
+            self.client.set(key, pack(dump(value) if dump else value), ex=self.ttl)
+        except (redis.RedisError, TypeError, ValueError) as e:
+            print(f"Erreur d'écriture du cache partagé ({key}): {e}")
+            self.errors += 1
+
+    def _release(self, lock, token):
+        # Ne supprime le verrou que s'il est toujours le nôtre (il a pu expirer et
+        # être repris par un autre nœud) : WATCH + transaction, sans script Lua
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.watch(lock)
+                current = pipe.get(lock)
+                if current is not None and current.decode() == token:
+                    pipe.multi()
+                    pipe.delete(lock)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except redis.RedisError as e:
+            # WatchError compris : le verrou expirera de lui-même
+            print(f"Erreur de libération du verrou partagé ({lock}): {e}")
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'waits': self.waits, 'errors': self.errors}
+
+
+# Instance partagée par le fournisseur de données et le cache des figures (None si désactivé)
+shared_cache = SharedCache.from_url()
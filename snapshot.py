@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from config import SNAPSHOT_DIR
+
+# pyarrow est optionnel : sans lui (ou avec SNAPSHOT_DIR vide), tout est lu en SQL
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# --- Instantané colonnaire des données (Arrow IPC) ---
+# Le loader écrit, après chaque chargement, les agrégats et la table nettoyée
+# dans des fichiers Arrow IPC non compressés, nommés d'après la version des
+# données, et un manifest.json qui pointe vers la version courante.
+# Les pages les ouvrent par mmap : pas d'aller-retour réseau au démarrage, et
+# format IPC plutôt que Parquet : il s'ouvre sans décodage ni copie. Seule la
+# lecture est partagée entre workers (cache du noyau) : la conversion en pandas
+# produit des colonnes propres à chaque worker, que les pages retransforment de
+# toute façon (cube trié, index codé). Elle est donc faite au plus compact : les
+# textes deviennent des 'category' (codes entiers + une chaîne par valeur, jamais
+# une chaîne Python par ligne), une colonne à la fois en libérant les tampons Arrow.
+MANIFEST = 'manifest.json'
+
+
+def available(directory=SNAPSHOT_DIR):
+    return pa is not None and bool(directory)
+
+
+def version_key(version):
+    return json.dumps(list(version), default=str)
+
+
+def read_manifest(directory=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(version, directory=SNAPSHOT_DIR):
+    manifest = read_manifest(directory)
+    return manifest is not None and manifest['version'] == version_key(version)
+
+
+def _write_table(path, frames):
+    # Écrit des DataFrames (un ou plusieurs morceaux) dans un seul fichier Arrow IPC ;
+    # les colonnes 'category' deviennent du texte (dictionnaires différents par morceau)
+    writer, rows = None, 0
+    try:
+        for df in frames:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                schema = pa.schema([
+                    pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+                    for f in table.schema
+                ])
+                writer = pa.ipc.new_file(path, schema)
+            writer.write_table(table.cast(schema))
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_snapshot(version, tables, directory=SNAPSHOT_DIR):
+    # tables : {nom: DataFrame ou itérable de DataFrames}
+    os.makedirs(directory, exist_ok=True)
+    key = version_key(version)
+    suffix = hashlib.sha1(key.encode()).hexdigest()[:12]
+
+    entries = {}
+    for name, data in tables.items():
+        filename = f"{name}-{suffix}.arrow"
+        path = os.path.join(directory, filename)
+        frames = [data] if isinstance(data, pd.DataFrame) else data
+        rows = _write_table(path + '.tmp', frames)
+        os.replace(path + '.tmp', path)
+        entries[name] = {'file': filename, 'rows': rows}
+
+    # Le manifeste est remplacé en dernier, de façon atomique : un lecteur voit
+    # soit l'ancienne version complète, soit la nouvelle
+    manifest = {'version': key, 'created_at': datetime.now().isoformat(timespec='seconds'), 'tables': entries}
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+    # Anciennes versions : un worker qui les a encore ouvertes garde son mmap
+    current = {entry['file'] for entry in entries.values()}
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.arrow') and entry.name not in current:
+            os.remove(entry.path)
+    return manifest
+
+
+def read_table(name, version=None, directory=SNAPSHOT_DIR):
+    # Table Arrow projetée en mémoire, ou None si absente ou périmée
+    # (version=None : pas de contrôle, par exemple quand la BDD est injoignable)
+    if not available(directory):
+        return None
+    manifest = read_manifest(directory)
+    if manifest is None or name not in manifest['tables']:
+        return None
+    if version is not None and manifest['version'] != version_key(version):
+        return None
+    try:
+        source = pa.memory_map(os.path.join(directory, manifest['tables'][name]['file']))
+        return pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowException) as e:
+        print(f"Erreur de lecture du snapshot '{name}': {e}")
+        return None
+
+
+def read_frame(name, version=None, directory=SNAPSHOT_DIR, columns=None):
+    # columns : projection faite sur la table Arrow, avant la conversion pandas
+    table = read_table(name, version, directory)
+    if table is None:
+        return None
+    if columns:
+        table = table.select(columns)
+    # Un bloc pandas par colonne (pas de copie de consolidation), chaque colonne
+    # Arrow libérée dès sa conversion : le pic mémoire reste celui d'une colonne
+    return table.to_pandas(split_blocks=True, self_destruct=True, strings_to_categorical=True)
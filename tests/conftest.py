@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Les modules de l'application sont à la racine du dépôt (comme pour app.py),
+# les scripts du loader dans scripts/
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'scripts')]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+import downsampling
+
+
+def reference_lttb(x, y, threshold):
+    # Version scalaire de l'algorithme (Steinarsson, 2013), mêmes intervalles que lttb
+    n = len(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = sum(x[end:next_end]) / (next_end - end)
+        avg_y = sum(y[end:next_end]) / (next_end - end)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    return selected + [n - 1]
+
+
+def test_matches_reference_implementation():
+    rng = np.random.default_rng(0)
+    x = np.arange(5000, dtype='float64')
+    y = np.cumsum(rng.normal(size=5000))
+    for threshold in (3, 10, 250, 1000):
+        assert downsampling.lttb(x, y, threshold).tolist() == reference_lttb(x.tolist(), y.tolist(), threshold)
+
+
+def test_keeps_endpoints_and_budget():
+    x = np.arange(10000)
+    y = np.sin(x / 50.0)
+    indices = downsampling.lttb(x, y, 500)
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_keeps_isolated_peak():
+    # Une moyenne par intervalle effacerait ce pic ; LTTB le garde
+    y = np.zeros(10000)
+    y[4321] = 100.0
+    assert 4321 in downsampling.lttb(np.arange(10000), y, 100)
+
+
+def test_short_series_unchanged():
+    assert downsampling.lttb([0, 1, 2], [5, 6, 7], 10).tolist() == [0, 1, 2]
+    df = pd.DataFrame({'date': pd.date_range('2024-01-01', periods=50, freq='h'), 'v': range(50)})
+    assert downsampling.downsample(df, 'v', 100) is df
+    assert len(downsampling.downsample(df, 'v', 20)) == 20
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from figure_payload import _decode, compact_figure
+
+
+def decoded_dates(spec):
+    return pd.to_datetime(_decode(spec), unit='ms')
+
+
+def test_sub_hour_timestamps_survive_compaction():
+    # Série à la minute : chaque point garde sa date exacte
+    dates = pd.date_range('2024-03-01 10:00', periods=20, freq='min')
+    figure = compact_figure(go.Figure(go.Scatter(x=dates.strftime('%Y-%m-%dT%H:%M:%S').tolist(),
+                                                 y=np.linspace(0, 1, 20).tolist())))
+    trace = figure['data'][0]
+    assert 'bdata' in trace['x']
+    assert decoded_dates(trace['x']).tolist() == dates.tolist()
+    assert figure['layout']['xaxis']['type'] == 'date'
+
+
+def test_values_are_still_rounded():
+    y = [1.23456789 + i for i in range(20)]
+    figure = compact_figure(go.Figure(go.Scatter(x=list(range(20)), y=y)))
+    values = _decode(figure['data'][0]['y'])
+    assert np.allclose(values, y, rtol=1e-5)
+    assert values[0] != y[0]
+
+
+def test_live_lists_keep_iso_dates():
+    dates = pd.date_range('2024-03-01 10:00', periods=20, freq='min').strftime('%Y-%m-%dT%H:%M:%S').tolist()
+    figure = compact_figure(go.Figure(go.Scatter(x=dates, y=list(range(20)))), binary=False)
+    assert figure['data'][0]['x'] == dates
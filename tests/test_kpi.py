@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import kpi
+
+TABLE = 'admin_metrics'
+COLUMNS = kpi.KPI_COLUMNS[TABLE]
+
+
+def metrics(start, periods, seed):
+    # Plusieurs lignes par jour, quelques jours manquants et valeurs absentes
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=periods, freq='6h')
+    df = pd.DataFrame({'date': dates, **{c: rng.integers(0, 1000, periods).astype(float) for c in COLUMNS}})
+    df = df[~df['date'].dt.day.isin([3, 17])]
+    df.loc[df.sample(frac=0.05, random_state=seed).index, 'avg_response_time_ms'] = np.nan
+    return df.reset_index(drop=True)
+
+
+@pytest.fixture
+def engine():
+    return create_engine('sqlite://')
+
+
+def expected(df, days):
+    # Même fenêtre que read_window : les `days` jours qui précèdent le dernier jour de données, inclus
+    day = df['date'].dt.normalize()
+    last = day.max()
+    window = df if days is None else df[day > last - pd.Timedelta(days=days)]
+    return {c: window[c].sum() for c in COLUMNS}, {c: int(window[c].count()) for c in COLUMNS}
+
+
+@pytest.mark.parametrize('days', [None, 1, 7, 30, 90])
+def test_read_window_matches_pandas(engine, days):
+    df = metrics('2024-01-01', 400, seed=1)
+    df.to_sql(TABLE, engine, index=False)
+    kpi.refresh_rollup(engine, TABLE, full=True)
+
+    window = kpi.read_window(engine, TABLE, days)
+    sums, counts = expected(df, days)
+    assert window['last'] == df['date'].max().date()
+    assert window['count'] == counts
+    assert window['sum'] == pytest.approx(sums)
+
+
+def test_incremental_refresh_matches_full_rebuild(engine):
+    df = metrics('2024-01-01', 400, seed=2)
+    df.iloc[:200].to_sql(TABLE, engine, index=False)
+    kpi.refresh_rollup(engine, TABLE)
+    # Nouvelles lignes, dont la fin du dernier jour déjà agrégé
+    df.iloc[200:].to_sql(TABLE, engine, index=False, if_exists='append')
+    kpi.sync_rollup(engine, TABLE)
+    incremental = pd.read_sql(f"SELECT * FROM {kpi.rollup_table(TABLE)} ORDER BY day", engine)
+
+    kpi.refresh_rollup(engine, TABLE, full=True)
+    full = pd.read_sql(f"SELECT * FROM {kpi.rollup_table(TABLE)} ORDER BY day", engine)
+    pd.testing.assert_frame_equal(incremental, full)
+
+
+def test_empty_rollup_reads_as_none(engine):
+    metrics('2024-01-01', 4, seed=3).head(0).to_sql(TABLE, engine, index=False)
+    kpi.refresh_rollup(engine, TABLE)
+    assert kpi.read_window(engine, TABLE, 7) is None
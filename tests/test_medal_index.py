@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from medal_index import MedalIndex, COLUMNS, MEDALS
+from synthetic import synthetic_events
+
+
+@pytest.fixture(scope='module')
+def events():
+    return synthetic_events(20000, seed=7)
+
+
+@pytest.fixture(scope='module')
+def medals(events):
+    return events[events['Medal'] != 'None'].reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def index(events):
+    return MedalIndex.from_dataframe(events)
+
+
+def expected_counts(df, column):
+    # Même ordre que count_by : nombre décroissant, puis valeur croissante
+    counts = df.groupby(column).size().reset_index(name='Count')
+    return counts.sort_values(['Count', column], ascending=[False, True], ignore_index=True)
+
+
+def assert_counts_equal(actual, expected):
+    pd.testing.assert_frame_equal(actual.astype({'Count': 'int64'}), expected.astype({'Count': 'int64'}),
+                                  check_dtype=False)
+
+
+def test_rows_match_pandas_for_every_season_sport_and_nation(index, medals):
+    for (season, sport), group in medals.groupby(['Season', 'Sport']):
+        rows = index.rows(Season=season, Sport=sport)
+        assert len(rows) == len(group)
+        assert_counts_equal(index.count_by('NOC', rows), expected_counts(group, 'NOC'))
+    for (season, noc), group in medals.groupby(['Season', 'NOC']):
+        rows = index.rows(Season=season, NOC=noc)
+        assert_counts_equal(index.count_by('Sport', rows), expected_counts(group, 'Sport'))
+
+
+def test_combined_and_list_filters(index, medals):
+    nocs, years = ['N001', 'N042', 'N199'], [1996, 2000]
+    rows = index.rows(Season='Summer', NOC=nocs, Year=years, Sport=None, Event=[])
+    mask = (medals['Season'] == 'Summer') & medals['NOC'].isin(nocs) & medals['Year'].isin(years)
+    assert rows.tolist() == np.flatnonzero(mask).tolist()
+    assert_counts_equal(index.count_by('NOC', rows, n=2), expected_counts(medals[mask], 'NOC').head(2))
+
+
+def test_unknown_value_matches_nothing(index, medals):
+    assert len(index.rows(NOC='XXX')) == 0
+    assert len(index.rows()) == len(medals)
+
+
+def test_medal_breakdown_matches_crosstab(index, medals):
+    rows = index.rows(Season='Winter')
+    actual = index.medal_breakdown('NOC', rows, n=10)
+    winter = medals[medals['Season'] == 'Winter']
+    table = pd.crosstab(winter['NOC'], winter['Medal']).reindex(columns=MEDALS, fill_value=0)
+    top = expected_counts(winter, 'NOC').head(10)
+    assert actual['NOC'].tolist() == top['NOC'].tolist()
+    assert actual['Count'].tolist() == top['Count'].tolist()
+    for medal in MEDALS:
+        assert actual[medal].tolist() == table.loc[top['NOC'], medal].tolist()
+
+
+def test_parts_round_trip(index):
+    rebuilt = MedalIndex.from_parts(index.to_parts())
+    for column in COLUMNS:
+        assert rebuilt.values[column].tolist() == index.values[column].tolist()
+        assert np.array_equal(rebuilt.codes[column], index.codes[column])
+    assert rebuilt.rows(Season='Summer', NOC='N010').tolist() == index.rows(Season='Summer', NOC='N010').tolist()
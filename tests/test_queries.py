@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import queries
+
+NAMES = ['100% Pure', '100 Pure', 'A_B', 'AxB', 'back\\slash', 'Jean Dupont']
+
+
+@pytest.fixture
+def engine():
+    # SQLite en mémoire : même SQL que sous PostgreSQL (LIKE ... ESCAPE, LOWER)
+    engine = create_engine('sqlite://')
+    pd.DataFrame({
+        'ID': range(1, len(NAMES) + 1),
+        'Name': NAMES,
+        'Year': [1996, 2000, 2004, 2008, 2012, 2016],
+        'NOC': ['FRA', 'fra', 'USA', 'USA', 'GBR', 'FRA'],
+    }).to_sql('athlete_events', engine, index=False)
+    return engine
+
+
+def names(engine, filter_query):
+    where, params = queries.filter_query_to_sql(filter_query)
+    df = pd.read_sql(f'SELECT "Name" FROM athlete_events{where} ORDER BY "ID"', engine, params=params)
+    return df['Name'].tolist()
+
+
+def test_contains_escapes_like_wildcards(engine):
+    # % et _ sont cherchés tels quels, pas comme jokers
+    assert names(engine, '{Name} contains 100%') == ['100% Pure']
+    assert names(engine, '{Name} contains A_B') == ['A_B']
+    assert names(engine, '{Name} contains "back\\\\slash"') == ['back\\slash']
+
+
+def test_case_sensitive_and_insensitive_operators(engine):
+    assert names(engine, '{NOC} s= FRA') == ['100% Pure', 'Jean Dupont']
+    assert names(engine, '{NOC} i= FRA') == ['100% Pure', '100 Pure', 'Jean Dupont']
+
+
+def test_numeric_comparisons_and_combined_clauses(engine):
+    assert names(engine, '{Year} >= 2008 && {NOC} s= USA') == ['AxB']
+    assert names(engine, '{Year} contains 99') == ['100% Pure']
+
+
+def test_invalid_clauses_are_ignored():
+    # Colonne hors liste blanche, nombre mal formé : la clause disparaît
+    where, params = queries.filter_query_to_sql('{password} s= x && {Year} > abc && {NOC} s= FRA')
+    assert where == ' WHERE "NOC" = :p2'
+    assert params == {'p2': 'FRA'}
+
+
+def test_values_are_always_bound_parameters():
+    where, params = queries.filter_query_to_sql('{Name} s= "x\' OR 1=1 --"')
+    assert where == ' WHERE "Name" = :p0'
+    assert params == {'p0': "x' OR 1=1 --"}
+
+
+@pytest.mark.parametrize('value', ['Jean "JJ" Dupont', 'back\\slash', 'a && b', "O'Brien", 'plain'])
+def test_quoted_drill_values_round_trip(value):
+    # Valeurs de l'exploration (data_manager.filter_raw_table) réinjectées dans le filtre
+    filter_query = f'{{Season}} s= "Summer" && {{Name}} s= {queries.quote_filter_value(value)} && {{Year}} = 2000'
+    where, params = queries.filter_query_to_sql(filter_query)
+    assert where == ' WHERE "Season" = :p0 AND "Name" = :p1 AND "Year" = :p2'
+    assert params == {'p0': 'Summer', 'p1': value, 'p2': 2000.0}
+
+
+def test_read_metrics_range_validates_before_querying():
+    # Petite plage (chemin des lignes brutes) : contrôlée comme le chemin agrégé
+    engine = create_engine('sqlite://')
+    pd.DataFrame({'date': pd.date_range('2024-01-01', periods=10, freq='h'), 'value': range(10)}) \
+        .to_sql('metrics', engine, index=False)
+    with pytest.raises(ValueError):
+        queries.read_metrics_range(engine, 'metrics', {'value': 'median'})
+    with pytest.raises(ValueError):
+        queries.read_metrics_range(engine, 'metrics', {'value FROM metrics; --': 'max'})
+    df, width = queries.read_metrics_range(engine, 'metrics', {'value': 'max'})
+    assert width is None and df['value'].tolist() == list(range(10))
+    df, width = queries.read_metrics_range(engine, 'metrics', {'value': 'max'}, budget=1)
+    assert width is not None and df['value'].max() == 9
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import request_log
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    request_log.ensure_tables(engine)
+    return engine
+
+
+def log_requests(engine, times):
+    log = request_log.RequestLog()
+    for i, ts in enumerate(times):
+        log.record({'ts': ts, 'method': 'GET', 'path': '/', 'status': 500 if i % 3 == 0 else 200,
+                    'latency_ms': float(i), 'session_id': f"s{i % 4}"})
+    log.flush(engine)
+
+
+def test_rollup_on_sqlite(engine):
+    now = datetime.now().replace(minute=30, second=0, microsecond=0)
+    log_requests(engine, [now - timedelta(hours=h) for h in range(6)])
+    request_log.rollup(engine, since=datetime(1970, 1, 1))
+    hourly = pd.read_sql("SELECT * FROM admin_metrics_hourly", engine)
+    assert len(hourly) == 6
+    assert hourly['server_errors'].sum() == 2
+    daily = pd.read_sql("SELECT * FROM admin_metrics", engine)
+    assert daily['active_users'].max() <= 4
+
+
+def test_drop_unlogged_buckets_removes_demo_rows_only(engine):
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    # Historique fictif de 10 jours, puis journal des requêtes d'aujourd'hui seulement
+    # (datetime Python, comme load_data.upsert_rows : même format de date que le rollup sous SQLite)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO admin_metrics VALUES (:date, 1000, 10, 5, 120.0)"),
+                     [{'date': today - timedelta(days=d)} for d in range(10)])
+    log_requests(engine, [today + timedelta(hours=1, minutes=m) for m in range(5)])
+    request_log.rollup(engine, since=today)
+
+    assert request_log.drop_unlogged_buckets(engine) == 9
+    daily = pd.read_sql("SELECT * FROM admin_metrics", engine, parse_dates=['date'])
+    assert daily['date'].tolist() == [pd.Timestamp(today)]
+    assert daily['active_users'].tolist() == [4]
+    assert len(pd.read_sql("SELECT * FROM admin_metrics_hourly", engine)) == 1
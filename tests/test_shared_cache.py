@@ -0,0 +1,106 @@
+import threading
+import time
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+import redis  # noqa: E402
+
+from shared_cache import SharedCache, pack, unpack  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    # Un serveur Redis en mémoire, partagé par plusieurs « nœuds »
+    return fakeredis.FakeServer()
+
+
+def node(server, **kwargs):
+    return SharedCache(fakeredis.FakeRedis(server=server), prefix='test', **kwargs)
+
+
+def test_single_flight_across_nodes(server):
+    calls = []
+    start = threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'value': 42}
+
+    results = []
+
+    def run(cache):
+        start.wait()
+        results.append(cache.get_or_compute('answer', compute))
+
+    caches = [node(server) for _ in range(8)]
+    threads = [threading.Thread(target=run, args=(cache,)) for cache in caches]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{'value': 42}] * 8
+    assert sum(cache.waits for cache in caches) == 7
+    # Verrou libéré, valeur relue sans calcul
+    assert not fakeredis.FakeRedis(server=server).exists('test:answer:lock')
+    assert node(server).get_or_compute('answer', compute) == {'value': 42}
+    assert len(calls) == 1
+
+
+def test_dump_and_load_hooks(server):
+    cache = node(server)
+    value = cache.get_or_compute('pair', lambda: (1, 2), dump=list, load=tuple)
+    assert value == (1, 2)
+    assert node(server).get_or_compute('pair', lambda: None, dump=list, load=tuple) == (1, 2)
+
+
+def test_wait_timeout_falls_back_to_local_compute(server):
+    # Un autre nœud tient le verrou sans jamais écrire la valeur
+    fakeredis.FakeRedis(server=server).set('test:slow:lock', 'other', px=60000)
+    cache = node(server, wait_seconds=0.2)
+    assert cache.get_or_compute('slow', lambda: 'local') == 'local'
+    assert cache.misses == 1
+
+
+def test_redis_errors_fall_back_to_local_compute(server):
+    server.connected = False
+    cache = node(server)
+    assert cache.get_or_compute('down', lambda: 'local') == 'local'
+    assert cache.errors == 1
+
+
+class DropsAfterLock(fakeredis.FakeRedis):
+    # Redis qui tombe juste après la prise du verrou (SET NX réussi)
+    locked = False
+
+    def set(self, name, value, *args, **kwargs):
+        result = super().set(name, value, *args, **kwargs)
+        self.locked = self.locked or bool(kwargs.get('nx') and result)
+        return result
+
+    def get(self, name):
+        if self.locked:
+            raise redis.ConnectionError("connexion perdue")
+        return super().get(name)
+
+
+def test_redis_error_after_lock_falls_back_to_local_compute(server):
+    cache = SharedCache(DropsAfterLock(server=server), prefix='test')
+    assert cache.get_or_compute('dropped', lambda: 'local') == 'local'
+    assert cache.errors == 1
+    assert cache.misses == 1
+
+
+def test_pack_round_trip():
+    pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'NOC': ['FRA', 'USA'], 'Count': [3, 5]})
+    value = unpack(pack({'frame': df, 'day': date(2024, 1, 2), 'at': datetime(2024, 1, 2, 3, 4), 'n': [1, 2]}))
+    pd.testing.assert_frame_equal(value['frame'], df)
+    assert value['day'] == date(2024, 1, 2)
+    assert value['at'] == datetime(2024, 1, 2, 3, 4)
+    assert value['n'] == [1, 2]